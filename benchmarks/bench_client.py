@@ -0,0 +1,95 @@
+"""
+Runs the Better API client through burst and outage scenarios against the local stub server.
+
+- burst: a cold fetch of every key must not exceed the token bucket's rate plus its burst.
+- rate-limited: 429s with a Retry-After are waited out and retried until they succeed.
+- outage: one venue answering 503 opens its circuit breaker and drops out of the results,
+  while the healthy venue is unaffected. It must recover once the breaker resets.
+
+Each scenario prints its request count and timings. Whether the client behaves correctly in each
+is checked by tests/test_better_client.py.
+
+Usage: PYTHONPATH=. python benchmarks/bench_client.py
+"""
+import asyncio
+import logging
+import time
+
+from benchmarks.stub_server import StubServer
+from src.services.better_client import BetterApiClient
+from src.services.court_fetcher import CourtFetcher
+from src.utils.constants import ARDWICK_SPORTS_HALL
+
+
+def make_fetcher(stub: StubServer, **client_options) -> CourtFetcher:
+	fetcher = CourtFetcher()
+	fetcher.API_URL = stub.api_url
+	fetcher.client = BetterApiClient(CourtFetcher.HEADERS, **client_options)
+	return fetcher
+
+
+async def burst() -> None:
+	rate, capacity = 20, 5
+	print(f'burst: rate={rate}/s, capacity={capacity}')
+	with StubServer(latency=0.01) as stub:
+		fetcher = make_fetcher(stub, rate=rate, burst=capacity)
+		keys = fetcher.all_keys()
+
+		start = time.perf_counter()
+		results = await fetcher.fetch_keys(keys)
+		elapsed = time.perf_counter() - start
+		await fetcher.close()
+
+		times = stub.request_times
+		print(f'  {len(results)} keys, {len(times)} requests in {elapsed * 1000:.0f}ms, '
+			  f'{len(times) / max(times[-1] - times[0], 1e-9):.1f} requests/s')
+
+
+async def rate_limited() -> None:
+	print('rate-limited: 4 responses of 429 with Retry-After: 1')
+	with StubServer(latency=0.01) as stub:
+		stub.fail(429, count=4, retry_after='1')
+		fetcher = make_fetcher(stub, backoff_base=0.05, failure_threshold=10)
+		keys = fetcher.all_keys()[:4]
+
+		start = time.perf_counter()
+		results = await fetcher.fetch_keys(keys)
+		elapsed = time.perf_counter() - start
+		await fetcher.close()
+
+		print(f'  {len(results)} keys, {stub.request_count} requests in {elapsed * 1000:.0f}ms')
+
+
+async def outage() -> None:
+	reset_timeout = 1
+	print(f'outage: {ARDWICK_SPORTS_HALL} answers 503, breaker resets after {reset_timeout}s')
+	with StubServer(latency=0.01) as stub:
+		fetcher = make_fetcher(stub, backoff_base=0.01, failure_threshold=3, reset_timeout=reset_timeout)
+		keys = fetcher.all_keys()
+		failing = [key for key in keys if key[0] == ARDWICK_SPORTS_HALL]
+
+		stub.fail(503, venues={ARDWICK_SPORTS_HALL})
+		start = time.perf_counter()
+		results = await fetcher.fetch_keys(keys)
+		elapsed = time.perf_counter() - start
+		print(f'  {len(results)} keys, {stub.request_count} requests in {elapsed * 1000:.0f}ms during the outage')
+
+		stub.recover()
+		await asyncio.sleep(reset_timeout)
+		start = time.perf_counter()
+		# The half-open breaker only lets one probe through, so the first key closes it before the rest follow
+		await fetcher.fetch_keys(failing[:1])
+		results = await fetcher.fetch_keys(failing[1:])
+		elapsed = time.perf_counter() - start
+		await fetcher.close()
+		print(f'  {len(results) + 1} keys in {elapsed * 1000:.0f}ms once the breaker reset')
+
+
+async def main() -> None:
+	for scenario in (burst, rate_limited, outage):
+		await scenario()
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.CRITICAL)
+	asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Replays a trace of availability changes and counts the Telegram calls needed to notify subscribers.
+
+Every cycle (one minute apart), most courts keep their state, some change it for good and a
+share of "flapping" courts flip between 0 and 1 space at random. The same trace is routed
+through SubscriptionIndex to a set of randomly subscribed users, then turned into calls the
+old way (a new message for each non-empty "now available" and "now unavailable" list per
+cycle) and through NotificationCoalescer, which reports new messages and edits separately, along
+with how long users waited between a change and the message or edit telling them about it.
+
+Usage: PYTHONPATH=. python benchmarks/bench_coalescing.py [--users 200] [--cycles 120] [--window 120]
+"""
+import argparse
+import random
+from datetime import date, time, timedelta
+
+from src.models import Court, Subscription
+from src.models.subscription import WEEKDAYS
+from src.telegram_bot.notification_coalescer import NotificationCoalescer
+from src.telegram_bot.notification_dispatcher import DispatchResult
+from src.telegram_bot.subscription_index import SubscriptionIndex
+from src.utils.constants import VENUE_MAP, TIME_RANGES, BADMINTON_40MIN
+
+CYCLE_SECONDS = 60
+
+
+def make_courts(count: int) -> list[Court]:
+	today = date.today()
+	venues = list(VENUE_MAP)
+	return [
+		Court(f'court-{i}', venues[i % len(venues)], BADMINTON_40MIN, 'Badminton', today + timedelta(days=1 + i % 6),
+			  time(7 + i % 14), time(7 + i % 14, 40), '40min', '£9.50', 1)
+		for i in range(count)
+	]
+
+
+def make_trace(courts: list[Court], cycles: int, flapping: float, churn: float) -> list[tuple[list, list]]:
+	"""Returns the (now available, now unavailable) courts of each cycle."""
+	flappers = set(random.sample(range(len(courts)), int(len(courts) * flapping)))
+	available = [random.random() < 0.5 for _ in courts]
+	trace = []
+	for _ in range(cycles):
+		now_available, now_unavailable = [], []
+		for i, court in enumerate(courts):
+			if random.random() < (0.5 if i in flappers else churn):
+				available[i] = not available[i]
+				(now_available if available[i] else now_unavailable).append(court)
+		trace.append((now_available, now_unavailable))
+	return trace
+
+
+def make_subscriptions(users: int) -> list[Subscription]:
+	subscriptions = []
+	for user_id in range(users):
+		venues = tuple(random.sample(list(VENUE_MAP), random.randint(0, 1)))
+		weekdays = tuple(sorted(random.sample(range(len(WEEKDAYS)), random.choice((0, 2, 5)))))
+		time_ranges = tuple(random.sample(list(TIME_RANGES), random.randint(0, 2)))
+		subscriptions.append(Subscription(user_id, venues, (), weekdays, time_ranges))
+	return subscriptions
+
+
+def baseline(index: SubscriptionIndex, trace: list[tuple[list, list]]) -> int:
+	calls = 0
+	for now_available, now_unavailable in trace:
+		calls += len(index.match(now_available)) + len(index.match(now_unavailable))
+	return calls
+
+
+def coalesced(index: SubscriptionIndex, trace: list[tuple[list, list]], window: float) -> tuple[int, int, float]:
+	coalescer = NotificationCoalescer(window=window)
+	sends = edits = 0
+	message_id = 0
+	# When each user's oldest unsent change arrived, and how long each waited to be sent
+	waiting: dict[int, float] = {}
+	delays: list[float] = []
+
+	def flush_until(until: float) -> None:
+		nonlocal sends, edits, message_id
+		while (delay := coalescer.seconds_until_next_flush(now)) is not None and now + delay <= until:
+			flush_at = now + delay
+			result = DispatchResult()
+			for user_id, messages in coalescer.flush_due(flush_at).items():
+				delays.append(flush_at - waiting.pop(user_id))
+				for message in messages:
+					if message.edit_message_id is None:
+						message_id += 1
+						result.sent[user_id] = message_id
+						sends += 1
+					else:
+						edits += 1
+			coalescer.record(result, flush_at)
+
+	now = 0.0
+	for cycle, (now_available, now_unavailable) in enumerate(trace):
+		now = cycle * CYCLE_SECONDS
+		available_by_user, unavailable_by_user = index.match(now_available), index.match(now_unavailable)
+		for user_id in available_by_user.keys() | unavailable_by_user.keys():
+			waiting.setdefault(user_id, now)
+			coalescer.add(user_id, available_by_user.get(user_id, []), unavailable_by_user.get(user_id, []), now)
+		flush_until(now + CYCLE_SECONDS - 1)
+
+	flush_until(float('inf'))
+	return sends, edits, sum(delays) / len(delays) if delays else 0.0
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--users', type=int, default=200)
+	parser.add_argument('--courts', type=int, default=150)
+	parser.add_argument('--cycles', type=int, default=120)
+	parser.add_argument('--flapping', type=float, default=0.1, help='share of courts that flap')
+	parser.add_argument('--churn', type=float, default=0.01, help='chance a stable court changes each cycle')
+	parser.add_argument('--window', type=float, default=120)
+	args = parser.parse_args()
+
+	random.seed(0)
+	index = SubscriptionIndex(make_subscriptions(args.users))
+	trace = make_trace(make_courts(args.courts), args.cycles, args.flapping, args.churn)
+
+	before = baseline(index, trace)
+	sends, edits, delay = coalesced(index, trace, args.window)
+	print(f'uncoalesced  {before:7d} messages')
+	print(f'coalesced    {sends + edits:7d} calls ({sends} messages, {edits} edits), '
+		  f'{100 * (1 - (sends + edits) / before):.0f}% fewer calls, {100 * (1 - sends / before):.0f}% fewer pings, '
+		  f'{delay:.0f}s mean delay')
@@ -0,0 +1,101 @@
+"""
+Microbenchmarks the tuple-backed Court against the pydantic model it replaced on hot paths.
+
+For N courts each representation is timed building from database-style rows, hashing into a set,
+diffing two sets that differ by 10% and formatting. The memory held by the list of courts is also
+reported.
+
+Usage: PYTHONPATH=. python benchmarks/bench_court.py [--count 100000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import date, time as time_of_day, timedelta
+
+from benchmarks.court_payload import CourtPayload
+from src.models import Court
+
+
+class PydanticCourt(CourtPayload):
+	"""The previous Court: validated on every construction, hashed on its composite key."""
+
+	def __eq__(self, other):
+		return isinstance(other, PydanticCourt) and self.composite_key == other.composite_key
+
+	def __hash__(self):
+		return hash(self.composite_key)
+
+	def format_with_spaces(self) -> str:
+		return f'🏸 {self.starts_at.strftime("%H:%M")} - {self.ends_at.strftime("%H:%M")} ({self.duration}), {self.spaces} space(s) left'
+
+
+def make_rows(count: int, offset: int = 0) -> list[tuple]:
+	today = date.today()
+	return [
+		(f'court-{i}', 'sugden-sports-centre', 'badminton-40min', 'Badminton',
+		 (today + timedelta(days=i % 6)).isoformat(), f'{7 + i % 14:02d}:00', f'{7 + i % 14:02d}:40',
+		 '40min', '£9.50', i % 3)
+		for i in range(offset, offset + count)
+	]
+
+
+def build_pydantic(rows: list[tuple]) -> list[PydanticCourt]:
+	return [
+		PydanticCourt(
+			composite_key=row[0], venue_slug=row[1], category_slug=row[2], name=row[3], date=row[4],
+			starts_at=row[5], ends_at=row[6], duration=row[7], price=row[8], spaces=row[9]
+		)
+		for row in rows
+	]
+
+
+def build_slim(rows: list[tuple]) -> list[Court]:
+	from_date, from_time = date.fromisoformat, time_of_day.fromisoformat
+	return [
+		Court(row[0], row[1], row[2], row[3], from_date(row[4]), from_time(row[5]), from_time(row[6]),
+			  row[7], row[8], row[9])
+		for row in rows
+	]
+
+
+def timed(func, *args):
+	start = time.perf_counter()
+	result = func(*args)
+	return result, (time.perf_counter() - start) * 1000
+
+
+def measure_memory(build, rows: list[tuple]) -> float:
+	gc.collect()
+	tracemalloc.start()
+	courts = build(rows)
+	current, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	del courts
+	return current / 1024 / 1024
+
+
+def run(label: str, build, count: int) -> None:
+	rows = make_rows(count)
+	# The second set keeps 90% of the first and adds 10% new courts
+	other_rows = make_rows(count, offset=count // 10)
+
+	courts, construct_ms = timed(build, rows)
+	other = build(other_rows)
+	current, hash_ms = timed(set, courts)
+	new_set = set(other)
+	_, diff_ms = timed(lambda: (new_set - current, current - new_set))
+	_, format_ms = timed(lambda: [court.format_with_spaces() for court in courts])
+	memory_mb = measure_memory(build, rows)
+
+	print(f'{label:<9} construct={construct_ms:8.1f}ms  hash={hash_ms:7.1f}ms  set-diff={diff_ms:7.1f}ms  '
+		  f'format={format_ms:7.1f}ms  memory={memory_mb:6.1f}MiB')
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--count', type=int, default=100_000)
+	args = parser.parse_args()
+
+	run('pydantic', build_pydantic, args.count)
+	run('court', build_slim, args.count)
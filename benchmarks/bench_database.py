@@ -0,0 +1,134 @@
+"""
+Measures CourtDatabase query latency on a synthetic database of historical and upcoming courts.
+
+The "before" run drops the indexes and opens a fresh connection per query, as CourtDatabase used to.
+The "after" run uses the indexed schema and the long-lived WAL connection.
+
+Usage: PYTHONPATH=. python benchmarks/bench_database.py [--rows 300000] [--repeat 50]
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src.services.court_database import MINUTES_PER_DAY, CourtDatabase
+from src.utils.constants import BADMINTON_40MIN, BADMINTON_60MIN
+
+VENUES = [f'venue-{i}' for i in range(40)]
+CATEGORIES = [BADMINTON_40MIN, BADMINTON_60MIN]
+
+
+def populate(db_path: str, rows: int) -> None:
+	"""
+	Fills the database with `rows` courts, all but the last week of which are in the past.
+	"""
+	random.seed(0)
+	today = date.today()
+	conn = sqlite3.connect(db_path)
+	conn.execute('''
+		CREATE TABLE courts (
+			composite_key TEXT PRIMARY KEY, venue_slug TEXT, category_slug TEXT, name TEXT, starts_at INTEGER,
+			ends_at INTEGER, duration TEXT, price_pence INTEGER, spaces INTEGER, price_text TEXT
+		)
+	''')
+	conn.execute(f'PRAGMA user_version = {CourtDatabase.SCHEMA_VERSION}')
+
+	def generate():
+		slots_per_day = len(VENUES) * len(CATEGORIES) * 15
+		days = rows // slots_per_day + 1
+		count = 0
+		for day_offset in range(-days + 7, 7):
+			day = today + timedelta(days=day_offset)
+			day_start = (day - date(1970, 1, 1)).days * MINUTES_PER_DAY
+			for venue in VENUES:
+				for category in CATEGORIES:
+					for hour in range(7, 22):
+						if count == rows:
+							return
+						count += 1
+						spaces = random.choice((0, 0, 0, 1, 2)) if day_offset >= 0 else random.choice((0, 1))
+						yield (f'{venue}-{category}-{day}-{hour}', venue, category, 'Badminton', day_start + hour * 60,
+							   day_start + hour * 60 + 40, '40min', 950, spaces, None)
+
+	conn.executemany('INSERT INTO courts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', generate())
+	conn.commit()
+	conn.close()
+
+
+class UnpooledCourtDatabase(CourtDatabase):
+	"""CourtDatabase as it was, opening a new connection for every query."""
+
+	def _connect(self) -> sqlite3.Connection:
+		return sqlite3.connect(self.db_path)
+
+
+def measure(database: CourtDatabase, repeat: int) -> dict[str, list[float]]:
+	queries = {
+		'get_all_available': lambda: database.get_all_available(),
+		'get_available_by_date': lambda: database.get_available_by_date(date.today() + timedelta(days=2)),
+		'get_available_by_time_range': lambda: database.get_available_by_time_range(('17:00', '22:00')),
+	}
+
+	timings = {}
+	for name, query in queries.items():
+		query()
+		samples = []
+		for _ in range(repeat):
+			start = time.perf_counter()
+			query()
+			samples.append(time.perf_counter() - start)
+		timings[name] = samples
+	return timings
+
+
+def report(label: str, timings: dict[str, list[float]]) -> None:
+	print(label)
+	for name, samples in timings.items():
+		samples = sorted(samples)
+		p95 = samples[int(len(samples) * 0.95) - 1]
+		print(f'  {name:<30} p50={statistics.median(samples) * 1000:8.2f}ms  p95={p95 * 1000:8.2f}ms')
+
+
+def print_plans(conn: sqlite3.Connection) -> None:
+	for sql, params in (
+		('SELECT * FROM courts WHERE spaces > 0 AND starts_at > 0 ORDER BY starts_at', ()),
+		('SELECT * FROM courts WHERE spaces > 0 AND starts_at > 0 AND starts_at < 1440 ORDER BY starts_at', ()),
+		(CourtDatabase.TIME_RANGE_QUERY, {'today': 0, 'day': 1440, 'start': 1020, 'end': 1320}),
+	):
+		plan = '; '.join(row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+		print(f'  plan: {plan}')
+
+
+def main(rows: int, repeat: int) -> None:
+	with tempfile.TemporaryDirectory() as tmp:
+		db_path = os.path.join(tmp, 'courts.db')
+		start = time.perf_counter()
+		populate(db_path, rows)
+		print(f'Populated {rows} courts in {time.perf_counter() - start:.1f}s')
+
+		# Bypass the singleton so each run gets its own instance on the synthetic database
+		CourtDatabase._instance = None
+		before = object.__new__(UnpooledCourtDatabase)
+		before.db_path = db_path
+		report('before (no indexes, connection per query)', measure(before, repeat))
+
+		after = CourtDatabase(db_path)
+		report('after (indexed, long-lived WAL connection)', measure(after, repeat))
+
+		print_plans(after._connect())
+		after.close()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--rows', type=int, default=300_000)
+	parser.add_argument('--repeat', type=int, default=50)
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.WARNING)
+	main(args.rows, args.repeat)
@@ -0,0 +1,112 @@
+"""
+Compares the thread-pool fetch path against the asyncio fetch path.
+
+Both are run from inside an event loop, the way court_updater_task runs them, while a heartbeat
+coroutine measures how long the loop is stalled. A final run repeats the asyncio fetch with
+conditional requests, where every response is unchanged and so never parsed.
+
+Usage: PYTHONPATH=. python benchmarks/bench_fetch.py [--latency 0.05] [--rounds 3]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from requests import Session
+
+from benchmarks.stub_server import StubServer
+from src.models import Court
+from src.services.better_client import BetterApiClient
+from src.services.court_fetcher import CourtFetcher
+
+
+class ThreadedCourtFetcher:
+	"""
+	The fetcher the updater used before the asyncio client: blocking requests on a thread pool of 6.
+	"""
+	def __init__(self, api_url: str, request_timeout: float = 10):
+		self.api_url = api_url
+		self.request_timeout = request_timeout
+		self.session = Session()
+		self.session.headers.update(CourtFetcher.HEADERS)
+
+	def fetch_all(self, keys: list[tuple[str, str, date]]) -> list[Court]:
+		courts: list[Court] = []
+		with ThreadPoolExecutor(max_workers=6) as executor:
+			for batch in executor.map(lambda key: self._fetch_for(*key), keys):
+				courts.extend(batch)
+		return courts
+
+	def _fetch_for(self, venue_slug: str, category_slug: str, date: date) -> list[Court]:
+		response = self.session.get(
+			self.api_url.format(venue_slug=venue_slug, category_slug=category_slug),
+			params={'date': date.isoformat()},
+			timeout=self.request_timeout
+		)
+		response.raise_for_status()
+		return CourtFetcher._parse(json.loads(response.content)['data'])
+
+
+async def _heartbeat(stop: asyncio.Event, interval: float, lags: list[float]) -> None:
+	loop = asyncio.get_running_loop()
+	while not stop.is_set():
+		expected = loop.time() + interval
+		await asyncio.sleep(interval)
+		lags.append(max(0.0, loop.time() - expected))
+
+
+async def _measure(label: str, fetch, rounds: int) -> None:
+	walls, stalls = [], []
+	for _ in range(rounds):
+		stop, lags = asyncio.Event(), []
+		heartbeat = asyncio.create_task(_heartbeat(stop, 0.005, lags))
+		await asyncio.sleep(0.02)
+
+		start = time.perf_counter()
+		courts = await fetch()
+		walls.append(time.perf_counter() - start)
+
+		stop.set()
+		await heartbeat
+		stalls.append(max(lags, default=0.0))
+
+	print(f'{label:<20} courts={len(courts):<5} '
+		  f'wall={min(walls) * 1000:8.1f}ms  max_loop_stall={max(stalls) * 1000:8.1f}ms')
+
+
+async def main(latency: float, rounds: int) -> None:
+	with StubServer(latency=latency) as stub:
+		threaded = ThreadedCourtFetcher(stub.api_url)
+
+		pooled = CourtFetcher()
+		pooled.API_URL = stub.api_url
+		# Lift the client's rate limit so the transports themselves are compared
+		pooled.client = BetterApiClient(CourtFetcher.HEADERS, rate=1000, burst=1000)
+
+		async def run_threaded():
+			# The old updater called the blocking fetch straight from the coroutine
+			return threaded.fetch_all(pooled.all_keys())
+
+		await _measure('thread-pool', run_threaded, rounds)
+		await _measure('asyncio', pooled.fetch_all_async, rounds)
+
+		async def run_conditional():
+			results = await pooled.fetch_keys(pooled.all_keys())
+			return [court for batch in results.values() if batch for court in batch]
+
+		await run_conditional()
+		await _measure('asyncio (unchanged)', run_conditional, rounds)
+		await pooled.close()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--latency', type=float, default=0.05, help='Stub server latency per request in seconds')
+	parser.add_argument('--rounds', type=int, default=3)
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.WARNING)
+	asyncio.run(main(args.latency, args.rounds))
@@ -0,0 +1,96 @@
+"""
+Simulates many bot users at once to compare handler latency with blocking and awaitable database access.
+
+Each simulated user alternates between search queries (which hit the database) and menu presses
+(which do not). With blocking access, every query stalls the loop and so every other user's
+handler, whereas with AsyncCourtDatabase the menu presses should stay flat.
+
+Usage: PYTHONPATH=. python benchmarks/bench_handlers.py [--users 50] [--requests 10] [--rows 100000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.bench_database import populate
+from src.services.async_court_database import AsyncCourtDatabase
+from src.services.court_database import CourtDatabase
+from src.utils.court_formatter import format_court_availability
+
+
+class BlockingCourtDatabase:
+	"""The old access pattern, calling CourtDatabase straight from the coroutine."""
+
+	def __init__(self, court_database: CourtDatabase):
+		self.court_database = court_database
+
+	async def get_all_available(self):
+		return self.court_database.get_all_available()
+
+	async def get_available_by_date(self, date):
+		return self.court_database.get_available_by_date(date)
+
+	async def get_available_by_time_range(self, time_range):
+		return self.court_database.get_available_by_time_range(time_range)
+
+
+async def simulate_user(database, requests: int, latencies: dict[str, list[float]]) -> None:
+	for _ in range(requests):
+		await asyncio.sleep(random.uniform(0, 0.01))
+		start = time.perf_counter()
+
+		if random.random() < 0.5:
+			query = random.choice((
+				lambda: database.get_all_available(),
+				lambda: database.get_available_by_date(date.today() + timedelta(days=random.randrange(6))),
+				lambda: database.get_available_by_time_range(('17:00', '22:00')),
+			))
+			format_court_availability(await query())
+			latencies['search'].append(time.perf_counter() - start)
+		else:
+			await asyncio.sleep(0)
+			latencies['menu'].append(time.perf_counter() - start)
+
+
+async def run(label: str, database, users: int, requests: int) -> None:
+	latencies = {'search': [], 'menu': []}
+	start = time.perf_counter()
+	await asyncio.gather(*(simulate_user(database, requests, latencies) for _ in range(users)))
+	elapsed = time.perf_counter() - start
+
+	print(f'{label} ({elapsed:.1f}s)')
+	for kind, samples in latencies.items():
+		samples = sorted(samples)
+		p50 = samples[len(samples) // 2]
+		p99 = samples[max(0, int(len(samples) * 0.99) - 1)]
+		print(f'  {kind:<7} n={len(samples):<5} p50={p50 * 1000:8.2f}ms  p99={p99 * 1000:8.2f}ms')
+
+
+async def main(users: int, requests: int, rows: int) -> None:
+	with tempfile.TemporaryDirectory() as tmp:
+		db_path = os.path.join(tmp, 'courts.db')
+		populate(db_path, rows)
+
+		CourtDatabase._instance = None
+		court_database = CourtDatabase(db_path)
+
+		random.seed(1)
+		await run('blocking', BlockingCourtDatabase(court_database), users, requests)
+		random.seed(1)
+		await run('async', AsyncCourtDatabase(), users, requests)
+		court_database.close()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--users', type=int, default=50)
+	parser.add_argument('--requests', type=int, default=10)
+	parser.add_argument('--rows', type=int, default=100_000)
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.WARNING)
+	asyncio.run(main(args.users, args.requests, args.rows))
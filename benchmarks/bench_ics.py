@@ -0,0 +1,71 @@
+"""
+Compares rebuilding the whole ICS calendar each cycle against IcsWriter's incremental re-rendering.
+
+Usage: PYTHONPATH=. python benchmarks/bench_ics.py [--courts 5000] [--changed 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, datetime, time as time_of_day, timedelta
+from zoneinfo import ZoneInfo
+
+from ics import Calendar, Event
+
+from src.models import Court, CourtChanges
+from src.services.ics_writer import IcsWriter
+from src.utils.constants import VENUE_MAP, SUGDEN_SPORTS_CENTRE, BADMINTON_40MIN
+
+
+def make_courts(count: int) -> list[Court]:
+	today = date.today()
+	return [
+		Court(f'court-{i}', SUGDEN_SPORTS_CENTRE, BADMINTON_40MIN, 'Badminton', today + timedelta(days=1 + i % 6),
+			  time_of_day(7 + i % 14), time_of_day(7 + i % 14, 40), '40min', '£9.50', 1 + i % 3)
+		for i in range(count)
+	]
+
+
+def full_rebuild(courts: list[Court], path: str) -> None:
+	"""The previous approach: a fresh Calendar every cycle, written straight over the file."""
+	cal = Calendar()
+	tz = ZoneInfo('Europe/London')
+	for court in courts:
+		event = Event()
+		event.name = f'{court.name} ({VENUE_MAP[court.venue_slug]})'
+		event.begin = datetime.combine(court.date, court.starts_at).replace(tzinfo=tz)
+		event.end = datetime.combine(court.date, court.ends_at).replace(tzinfo=tz)
+		event.location = VENUE_MAP[court.venue_slug]
+		event.description = 'Last updated: never'
+		cal.events.add(event)
+
+	with open(path, 'w') as f:
+		f.write(cal.serialize())
+
+
+def main(count: int, changed: int) -> None:
+	courts = make_courts(count)
+	changes = CourtChanges(updated=[court.with_spaces(court.spaces + 1) for court in courts[:changed]])
+
+	with tempfile.TemporaryDirectory() as tmp:
+		path = os.path.join(tmp, 'courts.ics')
+
+		start = time.perf_counter()
+		full_rebuild(courts, path)
+		print(f'full rebuild       {(time.perf_counter() - start) * 1000:8.1f}ms')
+
+		writer = IcsWriter(path)
+		writer.rebuild(courts)
+		start = time.perf_counter()
+		writer.apply(changes)
+		writer.write()
+		print(f'incremental ({changed:>4}) {(time.perf_counter() - start) * 1000:8.1f}ms')
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--courts', type=int, default=5000)
+	parser.add_argument('--changed', type=int, default=50)
+	args = parser.parse_args()
+
+	main(args.courts, args.changed)
@@ -0,0 +1,111 @@
+"""
+Compares the memory and time needed to turn a cycle's worth of `times` responses into courts.
+
+A fetch window of --days days across --venues venues is replayed from the recorded fixture and
+written to a temporary file, one response body per line. Each variant then runs in a fresh process
+that reads the bodies back and parses all of them, keeping the courts as the update pipeline does
+until they are stored. The peak RSS reported is what parsing added on top of the raw bodies.
+
+The previous path decoded with json, copied dict-shaped data into a list and validated every court
+through the pydantic CourtPayload. The current one decodes with orjson when it is installed and
+builds each Court straight from the parsed entry.
+
+Usage: PYTHONPATH=. python benchmarks/bench_ingest.py [--venues 20] [--days 30] [--form dict]
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.court_payload import CourtPayload
+from benchmarks.stub_server import load_fixture, replay_times_payload
+from src.services.court_fetcher import CourtFetcher
+from src.utils.constants import BADMINTON_40MIN, BADMINTON_60MIN
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+
+def parse_previous(body: bytes) -> list:
+	data = json.loads(body)['data']
+	court_list = list(data.values()) if isinstance(data, dict) else data
+	return [CourtPayload(**court).to_court() for court in court_list]
+
+
+def parse_json(body: bytes) -> list:
+	return CourtFetcher._parse(json.loads(body)['data'])
+
+
+def parse_orjson(body: bytes) -> list:
+	return CourtFetcher._parse(orjson.loads(body)['data'])
+
+
+VARIANTS = {
+	'json + pydantic': parse_previous,
+	'json + slim courts': parse_json,
+	'orjson + slim courts': parse_orjson,
+}
+
+
+def write_bodies(path: str, venues: int, days: int, form: str) -> int:
+	fixture = load_fixture(form)
+	today = date.today()
+	count = 0
+	with open(path, 'wb') as f:
+		for venue in range(venues):
+			for category_slug in (BADMINTON_40MIN, BADMINTON_60MIN):
+				for day in range(days):
+					payload = replay_times_payload(fixture, f'venue-{venue}', category_slug,
+												   (today + timedelta(days=day)).isoformat())
+					f.write(json.dumps(payload, separators=(',', ':')).encode() + b'\n')
+					count += 1
+	return count
+
+
+def peak_rss_mb() -> float:
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(variant: str, path: str) -> tuple[int, float, float]:
+	parse = VARIANTS[variant]
+	with open(path, 'rb') as f:
+		bodies = list(f)
+	gc.collect()
+	before = peak_rss_mb()
+
+	start = time.perf_counter()
+	courts = []
+	for body in bodies:
+		courts.extend(parse(body))
+	elapsed = time.perf_counter() - start
+	return len(courts), elapsed, peak_rss_mb() - before
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--venues', type=int, default=20)
+	parser.add_argument('--days', type=int, default=30)
+	parser.add_argument('--form', choices=('list', 'dict'), default='dict')
+	args = parser.parse_args()
+
+	path = os.path.join(tempfile.mkdtemp(), 'bodies.jsonl')
+	responses = write_bodies(path, args.venues, args.days, args.form)
+	print(f'{responses} responses, {os.path.getsize(path) / 1024 / 1024:.1f} MB of JSON')
+
+	context = multiprocessing.get_context('spawn')
+	for variant in VARIANTS:
+		if variant.startswith('orjson') and orjson is None:
+			print(f'{variant:<22} skipped, orjson is not installed')
+			continue
+		with context.Pool(1) as pool:
+			courts, elapsed, peak = pool.apply(measure, (variant, path))
+		print(f'{variant:<22} courts={courts:<7} {elapsed * 1000:8.0f}ms  '
+			  f'{courts / elapsed:9.0f} courts/s  peak RSS +{peak:6.1f} MB')
+	os.remove(path)
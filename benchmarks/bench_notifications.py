@@ -0,0 +1,108 @@
+"""
+Measures notification delivery throughput against a fake Telegram bot.
+
+The fake bot answers each send_message after a fixed latency, reports a share of users as having
+blocked the bot and can raise one RetryAfter partway through. The old one-user-at-a-time loop is
+compared with NotificationDispatcher, and a second run at Telegram's real limits checks that no
+one-second window exceeds the global rate plus its burst.
+
+Usage: PYTHONPATH=. python benchmarks/bench_notifications.py [--users 200] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from aiogram.types import Message
+
+from src.telegram_bot.notification_dispatcher import NotificationDispatcher, OutgoingMessage
+
+MESSAGES = [OutgoingMessage('✅ Now available:\n\n📅 Monday 1st January:\n🏸 18:00 - 18:40 (40min)'),
+			OutgoingMessage('❌ Now unavailable:\n\n📅 Monday 1st January:\n🏸 19:00 - 19:40 (40min)')]
+
+
+class FakeBot:
+	def __init__(self, latency: float, blocked: set[int] = frozenset(), retry_after_at: int = None):
+		self.latency = latency
+		self.blocked = blocked
+		self.retry_after_at = retry_after_at
+		self.send_times: list[float] = []
+
+	async def send_message(self, chat_id: int, text: str) -> Message:
+		await asyncio.sleep(self.latency)
+		if chat_id in self.blocked:
+			raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text=text), 'bot was blocked by the user')
+		if len(self.send_times) == self.retry_after_at:
+			self.retry_after_at = None
+			raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), 'Too Many Requests', 1)
+		self.send_times.append(time.perf_counter())
+		return Message.model_construct(message_id=len(self.send_times))
+
+
+async def sequential(bot: FakeBot, users: list[int]) -> None:
+	"""The previous loop: each user in turn, each message awaited before the next."""
+	for user_id in users:
+		for message in MESSAGES:
+			try:
+				await bot.send_message(user_id, message.text)
+			except TelegramForbiddenError:
+				break
+
+
+def report(label: str, bot: FakeBot, elapsed: float) -> None:
+	print(f'{label:<22} {len(bot.send_times):6d} delivered in {elapsed:6.2f}s  '
+		  f'{len(bot.send_times) / elapsed:8.1f} msg/s')
+
+
+async def main(user_count: int, latency: float) -> int:
+	users = list(range(user_count))
+	blocked = set(users[::50])
+
+	bot = FakeBot(latency, blocked)
+	start = time.perf_counter()
+	await sequential(bot, users)
+	report('sequential', bot, time.perf_counter() - start)
+
+	bot = FakeBot(latency, blocked, retry_after_at=user_count // 2)
+	# Limits lifted, to show what concurrency alone buys
+	dispatcher = NotificationDispatcher(bot, global_rate=10_000, global_burst=10_000)
+	start = time.perf_counter()
+	result = await dispatcher.dispatch(dict.fromkeys(users, MESSAGES))
+	report('dispatcher (unlimited)', bot, time.perf_counter() - start)
+	print(f'  {result}')
+
+	failures = []
+	if result.blocked != blocked:
+		failures.append('every blocked user was reported')
+	if result.delivered != 2 * (user_count - len(blocked)):
+		failures.append('every other user received both messages')
+
+	bot = FakeBot(latency)
+	dispatcher = NotificationDispatcher(bot)
+	rate, burst = dispatcher.rate_limiter.rate, dispatcher.rate_limiter.capacity
+	start = time.perf_counter()
+	await dispatcher.dispatch(dict.fromkeys(users[:100], MESSAGES))
+	report(f'dispatcher ({rate:g}/s)', bot, time.perf_counter() - start)
+
+	times = bot.send_times
+	busiest = max(sum(1 for t in times if first <= t < first + 1) for first in times)
+	print(f'  busiest second: {busiest} messages')
+	if busiest > rate + burst:
+		failures.append('the global rate limit was respected')
+
+	for failure in failures:
+		print(f'FAIL: {failure}')
+	return 1 if failures else 0
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--users', type=int, default=200)
+	parser.add_argument('--latency', type=float, default=0.02)
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.WARNING)
+	sys.exit(asyncio.run(main(args.users, args.latency)))
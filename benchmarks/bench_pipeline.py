@@ -0,0 +1,95 @@
+"""
+Compares fetching every key before storing any of them against the staged update pipeline.
+
+The stub server answers with a random delay, so a few slow venues decide when the whole batch
+path can store anything. Each round serves a different number of slots, so every response has
+changed and is parsed and written. For each path the time to the first published change and the
+mean and worst freshness (from a key's fetch starting to its changes being published) are reported.
+
+Usage: PYTHONPATH=. python benchmarks/bench_pipeline.py [--latency 0.02] [--jitter 0.3] [--rounds 3]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.stub_server import StubServer
+from src.models import CourtChanges
+from src.services.better_client import BetterApiClient
+from src.services.court_database import CourtDatabase
+from src.services.court_fetcher import CourtFetcher
+from src.services.fetch_scheduler import FetchScheduler
+from src.services.update_pipeline import StageMetrics, UpdatePipeline
+
+
+async def run_batch(fetcher: CourtFetcher, database: CourtDatabase) -> tuple[float, StageMetrics]:
+	keys = fetcher.all_keys()
+	start = time.perf_counter()
+	results = await fetcher.fetch_keys(keys)
+	changed = {key: batch for key, batch in results.items() if batch is not None}
+	courts = [court for batch in changed.values() for court in batch]
+	await asyncio.to_thread(database.insert, courts, list(changed))
+	published = time.perf_counter() - start
+
+	# Every key was fetched at the start and published at the end
+	freshness = StageMetrics()
+	for _ in changed:
+		freshness.observe(published)
+	return published, freshness
+
+
+async def run_pipeline(fetcher: CourtFetcher, database: CourtDatabase) -> tuple[float, StageMetrics]:
+	published_at = []
+
+	def publish(changes: CourtChanges) -> None:
+		published_at.append(time.perf_counter())
+
+	pipeline = UpdatePipeline(
+		fetcher,
+		FetchScheduler(fetcher.venue_slugs, fetcher.category_slugs),
+		store=database.insert,
+		publish=publish
+	)
+	start = time.perf_counter()
+	await pipeline.run(fetcher.all_keys())
+	return min(published_at) - start, pipeline.metrics['freshness']
+
+
+async def main(latency: float, jitter: float, rounds: int) -> None:
+	database = CourtDatabase(os.path.join(tempfile.mkdtemp(), 'courts.db'))
+
+	with StubServer(latency=latency, jitter=jitter) as stub:
+		fetcher = CourtFetcher()
+		fetcher.API_URL = stub.api_url
+		fetcher.client = BetterApiClient(CourtFetcher.HEADERS, rate=1000, burst=1000)
+
+		runs = 0
+		for label, run in (('fetch all, then store', run_batch), ('pipeline', run_pipeline)):
+			firsts, freshness = [], StageMetrics()
+			for _ in range(rounds):
+				# Alternate the number of slots, so every response has changed since the last run
+				stub.slots = (8, 12)[runs % 2]
+				runs += 1
+				first, fresh = await run(fetcher, database)
+				firsts.append(first)
+				freshness.count += fresh.count
+				freshness.total_seconds += fresh.total_seconds
+				freshness.max_seconds = max(freshness.max_seconds, fresh.max_seconds)
+			print(f'{label:<22} first_publish={statistics.mean(firsts) * 1000:7.0f}ms  '
+				  f'freshness {freshness}')
+
+		await fetcher.close()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--latency', type=float, default=0.02, help='Stub server base latency per request in seconds')
+	parser.add_argument('--jitter', type=float, default=0.3, help='Extra random latency of up to this many seconds')
+	parser.add_argument('--rounds', type=int, default=3)
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.WARNING)
+	asyncio.run(main(args.latency, args.jitter, args.rounds))
@@ -0,0 +1,65 @@
+"""
+The pydantic model that used to validate each court of a Better API response before it became a Court.
+
+Responses are now validated by Court.from_payload, and nothing in src/ uses pydantic. This is kept only
+so the benchmarks can compare against it.
+"""
+from datetime import date, time
+
+from pydantic import BaseModel, field_validator
+
+from src.models import Court
+
+
+class CourtPayload(BaseModel):
+	"""
+	A court as returned by the Better API, validated and then converted to a Court.
+	"""
+	composite_key: str
+	venue_slug: str
+	category_slug: str
+	name: str
+
+	date: date
+	starts_at: time
+	ends_at: time
+	duration: str
+
+	price: str
+	spaces: int
+
+	class Config:
+		frozen = True
+
+	@field_validator('date', mode='before')
+	@classmethod
+	def parse_court_date(cls, v) -> date:
+		return date.fromisoformat(v)
+
+	@field_validator('starts_at', 'ends_at', mode='before')
+	@classmethod
+	def parse_times(cls, v) -> time:
+		return time.fromisoformat(v['format_24_hour']) \
+			if isinstance(v, dict) \
+			else time.fromisoformat(v)
+
+	@field_validator('price', mode='before')
+	@classmethod
+	def parse_price(cls, v) -> str:
+		return v['formatted_amount'] \
+			if isinstance(v, dict) \
+			else v
+
+	def to_court(self) -> Court:
+		return Court(
+			self.composite_key,
+			self.venue_slug,
+			self.category_slug,
+			self.name,
+			self.date,
+			self.starts_at,
+			self.ends_at,
+			self.duration,
+			self.price,
+			self.spaces
+		)
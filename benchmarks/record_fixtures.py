@@ -0,0 +1,50 @@
+"""
+Records a live `times` response from the Better API as a fixture for the stub server to replay.
+
+The API answers in one of two forms, a list of courts or a dict of them keyed by index, and the
+response is saved as benchmarks/fixtures/times_<form>.json for whichever form it came back in.
+Only run this by hand: it is the one script here that talks to the real service.
+
+Usage: PYTHONPATH=. python benchmarks/record_fixtures.py [--venue sugden-sports-centre] [--date 2025-05-12]
+"""
+import argparse
+import json
+import os
+from datetime import date, timedelta
+
+from requests import Session
+
+from benchmarks.stub_server import FIXTURES_DIR
+from src.services.court_fetcher import CourtFetcher
+from src.utils.constants import BADMINTON_40MIN, BADMINTON_60MIN, VENUE_MAP
+
+
+def record(venue_slug: str, category_slug: str, day: date) -> str:
+	session = Session()
+	session.headers.update(CourtFetcher.HEADERS)
+	response = session.get(
+		CourtFetcher.API_URL.format(venue_slug=venue_slug, category_slug=category_slug),
+		params={'date': day.isoformat()},
+		timeout=10
+	)
+	response.raise_for_status()
+	payload = response.json()
+
+	# Make sure the fixture is something the fetcher can actually parse before keeping it
+	CourtFetcher._parse(payload['data'])
+	form = 'dict' if isinstance(payload['data'], dict) else 'list'
+	path = os.path.join(FIXTURES_DIR, f'times_{form}.json')
+	with open(path, 'w', encoding='utf-8') as f:
+		json.dump(payload, f, indent=2, ensure_ascii=False)
+		f.write('\n')
+	return path
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--venue', default=next(iter(VENUE_MAP)), choices=tuple(VENUE_MAP))
+	parser.add_argument('--category', default=BADMINTON_40MIN, choices=(BADMINTON_40MIN, BADMINTON_60MIN))
+	parser.add_argument('--date', type=date.fromisoformat, default=date.today() + timedelta(days=1))
+	args = parser.parse_args()
+
+	print(f'Recorded {record(args.venue, args.category, args.date)}')
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+API_PATH = '/api/activities/venue/{venue_slug}/activity/{category_slug}/times'
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def build_times_payload(venue_slug: str, category_slug: str, date: str, slots: int = 14, form: str = 'list') -> dict:
+	"""
+	Builds a payload shaped like the Better `times` endpoint, in either its list or dict form.
+	"""
+	minutes = 40 if '40' in category_slug else 60
+	start = datetime.fromisoformat(f'{date}T07:00')
+	courts = []
+
+	for i in range(slots):
+		starts_at = start + timedelta(minutes=minutes * i)
+		ends_at = starts_at + timedelta(minutes=minutes)
+		courts.append({
+			'composite_key': f'{venue_slug}-{category_slug}-{date}-{starts_at:%H%M}',
+			'venue_slug': venue_slug,
+			'category_slug': category_slug,
+			'name': 'Badminton',
+			'date': date,
+			'starts_at': {'format_12_hour': f'{starts_at:%I:%M%p}', 'format_24_hour': f'{starts_at:%H:%M}'},
+			'ends_at': {'format_12_hour': f'{ends_at:%I:%M%p}', 'format_24_hour': f'{ends_at:%H:%M}'},
+			'duration': f'{minutes}min',
+			'price': {'is_estimated': False, 'formatted_amount': '£9.50'},
+			'spaces': i % 3
+		})
+
+	if form == 'dict':
+		return {'data': {str(i): court for i, court in enumerate(courts)}}
+	return {'data': courts}
+
+
+def load_fixture(form: str) -> dict:
+	"""
+	Loads a recorded `times` payload in the given form, see benchmarks/record_fixtures.py.
+	"""
+	with open(os.path.join(FIXTURES_DIR, f'times_{form}.json'), encoding='utf-8') as f:
+		return json.load(f)
+
+
+def replay_times_payload(fixture: dict, venue_slug: str, category_slug: str, date: str, revision: int = 0) -> dict:
+	"""
+	Re-keys a recorded payload to the requested venue, category and date, keeping its form. Each revision
+	shifts every court's spaces, so the body changes as it would when courts are booked or released.
+	"""
+	data = fixture['data']
+	courts = []
+	for court in (data.values() if isinstance(data, dict) else data):
+		starts_at = court['starts_at']['format_24_hour'] if isinstance(court['starts_at'], dict) else court['starts_at']
+		courts.append(court | {
+			'composite_key': f'{venue_slug}-{category_slug}-{date}-{starts_at.replace(":", "")}',
+			'venue_slug': venue_slug,
+			'category_slug': category_slug,
+			'date': date,
+			'spaces': (court['spaces'] + revision) % 3
+		})
+
+	if isinstance(data, dict):
+		return {'data': dict(zip(data, courts))}
+	return {'data': courts}
+
+
+class StubServer:
+	"""
+	A local stand-in for the Better API, serving generated `times` payloads after a delay of `latency`
+	plus up to `jitter` seconds. Given a recorded `fixture`, every venue/category/date replays it instead.
+	"""
+
+	def __init__(
+			self,
+			latency: float = 0.05,
+			slots: int = 14,
+			form: str = 'list',
+			etags: bool = True,
+			jitter: float = 0,
+			fixture: dict | None = None
+	):
+		self.latency = latency
+		self.jitter = jitter
+		self.fixture = fixture
+		self.revision = 0
+		self.slots = slots
+		self.form = form
+		self.etags = etags
+		self.request_count = 0
+		self.request_times: list[float] = []
+
+		# Failure injection: requests for matching venues are answered with failure_status
+		self.failure_status: int | None = None
+		self.failure_venues: set[str] | None = None
+		self.failures_remaining: int | None = None
+		self.retry_after: str | None = None
+		self._lock = threading.Lock()
+		self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+		self._server.daemon_threads = True
+		self._thread: threading.Thread | None = None
+
+	@property
+	def api_url(self) -> str:
+		host, port = self._server.server_address
+		return f'http://{host}:{port}{API_PATH}'
+
+	def fail(
+			self,
+			status: int = 503,
+			venues: set[str] | None = None,
+			count: int | None = None,
+			retry_after: str | None = None
+	) -> None:
+		"""
+		Starts failing requests with the given status, for the given venues (or all) and count (or until recover()).
+		"""
+		with self._lock:
+			self.failure_status = status
+			self.failure_venues = venues
+			self.failures_remaining = count
+			self.retry_after = retry_after
+
+	def recover(self) -> None:
+		with self._lock:
+			self.failure_status = None
+
+	def _should_fail(self, venue_slug: str) -> bool:
+		with self._lock:
+			if self.failure_status is None:
+				return False
+			if self.failure_venues is not None and venue_slug not in self.failure_venues:
+				return False
+			if self.failures_remaining is not None:
+				if self.failures_remaining <= 0:
+					return False
+				self.failures_remaining -= 1
+			return True
+
+	def __enter__(self) -> 'StubServer':
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def __exit__(self, *exc) -> None:
+		self._server.shutdown()
+		self._server.server_close()
+
+	def _make_handler(self):
+		stub = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = 'HTTP/1.1'
+
+			def do_GET(self):
+				with stub._lock:
+					stub.request_count += 1
+					stub.request_times.append(time.monotonic())
+
+				url = urlparse(self.path)
+				parts = url.path.strip('/').split('/')
+				venue_slug, category_slug = parts[3], parts[5]
+				date = parse_qs(url.query)['date'][0]
+
+				time.sleep(stub.latency + random.uniform(0, stub.jitter))
+				if stub._should_fail(venue_slug):
+					self.send_response(stub.failure_status)
+					if stub.retry_after is not None:
+						self.send_header('Retry-After', stub.retry_after)
+					self.send_header('Content-Length', '0')
+					self.end_headers()
+					return
+				if stub.fixture is not None:
+					payload = replay_times_payload(stub.fixture, venue_slug, category_slug, date, stub.revision)
+				else:
+					payload = build_times_payload(venue_slug, category_slug, date, stub.slots, stub.form)
+				body = json.dumps(payload).encode()
+				etag = f'"{hashlib.md5(body).hexdigest()}"'
+
+				if stub.etags and self.headers.get('If-None-Match') == etag:
+					self.send_response(304)
+					self.send_header('ETag', etag)
+					self.end_headers()
+					return
+
+				self.send_response(200)
+				self.send_header('Content-Type', 'application/json')
+				if stub.etags:
+					self.send_header('ETag', etag)
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, format, *args):
+				pass
+
+		return Handler
@@ -0,0 +1,206 @@
+"""
+Runs the update cycle, bot queries and notification fan-out against recorded Better API payloads at
+1x, 10x and 100x the real number of venues, and prints the results as JSON for comparing commits.
+
+Each scale and payload form runs in a fresh process, so singletons start empty and the peak memory
+reported is that run's alone. The stub server replays benchmarks/fixtures/times_<form>.json for every
+venue/category/date. Every run does three forced updates: a cold one where every court is new, one
+where nothing changed (answered with 304s), and one where every court's spaces changed. The changes
+from the last are then matched against simulated subscribers and sent to a fake Telegram bot.
+
+Usage: PYTHONPATH=. python benchmarks/suite.py [--scales 1 10 100] [--forms list dict] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from benchmarks.bench_coalescing import make_subscriptions
+from benchmarks.bench_notifications import FakeBot
+from benchmarks.stub_server import StubServer, load_fixture
+from src.models import CourtChanges, Subscription
+from src.services.availability_history import AvailabilityHistory
+from src.services.availability_index import AvailabilityIndex
+from src.services.better_client import BetterApiClient
+from src.services.court_database import CourtDatabase
+from src.services.court_fetcher import CourtFetcher
+from src.services.court_updater import CourtUpdater
+from src.telegram_bot.notification_coalescer import NotificationCoalescer
+from src.telegram_bot.notification_dispatcher import NotificationDispatcher
+from src.telegram_bot.subscription_index import SubscriptionIndex
+from src.utils.constants import TIME_RANGES, VENUE_MAP
+from src.utils.court_formatter import format_court_availability
+
+
+def venue_slugs_for(scale: int) -> list[str]:
+	# Copies of the real venues, so every scale keeps the same mix
+	return [venue if i == 0 else f'{venue}-{i}' for i in range(scale) for venue in VENUE_MAP]
+
+
+async def time_update(updater: CourtUpdater) -> dict:
+	start = time.perf_counter()
+	await updater.update(force=True)
+	elapsed = time.perf_counter() - start
+	keys = len(updater.court_fetcher.all_keys())
+	return {'seconds': round(elapsed, 4), 'keys_per_second': round(keys / elapsed, 1)}
+
+
+def time_queries(queries: int) -> dict:
+	index = AvailabilityIndex()
+	today = date.today()
+	paths = {
+		'all': lambda: index.get_all_available(),
+		'by_date': lambda: index.get_available_by_date(today + timedelta(days=random.randrange(6))),
+		'by_time_range': lambda: index.get_available_by_time_range(random.choice(list(TIME_RANGES.values()))),
+	}
+
+	results = {}
+	for name, query in paths.items():
+		latencies = []
+		for _ in range(queries):
+			start = time.perf_counter()
+			format_court_availability(query())
+			latencies.append(time.perf_counter() - start)
+		latencies.sort()
+		results[name] = {
+			'p50_ms': round(statistics.median(latencies) * 1000, 3),
+			'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+			'max_ms': round(latencies[-1] * 1000, 3)
+		}
+	return results
+
+
+async def time_fan_out(changes: CourtChanges, venue_slugs: list[str], users: int) -> dict:
+	subscriptions = [
+		# Pin some subscribers to the copies of the venues as well as the real ones
+		Subscription(s.user_id, (random.choice(venue_slugs),) if s.venues else (), s.categories, s.weekdays, s.time_ranges)
+		for s in make_subscriptions(users)
+	]
+
+	start = time.perf_counter()
+	index = SubscriptionIndex(subscriptions)
+	available_by_user, unavailable_by_user = index.match(changes.now_available), index.match(changes.now_unavailable)
+	coalescer = NotificationCoalescer(window=0)
+	for user_id in available_by_user.keys() | unavailable_by_user.keys():
+		coalescer.add(user_id, available_by_user.get(user_id, []), unavailable_by_user.get(user_id, []), 0)
+	recipients = coalescer.flush_due(0)
+	matched = time.perf_counter() - start
+
+	# Limits lifted, so this measures the fan-out itself rather than Telegram's rate limits
+	dispatcher = NotificationDispatcher(FakeBot(latency=0), global_rate=1e9, global_burst=1e9, per_chat_burst=1e9)
+	start = time.perf_counter()
+	result = await dispatcher.dispatch(recipients)
+	dispatched = time.perf_counter() - start
+
+	return {
+		'users': users,
+		'notified': len(recipients),
+		'messages': result.delivered,
+		'match_seconds': round(matched, 4),
+		'dispatch_seconds': round(dispatched, 4),
+		'messages_per_second': round(result.delivered / dispatched, 1) if dispatched else None
+	}
+
+
+async def run(scale: int, form: str, users_per_venue: int, queries: int) -> dict:
+	venue_slugs = venue_slugs_for(scale)
+	with StubServer(latency=0, fixture=load_fixture(form)) as stub:
+		published: list[CourtChanges] = []
+		updater = CourtUpdater(venue_slugs, publish=published.append)
+		updater.court_fetcher.API_URL = stub.api_url
+		# Lift the client's rate limit so the update cycle itself is measured
+		updater.court_fetcher.client = BetterApiClient(CourtFetcher.HEADERS, rate=1e9, burst=1e9)
+		updater.load_availability_index()
+
+		update = {'cold': await time_update(updater), 'unchanged': await time_update(updater)}
+		# Only the changes of the next update are notified
+		published.clear()
+		stub.revision += 1
+		update['changed'] = await time_update(updater)
+
+		changes = CourtChanges()
+		for batch in published:
+			changes.now_available.extend(batch.now_available)
+			changes.now_unavailable.extend(batch.now_unavailable)
+		update['changed']['changes'] = len(changes.now_available) + len(changes.now_unavailable)
+
+		courts = len(AvailabilityIndex().get_all_available())
+		result = {
+			'scale': scale,
+			'form': form,
+			'venues': len(venue_slugs),
+			'keys': len(updater.court_fetcher.all_keys()),
+			'available_courts': courts,
+			'update': update,
+			'queries': time_queries(queries),
+			'notifications': await time_fan_out(changes, venue_slugs, users_per_venue * len(venue_slugs)),
+		}
+		await updater.close()
+
+	result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+	return result
+
+
+def run_in_process(scale: int, form: str, users_per_venue: int, queries: int) -> dict:
+	logging.basicConfig(level=logging.WARNING)
+	random.seed(0)
+	tmp = tempfile.mkdtemp()
+	# Point the singletons at throwaway databases before anything else creates them
+	CourtDatabase(os.path.join(tmp, 'courts.db'))
+	AvailabilityHistory(os.path.join(tmp, 'history.db'))
+	return asyncio.run(run(scale, form, users_per_venue, queries))
+
+
+def peak_rss_mb() -> float:
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# Kilobytes on Linux, bytes on macOS
+	return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_commit() -> Optional[str]:
+	try:
+		return subprocess.run(('git', 'rev-parse', 'HEAD'), capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--scales', type=int, nargs='+', default=(1, 10, 100))
+	parser.add_argument('--forms', nargs='+', choices=('list', 'dict'), default=('list', 'dict'))
+	parser.add_argument('--users-per-venue', type=int, default=25)
+	parser.add_argument('--queries', type=int, default=200, help='bot queries to time per query path')
+	parser.add_argument('--output', help='a file to write the JSON results to instead of printing them')
+	args = parser.parse_args()
+
+	context = multiprocessing.get_context('spawn')
+	results = []
+	for scale in args.scales:
+		for form in args.forms:
+			with context.Pool(1) as pool:
+				results.append(pool.apply(run_in_process, (scale, form, args.users_per_venue, args.queries)))
+			print(f'{scale}x {form}: done', file=sys.stderr)
+
+	report = json.dumps({
+		'commit': current_commit(),
+		'python': platform.python_version(),
+		'recorded_at': datetime.now().isoformat(timespec='seconds'),
+		'results': results
+	}, indent=2)
+	if args.output:
+		with open(args.output, 'w') as f:
+			f.write(report + '\n')
+	else:
+		print(report)
@@ -0,0 +1,275 @@
+"""
+Analytics and exports over the court and availability history databases.
+
+Every command streams rows from SQLite cursors a batch at a time and folds them into per-court
+summaries one court at a time, so memory stays flat however long the history is. Results are
+printed as a table, or written to a .csv or .parquet file with --output (Parquet needs pyarrow).
+
+Usage:
+	PYTHONPATH=. python src/cli.py occupancy [--since 2025-01-01] [--until 2025-04-01] [--output occupancy.csv]
+	PYTHONPATH=. python src/cli.py sell-out [--output sell_out.parquet]
+	PYTHONPATH=. python src/cli.py busiest-hours [--top 3]
+	PYTHONPATH=. python src/cli.py export history|courts --output history.parquet
+"""
+import argparse
+import csv
+import logging
+import sqlite3
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from itertools import chain, groupby, islice
+from typing import Iterable, Iterator, Optional
+
+from src.services.availability_history import AvailabilityHistory, HistoryPoint
+from src.utils.constants import COURTS_DB_PATH, HISTORY_DB_PATH
+
+BATCH_SIZE = 10_000
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+@dataclass(slots=True)
+class CourtSummary:
+	"""
+	Everything the reports need to know about one court, folded from its change points.
+	"""
+	venue_slug: str
+	category_slug: str
+	date: date
+	starts_at: time
+	first_available_at: Optional[datetime] = None
+	sold_out_at: Optional[datetime] = None
+	peak_spaces: int = 0
+	final_spaces: int = 0
+
+	@property
+	def booked(self) -> int:
+		return self.peak_spaces - self.final_spaces
+
+
+def iter_summaries(points: Iterable[HistoryPoint], now: datetime) -> Iterator[CourtSummary]:
+	"""
+	Folds points ordered by court, as AvailabilityHistory.iter_points yields them, into one summary per
+	court that has started. Courts yet to start are skipped, as their final number of spaces is not known.
+	"""
+	for _, court_points in groupby(points, key=lambda point: point.composite_key):
+		first = next(court_points)
+		if datetime.combine(first.date, first.starts_at) > now:
+			continue
+
+		summary = CourtSummary(first.venue_slug, first.category_slug, first.date, first.starts_at)
+		for point in chain((first,), court_points):
+			if point.spaces > 0 and summary.first_available_at is None:
+				summary.first_available_at = point.observed_at
+			elif point.spaces == 0 and summary.first_available_at is not None and summary.sold_out_at is None:
+				summary.sold_out_at = point.observed_at
+			summary.peak_spaces = max(summary.peak_spaces, point.spaces)
+			summary.final_spaces = point.spaces
+		yield summary
+
+
+def occupancy(summaries: Iterable[CourtSummary]) -> Iterator[tuple]:
+	"""
+	The share of spaces booked and of courts that sold out, by venue and category.
+	"""
+	totals = defaultdict(lambda: [0, 0, 0, 0])
+	for summary in summaries:
+		total = totals[(summary.venue_slug, summary.category_slug)]
+		total[0] += 1
+		total[1] += summary.final_spaces == 0
+		total[2] += summary.booked
+		total[3] += summary.peak_spaces
+
+	for (venue_slug, category_slug), (courts, sold_out, booked, peak) in sorted(totals.items()):
+		yield venue_slug, category_slug, courts, round(sold_out / courts, 3), round(booked / peak, 3) if peak else None
+
+
+def sell_out(summaries: Iterable[CourtSummary]) -> Iterator[tuple]:
+	"""
+	The average hours from a court first being bookable to selling out, by venue, category, weekday and time.
+	"""
+	totals = defaultdict(lambda: [0, 0, 0.0])
+	for summary in summaries:
+		if summary.first_available_at is None:
+			continue
+		total = totals[(summary.venue_slug, summary.category_slug, summary.date.weekday(), summary.starts_at)]
+		total[0] += 1
+		if summary.sold_out_at is not None:
+			total[1] += 1
+			total[2] += (summary.sold_out_at - summary.first_available_at).total_seconds() / 3600
+
+	for (venue_slug, category_slug, weekday, starts_at), (courts, sold_out, hours) in sorted(totals.items()):
+		yield (venue_slug, category_slug, WEEKDAY_NAMES[weekday], starts_at.strftime('%H:%M'), courts, sold_out,
+			   round(hours / sold_out, 1) if sold_out else None)
+
+
+def busiest_hours(summaries: Iterable[CourtSummary], top: int) -> Iterator[tuple]:
+	"""
+	The hours of the day whose courts are most heavily booked at each venue.
+	"""
+	totals = defaultdict(lambda: [0, 0])
+	for summary in summaries:
+		total = totals[(summary.venue_slug, summary.starts_at.hour)]
+		total[0] += summary.booked
+		total[1] += summary.peak_spaces
+
+	by_venue = defaultdict(list)
+	for (venue_slug, hour), (booked, peak) in totals.items():
+		if peak:
+			by_venue[venue_slug].append((round(booked / peak, 3), hour, booked))
+
+	for venue_slug, hours in sorted(by_venue.items()):
+		for rank, (rate, hour, booked) in enumerate(sorted(hours, reverse=True)[:top], start=1):
+			yield venue_slug, rank, f'{hour:02d}:00', booked, rate
+
+
+def iter_courts(db_path: str, batch_size: int = BATCH_SIZE) -> Iterator[tuple]:
+	"""
+	Yields the current courts, a batch at a time. Raises sqlite3.Error straight away if they can't be read.
+	"""
+	conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+	try:
+		# Starts and ends are stored as minutes since the epoch in local time, so read them back as such
+		cursor = conn.execute('''
+			SELECT
+				composite_key,
+				venue_slug,
+				category_slug,
+				name,
+				date(starts_at * 60, 'unixepoch'),
+				strftime('%H:%M', starts_at * 60, 'unixepoch'),
+				strftime('%H:%M', ends_at * 60, 'unixepoch'),
+				duration,
+				price_pence,
+				price_text,
+				spaces
+			FROM courts
+			ORDER BY starts_at, composite_key
+		''')
+	except sqlite3.Error:
+		conn.close()
+		raise
+	return _fetch_batches(conn, cursor, batch_size)
+
+
+def _fetch_batches(conn: sqlite3.Connection, cursor: sqlite3.Cursor, batch_size: int) -> Iterator[tuple]:
+	try:
+		while rows := cursor.fetchmany(batch_size):
+			yield from rows
+	finally:
+		conn.close()
+
+
+def write(header: tuple[str, ...], rows: Iterable[tuple], output: Optional[str]) -> None:
+	if output is None:
+		_print_table(header, rows)
+	elif output.endswith('.csv'):
+		with open(output, 'w', newline='') as f:
+			writer = csv.writer(f)
+			writer.writerow(header)
+			writer.writerows(rows)
+	elif output.endswith('.parquet'):
+		_write_parquet(header, rows, output)
+	else:
+		raise ValueError(f'Unsupported output format: {output}, expected .csv or .parquet')
+
+
+def _print_table(header: tuple[str, ...], rows: Iterable[tuple]) -> None:
+	print('\t'.join(header))
+	for row in rows:
+		print('\t'.join('' if value is None else str(value) for value in row))
+
+
+def _write_parquet(header: tuple[str, ...], rows: Iterable[tuple], output: str) -> None:
+	try:
+		import pyarrow as pa
+		import pyarrow.parquet as pq
+	except ImportError:
+		raise ValueError('Writing Parquet needs pyarrow, install it with `pip install pyarrow`')
+
+	rows = iter(rows)
+	writer = None
+	try:
+		# Row groups are written a batch at a time, so only one batch is ever held in memory
+		while batch := list(islice(rows, BATCH_SIZE)):
+			table = pa.Table.from_pylist(
+				[dict(zip(header, row)) for row in batch],
+				schema=writer.schema if writer else None
+			)
+			if writer is None:
+				writer = pq.ParquetWriter(output, table.schema)
+			writer.write_table(table)
+	finally:
+		if writer is not None:
+			writer.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+	# Options every command takes, so they can follow the command name as the usage shows
+	common = argparse.ArgumentParser(add_help=False)
+	common.add_argument('--history-db', default=HISTORY_DB_PATH)
+	common.add_argument('--courts-db', default=COURTS_DB_PATH)
+	common.add_argument('--since', type=date.fromisoformat, help='first date of observations to include')
+	common.add_argument('--until', type=date.fromisoformat, help='date to stop including observations at')
+	common.add_argument('--output', help='a .csv or .parquet file to write to instead of printing')
+
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	commands = parser.add_subparsers(dest='command', required=True)
+	commands.add_parser('occupancy', parents=[common], help='share of spaces booked by venue and category')
+	commands.add_parser('sell-out', parents=[common], help='average time for courts to sell out by weekday and time')
+	busiest = commands.add_parser('busiest-hours', parents=[common], help='most heavily booked hours at each venue')
+	busiest.add_argument('--top', type=int, default=5)
+	export = commands.add_parser('export', parents=[common], help='raw history change points, or the current courts')
+	export.add_argument('table', choices=('history', 'courts'))
+	return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+	parser = build_parser()
+	args = parser.parse_args(argv)
+
+	logging.basicConfig(level=logging.WARNING)
+
+	if args.command == 'export' and args.table == 'courts':
+		header = ('composite_key', 'venue_slug', 'category_slug', 'name', 'date', 'starts_at', 'ends_at',
+				  'duration', 'price_pence', 'price_text', 'spaces')
+		try:
+			rows = iter_courts(args.courts_db)
+		except sqlite3.Error as e:
+			print(f'Cannot read {args.courts_db}: {e}', file=sys.stderr)
+			return 1
+	else:
+		since = datetime.combine(args.since, time()) if args.since else None
+		until = datetime.combine(args.until, time()) if args.until else None
+		try:
+			# Read-only, so a mistyped path fails rather than creating an empty database
+			points = AvailabilityHistory.read_points(args.history_db, since, until, batch_size=BATCH_SIZE)
+		except sqlite3.Error as e:
+			print(f'Cannot read {args.history_db}: {e}', file=sys.stderr)
+			return 1
+		summaries = iter_summaries(points, datetime.now())
+
+		if args.command == 'occupancy':
+			header = ('venue', 'category', 'courts', 'sold_out_rate', 'occupancy_rate')
+			rows = occupancy(summaries)
+		elif args.command == 'sell-out':
+			header = ('venue', 'category', 'weekday', 'starts_at', 'courts', 'sold_out', 'avg_hours_to_sell_out')
+			rows = sell_out(summaries)
+		elif args.command == 'busiest-hours':
+			header = ('venue', 'rank', 'hour', 'spaces_booked', 'occupancy_rate')
+			rows = busiest_hours(summaries, args.top)
+		else:
+			header = HistoryPoint._fields
+			rows = points
+
+	try:
+		write(header, rows, args.output)
+	except ValueError as e:
+		print(e, file=sys.stderr)
+		return 1
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -1,14 +1,22 @@
 import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
+from datetime import time
+from email.utils import parsedate_to_datetime
 from pathlib import Path
+from typing import Annotated, Optional
 
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from starlette.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from starlette.responses import FileResponse, Response
 
-from src.tasks import telegram_bot_task, court_updater_task
-from src.utils.constants import COURTS_ICS_PATH
+from src.services.availability_index import AvailabilityIndex
+from src.services.ics_feed_cache import FeedFilter, IcsFeedCache, RenderedFeed
+from src.tasks import telegram_bot_task, court_updater_task, ics_writer_task, worker_listener_task, \
+	loop_lag_monitor_task
+from src.utils.constants import CATEGORY_SLUGS, COURTS_ICS_PATH, VENUE_MAP
+from src.utils.metrics import METRICS_MEDIA_TYPE, render_metrics
 
 logging.basicConfig(
 	level=logging.INFO,
@@ -16,14 +24,22 @@ logging.basicConfig(
 	datefmt='%Y-%m-%d %H:%M:%S'
 )
 
+ICS_MEDIA_TYPE = 'text/calendar; charset=utf-8'
+
 background_tasks = []
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 	# Startup code
-	background_tasks.append(asyncio.create_task(court_updater_task()))
+	background_tasks.append(asyncio.create_task(ics_writer_task()))
+	if os.getenv('UPDATE_MODE') == 'workers':
+		# Courts are fetched and written by src/worker.py processes, this one only serves them
+		background_tasks.append(asyncio.create_task(worker_listener_task()))
+	else:
+		background_tasks.append(asyncio.create_task(court_updater_task()))
 	background_tasks.append(asyncio.create_task(telegram_bot_task()))
+	background_tasks.append(asyncio.create_task(loop_lag_monitor_task()))
 
 	yield
 
@@ -41,12 +57,79 @@ async def lifespan(app: FastAPI):
 app = FastAPI(lifespan=lifespan)
 
 
-@app.get('/badminton', response_class=FileResponse)
-async def get_badminton_courts_ics() -> FileResponse:
-	ics_file = Path(COURTS_ICS_PATH)
-	if ics_file.exists():
-		return FileResponse(ics_file)
-	raise HTTPException(status_code=404, detail='ICS file not found.')
+@app.get('/badminton')
+def get_badminton_courts_ics(
+		request: Request,
+		venue: Annotated[list[str], Query()] = (),
+		category: Annotated[list[str], Query()] = (),
+		time_from: Annotated[Optional[str], Query(alias='from')] = None,
+		time_to: Annotated[Optional[str], Query(alias='to')] = None,
+		days: Annotated[Optional[int], Query(ge=1)] = None,
+) -> Response:
+	"""
+	Serves the calendar of available courts, optionally filtered, e.g. ?venue=...&from=18:00&to=22:00&days=3.
+	"""
+	if not AvailabilityIndex().loaded:
+		# Nothing is in memory yet, so fall back to the last file written
+		ics_file = Path(COURTS_ICS_PATH)
+		if ics_file.exists():
+			return FileResponse(ics_file)
+		raise HTTPException(status_code=404, detail='ICS file not found.')
+
+	# Every distinct filter gets its own cached feed, so only accept ones that can match something
+	unknown = [slug for slug in venue if slug not in VENUE_MAP] + [slug for slug in category if slug not in CATEGORY_SLUGS]
+	if unknown:
+		raise HTTPException(status_code=400, detail=f'Unknown venue or category: {", ".join(unknown)}.')
+
+	try:
+		feed_filter = FeedFilter(
+			venues=tuple(sorted(set(venue))),
+			categories=tuple(sorted(set(category))),
+			time_from=time.fromisoformat(time_from) if time_from else None,
+			time_to=time.fromisoformat(time_to) if time_to else None,
+			days=days
+		)
+	except ValueError:
+		raise HTTPException(status_code=400, detail='Times must be in the format HH:MM.')
+
+	feed = IcsFeedCache().get(feed_filter)
+	headers = {
+		'ETag': feed.etag,
+		'Last-Modified': feed.last_modified,
+		'Cache-Control': 'no-cache',
+		'Vary': 'Accept-Encoding'
+	}
+
+	if _not_modified(request, feed):
+		return Response(status_code=304, headers=headers)
+
+	if 'gzip' in request.headers.get('accept-encoding', ''):
+		return Response(feed.gzipped, media_type=ICS_MEDIA_TYPE, headers=headers | {'Content-Encoding': 'gzip'})
+	return Response(feed.body, media_type=ICS_MEDIA_TYPE, headers=headers)
+
+
+@app.get('/metrics')
+async def get_metrics() -> Response:
+	"""
+	Serves the fetch, database, ICS, notification and event loop metrics in the Prometheus text format.
+	Async so the gauge functions, which read scheduler state, run on the event loop rather than a worker thread.
+	"""
+	return Response(render_metrics(), media_type=METRICS_MEDIA_TYPE)
+
+
+def _not_modified(request: Request, feed: RenderedFeed) -> bool:
+	if_none_match = request.headers.get('if-none-match')
+	if if_none_match is not None:
+		etags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+		return feed.etag in etags or '*' in etags
+
+	if_modified_since = request.headers.get('if-modified-since')
+	if if_modified_since is not None:
+		try:
+			return parsedate_to_datetime(feed.last_modified) <= parsedate_to_datetime(if_modified_since)
+		except (TypeError, ValueError):
+			return False
+	return False
 
 
 if __name__ == '__main__':
@@ -1,3 +1,5 @@
 from .court import Court
+from .court_changes import CourtChanges
+from .subscription import Subscription
 
-__all__ = ['Court']
\ No newline at end of file
+__all__ = ['Court', 'CourtChanges', 'Subscription']
\ No newline at end of file
@@ -0,0 +1,23 @@
+from dataclasses import dataclass, field
+
+from .court import Court
+
+
+@dataclass(frozen=True)
+class CourtChanges:
+	"""
+	The availability delta produced by a single database write.
+	"""
+	now_available: list[Court] = field(default_factory=list)
+	now_unavailable: list[Court] = field(default_factory=list)
+	# Still available, but with a different number of spaces
+	updated: list[Court] = field(default_factory=list)
+	# Started since they were last seen with spaces, so no longer bookable
+	expired: list[Court] = field(default_factory=list)
+
+	def __bool__(self) -> bool:
+		return bool(self.now_available or self.now_unavailable or self.updated or self.expired)
+
+	def __str__(self) -> str:
+		return (f'{len(self.now_available)} now available, {len(self.now_unavailable)} now unavailable, '
+				f'{len(self.updated)} updated, {len(self.expired)} expired')
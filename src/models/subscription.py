@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from datetime import time
+
+from .court import Court
+from ..utils.constants import TIME_RANGES, VENUE_MAP
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+WINDOWS = {name: (time.fromisoformat(starts), time.fromisoformat(ends)) for name, (starts, ends) in TIME_RANGES.items()}
+
+
+@dataclass(frozen=True)
+class Subscription:
+	"""
+	The courts a user wants to be notified about. Empty criteria match everything.
+	"""
+	user_id: int
+	venues: tuple[str, ...] = ()
+	categories: tuple[str, ...] = ()
+	# 0 is Monday, as in date.weekday()
+	weekdays: tuple[int, ...] = ()
+	# Names of TIME_RANGES
+	time_ranges: tuple[str, ...] = ()
+
+	def matches(self, court: Court) -> bool:
+		return (
+			(not self.venues or court.venue_slug in self.venues)
+			and (not self.categories or court.category_slug in self.categories)
+			and (not self.weekdays or court.date.weekday() in self.weekdays)
+			and (not self.time_ranges or any(
+				WINDOWS[name][0] <= court.starts_at and court.ends_at <= WINDOWS[name][1] for name in self.time_ranges
+			))
+		)
+
+	def to_dict(self) -> dict:
+		return {
+			'venues': list(self.venues),
+			'categories': list(self.categories),
+			'weekdays': list(self.weekdays),
+			'time_ranges': list(self.time_ranges)
+		}
+
+	@classmethod
+	def from_dict(cls, user_id: int, data: dict) -> 'Subscription':
+		return cls(
+			user_id,
+			tuple(data.get('venues', ())),
+			tuple(data.get('categories', ())),
+			tuple(data.get('weekdays', ())),
+			tuple(data.get('time_ranges', ()))
+		)
+
+	def __str__(self) -> str:
+		venues = ', '.join(VENUE_MAP[venue] for venue in self.venues) or 'any'
+		categories = ', '.join(category.rsplit('-', 1)[-1] for category in self.categories) or 'any'
+		weekdays = ', '.join(WEEKDAYS[weekday].title() for weekday in sorted(self.weekdays)) or 'any'
+		time_ranges = ', '.join(
+			f'{name} ({TIME_RANGES[name][0]} - {TIME_RANGES[name][1]})' for name in self.time_ranges
+		) or 'any'
+		return f'🏟️ Venues: {venues}\n⏱️ Durations: {categories}\n📅 Days: {weekdays}\n⏰ Times: {time_ranges}'
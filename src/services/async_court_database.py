@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from ..models import Court
+from .court_database import CourtDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCourtDatabase:
+	"""
+	Awaitable facade over CourtDatabase for use from the event loop.
+
+	Queries run on a small dedicated thread pool, each thread with its own WAL connection,
+	so a slow query never stalls other bot handlers or the HTTP server.
+	"""
+	_instance = None
+	_initialised = False
+
+	def __new__(cls, *args, **kwargs):
+		if cls._instance is None:
+			logger.debug('Creating a new instance of AsyncCourtDatabase')
+			cls._instance = super().__new__(cls)
+		return cls._instance
+
+	def __init__(self, max_workers: int = 2):
+		if self._initialised:
+			return
+		self.court_database = CourtDatabase()
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='court-db')
+		self._initialised = True
+
+	async def get_all_available(self) -> list[Court]:
+		return await self._run(self.court_database.get_all_available)
+
+	async def get_available_by_date(self, date: date) -> list[Court]:
+		return await self._run(self.court_database.get_available_by_date, date)
+
+	async def get_available_by_time_range(self, time_range: tuple[str, str]) -> list[Court]:
+		return await self._run(self.court_database.get_available_by_time_range, time_range)
+
+	async def _run(self, func, *args):
+		return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
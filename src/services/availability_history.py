@@ -0,0 +1,237 @@
+import logging
+import sqlite3
+import threading
+from datetime import date, datetime, time
+from typing import Iterator, NamedTuple, Optional
+
+from ..models import Court, CourtChanges
+from ..utils.constants import HISTORY_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryPoint(NamedTuple):
+	"""
+	A court's number of spaces from `observed_at` until its next point.
+	"""
+	composite_key: str
+	venue_slug: str
+	category_slug: str
+	date: date
+	starts_at: time
+	observed_at: datetime
+	spaces: int
+
+
+class AvailabilityHistory:
+	"""
+	An append-only log of the points at which each court's spaces changed, kept apart from the hot
+	courts table.
+
+	Courts are stored once in `slots` and referred to by an integer id, and change points are
+	(slot id, epoch seconds, spaces) rows in WITHOUT ROWID tables, one per calendar month. Retention
+	drops whole months, which is far cheaper than deleting rows one by one.
+	"""
+	_instance = None
+	_initialised = False
+
+	PRAGMAS = (
+		'PRAGMA journal_mode = WAL',
+		'PRAGMA synchronous = NORMAL',
+		'PRAGMA busy_timeout = 5000',
+	)
+	PARTITION_PREFIX = 'changes_'
+
+	def __new__(cls, *args, **kwargs):
+		if cls._instance is None:
+			logger.debug('Creating a new instance of AvailabilityHistory')
+			cls._instance = super().__new__(cls)
+		return cls._instance
+
+	def __init__(self, db_path: str = HISTORY_DB_PATH, retention_months: int = 6):
+		if self._initialised:
+			return
+		self.db_path = db_path
+		self.retention_months = retention_months
+		self._lock = threading.Lock()
+		self._conn = sqlite3.connect(db_path, check_same_thread=False)
+		for pragma in self.PRAGMAS:
+			self._conn.execute(pragma)
+		self._initialise()
+		# Ids of the slots written to recently, so that most records skip the lookup
+		self._slot_ids: dict[str, int] = {}
+		self._partitions = set(self._list_partitions(self._conn))
+		self._initialised = True
+
+	def _initialise(self) -> None:
+		with self._conn:
+			self._conn.execute('''
+				CREATE TABLE IF NOT EXISTS slots (
+					id INTEGER PRIMARY KEY,
+					composite_key TEXT NOT NULL UNIQUE,
+					venue_slug TEXT NOT NULL,
+					category_slug TEXT NOT NULL,
+					date TEXT NOT NULL,
+					starts_at TEXT NOT NULL
+				)
+			''')
+			self._conn.execute('CREATE INDEX IF NOT EXISTS idx_slots_date ON slots (date)')
+
+	def record(self, changes: CourtChanges, observed_at: datetime) -> None:
+		"""
+		Appends a point for every court whose spaces changed. Expired courts are skipped, as starting is
+		not a change in availability: their last point still says how many spaces went unsold.
+		"""
+		courts = changes.now_available + changes.now_unavailable + changes.updated
+		if not courts:
+			return
+
+		with self._lock, self._conn:
+			slot_ids = self._get_slot_ids(courts)
+			table = self._ensure_partition(observed_at)
+			self._conn.executemany(
+				f'INSERT OR REPLACE INTO {table} (slot_id, observed_at, spaces) VALUES (?, ?, ?)',
+				[(slot_ids[court.composite_key], int(observed_at.timestamp()), court.spaces) for court in courts]
+			)
+		logger.info(f'Recorded {len(courts)} availability changes')
+
+	def iter_points(
+			self,
+			since: Optional[datetime] = None,
+			until: Optional[datetime] = None,
+			batch_size: int = 1000
+	) -> Iterator[HistoryPoint]:
+		"""
+		Yields the change points observed in [since, until), ordered by court and then time, a batch at a time.
+		"""
+		with self._lock:
+			partitions = sorted(self._partitions)
+		# Reads get their own connection, so a long scan never holds up the writer
+		return self._iter_points(sqlite3.connect(self.db_path), partitions, since, until, batch_size)
+
+	@classmethod
+	def read_points(
+			cls,
+			db_path: str,
+			since: Optional[datetime] = None,
+			until: Optional[datetime] = None,
+			batch_size: int = 1000
+	) -> Iterator[HistoryPoint]:
+		"""
+		Like iter_points, but opens the database read-only without creating or setting it up, for reading
+		it from outside the process that writes it. Raises sqlite3.Error straight away if it can't be read.
+		"""
+		conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+		try:
+			partitions = sorted(cls._list_partitions(conn))
+			conn.execute('SELECT 1 FROM slots LIMIT 1')
+		except sqlite3.Error:
+			conn.close()
+			raise
+		return cls._iter_points(conn, partitions, since, until, batch_size)
+
+	@classmethod
+	def _iter_points(
+			cls,
+			conn: sqlite3.Connection,
+			partitions: list[str],
+			since: Optional[datetime],
+			until: Optional[datetime],
+			batch_size: int
+	) -> Iterator[HistoryPoint]:
+		"""
+		Reads points through the given connection, closing it once done.
+		"""
+		start = int(since.timestamp()) if since else 0
+		end = int(until.timestamp()) if until else 2 ** 62
+		tables = [
+			table for table in partitions
+			if not (since and table < cls._partition_name(since) or until and table > cls._partition_name(until))
+		]
+
+		try:
+			if not tables:
+				return
+			# A court's points can straddle two months, so the partitions are merged and sorted by SQLite,
+			# which spills to disk rather than holding everything in memory
+			points = ' UNION ALL '.join(
+				f'SELECT slot_id, observed_at, spaces FROM {table} WHERE observed_at >= :start AND observed_at < :end'
+				for table in tables
+			)
+			cursor = conn.execute(f'''
+				SELECT s.composite_key, s.venue_slug, s.category_slug, s.date, s.starts_at, c.observed_at, c.spaces
+				FROM ({points}) c JOIN slots s ON s.id = c.slot_id
+				ORDER BY c.slot_id, c.observed_at
+			''', {'start': start, 'end': end})
+			while rows := cursor.fetchmany(batch_size):
+				for row in rows:
+					yield HistoryPoint(
+						row[0], row[1], row[2], date.fromisoformat(row[3]), time.fromisoformat(row[4]),
+						datetime.fromtimestamp(row[5]), row[6]
+					)
+		finally:
+			conn.close()
+
+	def prune(self, today: Optional[date] = None) -> None:
+		"""
+		Drops the months older than the retention period, along with the courts that only they referred to.
+		"""
+		today = today or date.today()
+		month_index = today.year * 12 + today.month - 1 - self.retention_months
+		cutoff = date(month_index // 12, month_index % 12 + 1, 1)
+		oldest_kept = self._partition_name(datetime.combine(cutoff, time()))
+
+		with self._lock, self._conn:
+			for table in sorted(self._partitions):
+				if table < oldest_kept:
+					self._conn.execute(f'DROP TABLE {table}')
+					self._partitions.discard(table)
+					logger.info(f'Dropped history partition {table}')
+			self._conn.execute('DELETE FROM slots WHERE date < ?', (cutoff.isoformat(),))
+			# Slots of days gone by are never recorded again
+			self._slot_ids.clear()
+
+	def close(self) -> None:
+		self._conn.close()
+
+	def _get_slot_ids(self, courts: list[Court]) -> dict[str, int]:
+		missing = [court for court in courts if court.composite_key not in self._slot_ids]
+		if missing:
+			self._conn.executemany(
+				'''
+				INSERT INTO slots (composite_key, venue_slug, category_slug, date, starts_at)
+				VALUES (?, ?, ?, ?, ?)
+				ON CONFLICT(composite_key) DO NOTHING
+				''',
+				[(court.composite_key, court.venue_slug, court.category_slug, court.date.isoformat(),
+				  court.starts_at.strftime('%H:%M')) for court in missing]
+			)
+			for court in missing:
+				row = self._conn.execute('SELECT id FROM slots WHERE composite_key = ?', (court.composite_key,)).fetchone()
+				self._slot_ids[court.composite_key] = row[0]
+		return self._slot_ids
+
+	def _ensure_partition(self, observed_at: datetime) -> str:
+		table = self._partition_name(observed_at)
+		if table not in self._partitions:
+			self._conn.execute(f'''
+				CREATE TABLE IF NOT EXISTS {table} (
+					slot_id INTEGER NOT NULL,
+					observed_at INTEGER NOT NULL,
+					spaces INTEGER NOT NULL,
+					PRIMARY KEY (slot_id, observed_at)
+				) WITHOUT ROWID
+			''')
+			self._partitions.add(table)
+		return table
+
+	@classmethod
+	def _list_partitions(cls, conn: sqlite3.Connection) -> list[str]:
+		rows = conn.execute(
+			"SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?", (f'{cls.PARTITION_PREFIX}%',)
+		).fetchall()
+		return [row[0] for row in rows]
+
+	@classmethod
+	def _partition_name(cls, moment: datetime) -> str:
+		return f'{cls.PARTITION_PREFIX}{moment.year:04d}{moment.month:02d}'
@@ -0,0 +1,139 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from typing import Iterable
+
+from ..models import Court, CourtChanges
+from .court_database import QUERY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+Bucket = dict[str, Court]
+
+
+@dataclass(frozen=True, slots=True)
+class AvailabilitySnapshot:
+	generation: int = -1
+	courts: Bucket = field(default_factory=dict)
+	by_date: dict[date, Bucket] = field(default_factory=dict)
+	by_hour: dict[int, Bucket] = field(default_factory=dict)
+	by_venue: dict[str, Bucket] = field(default_factory=dict)
+
+
+class AvailabilityIndex:
+	"""
+	In-memory index of available courts by date, start hour and venue, serving bot queries without the database.
+
+	Each update swaps in a new immutable snapshot, so readers always see one consistent generation.
+	Patching copies only the buckets that an update touched.
+	"""
+	_instance = None
+	_initialised = False
+
+	def __new__(cls):
+		if cls._instance is None:
+			logger.debug('Creating a new instance of AvailabilityIndex')
+			cls._instance = super().__new__(cls)
+		return cls._instance
+
+	def __init__(self):
+		if self._initialised:
+			return
+		self._snapshot = AvailabilitySnapshot()
+		self._initialised = True
+
+	@property
+	def generation(self) -> int:
+		return self._snapshot.generation
+
+	@property
+	def loaded(self) -> bool:
+		return self._snapshot.generation >= 0
+
+	def rebuild(self, courts: Iterable[Court], generation: int) -> None:
+		courts = {court.composite_key: court for court in courts if court.spaces > 0}
+		by_date, by_hour, by_venue = {}, {}, {}
+		for court in courts.values():
+			by_date.setdefault(court.date, {})[court.composite_key] = court
+			by_hour.setdefault(court.starts_at.hour, {})[court.composite_key] = court
+			by_venue.setdefault(court.venue_slug, {})[court.composite_key] = court
+
+		self._snapshot = AvailabilitySnapshot(generation, courts, by_date, by_hour, by_venue)
+		logger.info(f'Rebuilt availability index with {len(courts)} courts at generation {generation}')
+
+	def apply(self, changes: CourtChanges, generation: int) -> bool:
+		"""
+		Patches the index with the changes of the given generation. Returns False without changing anything
+		if it does not directly follow the current one, in which case the caller must rebuild instead.
+		"""
+		snapshot = self._snapshot
+		if generation != snapshot.generation + 1:
+			logger.warning(f'Availability index at generation {snapshot.generation} cannot apply {generation}')
+			return False
+
+		courts = dict(snapshot.courts)
+		indexes = {
+			'by_date': (dict(snapshot.by_date), lambda court: court.date),
+			'by_hour': (dict(snapshot.by_hour), lambda court: court.starts_at.hour),
+			'by_venue': (dict(snapshot.by_venue), lambda court: court.venue_slug),
+		}
+		copied: set[tuple[str, object]] = set()
+
+		def bucket(name: str, court: Court) -> Bucket:
+			buckets, key_of = indexes[name]
+			key = key_of(court)
+			if (name, key) not in copied:
+				buckets[key] = dict(buckets.get(key, {}))
+				copied.add((name, key))
+			return buckets[key]
+
+		for court in changes.now_unavailable + changes.expired + changes.updated:
+			previous = courts.pop(court.composite_key, None)
+			if previous is not None:
+				for name in indexes:
+					bucket(name, previous).pop(previous.composite_key, None)
+
+		for court in changes.now_available + changes.updated:
+			courts[court.composite_key] = court
+			for name in indexes:
+				bucket(name, court)[court.composite_key] = court
+
+		# Drop buckets that the patch emptied
+		by_date, by_hour, by_venue = (
+			{key: entries for key, entries in buckets.items() if entries}
+			for buckets, _ in indexes.values()
+		)
+		self._snapshot = AvailabilitySnapshot(generation, courts, by_date, by_hour, by_venue)
+		logger.debug(f'Patched availability index to generation {generation}: {changes}')
+		return True
+
+	@QUERY_SECONDS.timed('index', 'get_all_available')
+	def get_all_available(self) -> list[Court]:
+		return self._upcoming(self._snapshot.courts.values())
+
+	@QUERY_SECONDS.timed('index', 'get_available_by_date')
+	def get_available_by_date(self, date: date) -> list[Court]:
+		return self._upcoming(self._snapshot.by_date.get(date, {}).values())
+
+	@QUERY_SECONDS.timed('index', 'get_available_by_venue')
+	def get_available_by_venue(self, venue_slug: str) -> list[Court]:
+		return self._upcoming(self._snapshot.by_venue.get(venue_slug, {}).values())
+
+	@QUERY_SECONDS.timed('index', 'get_available_by_time_range')
+	def get_available_by_time_range(self, time_range: tuple[str, str]) -> list[Court]:
+		start, end = (time.fromisoformat(t) for t in time_range)
+		snapshot = self._snapshot
+		return self._upcoming(
+			court
+			for hour in range(start.hour, end.hour + 1)
+			for court in snapshot.by_hour.get(hour, {}).values()
+			if start <= court.starts_at <= end
+		)
+
+	@staticmethod
+	def _upcoming(courts: Iterable[Court]) -> list[Court]:
+		now = datetime.now()
+		return sorted(
+			(court for court in courts if datetime.combine(court.date, court.starts_at) > now),
+			key=lambda court: (court.date, court.starts_at)
+		)
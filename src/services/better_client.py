@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+
+from ..utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class FetchError(Exception):
+	"""Raised when a request to the Better API could not be completed."""
+
+
+class CircuitOpenError(FetchError):
+	"""Raised without making a request while a venue's circuit breaker is open."""
+
+
+class _RetryableStatus(Exception):
+	def __init__(self, status: int, retry_after: Optional[float]):
+		super().__init__(f'HTTP {status}')
+		self.status = status
+		self.retry_after = retry_after
+
+
+@dataclass(frozen=True, slots=True)
+class ApiResponse:
+	status: int
+	headers: Mapping[str, str]
+	body: bytes
+
+
+class CircuitBreaker:
+	"""
+	Opens after `failure_threshold` consecutive failures and rejects requests until `reset_timeout`
+	has passed. A single probe request is then let through, which either closes or re-opens it.
+	"""
+	CLOSED = 'closed'
+	OPEN = 'open'
+	HALF_OPEN = 'half-open'
+
+	def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self.state = self.CLOSED
+		self._failures = 0
+		self._opened_at = 0.0
+		self._probe_in_flight = False
+
+	def allow_request(self) -> bool:
+		if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+			self.state = self.HALF_OPEN
+			self._probe_in_flight = False
+
+		if self.state == self.HALF_OPEN:
+			if self._probe_in_flight:
+				return False
+			self._probe_in_flight = True
+			return True
+
+		return self.state == self.CLOSED
+
+	def record_success(self) -> None:
+		self.state = self.CLOSED
+		self._failures = 0
+		self._probe_in_flight = False
+
+	def release(self) -> None:
+		"""
+		Ends a request that says nothing about the venue's health, such as one that was rate limited, so a
+		half-open breaker lets another probe through.
+		"""
+		self._probe_in_flight = False
+
+	def record_failure(self) -> None:
+		self._failures += 1
+		self._probe_in_flight = False
+		if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+			self.state = self.OPEN
+			self._opened_at = time.monotonic()
+
+
+class BetterApiClient:
+	"""
+	Pooled HTTP client for the Better API with a shared token bucket, retries with jittered
+	exponential backoff on 429/5xx and connection errors, and a circuit breaker per venue.
+
+	A request counts as one failure towards its venue's breaker once its retries run out, however many
+	attempts it took. Every venue is on the same host, so a 429 is the host rate limiting rather than the
+	venue failing, and is only waited out.
+	"""
+	RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+	def __init__(
+			self,
+			headers: dict[str, str],
+			max_connections: int = 12,
+			max_connections_per_host: int = 6,
+			request_timeout: float = 10,
+			rate: float = 5,
+			burst: int = 10,
+			max_retries: int = 3,
+			backoff_base: float = 0.5,
+			backoff_max: float = 30,
+			failure_threshold: int = 5,
+			reset_timeout: float = 60,
+	):
+		self.headers = headers
+		self.max_connections = max_connections
+		self.max_connections_per_host = max_connections_per_host
+		self.request_timeout = request_timeout
+		self.rate_limiter = TokenBucket(rate, burst)
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+
+		self._breakers: dict[str, CircuitBreaker] = {}
+		self._session: Optional[ClientSession] = None
+
+	def breaker_for(self, venue_slug: str) -> CircuitBreaker:
+		if venue_slug not in self._breakers:
+			self._breakers[venue_slug] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+		return self._breakers[venue_slug]
+
+	async def get(
+			self,
+			venue_slug: str,
+			url: str,
+			params: dict[str, str],
+			headers: Optional[dict[str, str]] = None
+	) -> ApiResponse:
+		"""
+		Performs a GET against one venue, raising FetchError once retries run out or if its circuit is open.
+		A 304 is returned as a normal response with an empty body.
+		"""
+		breaker = self.breaker_for(venue_slug)
+		attempt = 0
+
+		while True:
+			# Retries carry on as the request the breaker already let through, unless it has opened since
+			allowed = breaker.allow_request() if attempt == 0 else breaker.state != CircuitBreaker.OPEN
+			if not allowed:
+				raise CircuitOpenError(f'Circuit open for {venue_slug}')
+
+			await self.rate_limiter.acquire()
+			try:
+				async with self._get_session().get(url, params=params, headers=headers) as response:
+					if response.status in self.RETRY_STATUSES:
+						raise _RetryableStatus(response.status, self._parse_retry_after(response.headers))
+					if response.status >= 400:
+						# Not the venue's fault, so the breaker is left alone
+						breaker.record_success()
+						raise FetchError(f'HTTP {response.status} from {url}')
+
+					body = b'' if response.status == 304 else await response.read()
+					breaker.record_success()
+					return ApiResponse(response.status, response.headers, body)
+			except (_RetryableStatus, ClientError, asyncio.TimeoutError) as e:
+				if attempt == self.max_retries:
+					if getattr(e, 'status', None) == 429:
+						breaker.release()
+					else:
+						breaker.record_failure()
+					raise FetchError(f'Giving up on {url} after {attempt + 1} attempts: {e!r}') from e
+
+				delay = self._backoff(attempt, getattr(e, 'retry_after', None))
+				logger.warning(f'Request to {url} failed ({e!r}), retrying in {delay:.2f}s')
+				await asyncio.sleep(delay)
+				attempt += 1
+
+	async def close(self) -> None:
+		if self._session and not self._session.closed:
+			await self._session.close()
+		self._session = None
+
+	def _get_session(self) -> ClientSession:
+		# The session is bound to the running loop, so it can only be created lazily from inside it
+		if self._session is None or self._session.closed:
+			self._session = ClientSession(
+				headers=self.headers,
+				connector=TCPConnector(
+					limit=self.max_connections,
+					limit_per_host=self.max_connections_per_host,
+					keepalive_timeout=30
+				),
+				# Only time on the network counts. A total or connect timeout would also count the wait for a
+				# pooled connection, timing requests out while they were still queued locally
+				timeout=ClientTimeout(total=None, sock_connect=self.request_timeout, sock_read=self.request_timeout)
+			)
+		return self._session
+
+	def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+		# Full jitter, so retries from many keys do not arrive back in lockstep
+		delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+		return max(delay, retry_after) if retry_after is not None else delay
+
+	@staticmethod
+	def _parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+		value = headers.get('Retry-After')
+		if value is None:
+			return None
+		try:
+			return max(0.0, float(value))
+		except ValueError:
+			pass
+		try:
+			return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+		except (TypeError, ValueError):
+			return None
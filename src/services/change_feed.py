@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+from ..models import CourtChanges
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeSubscription:
+	"""
+	A subscriber's queue of published changes, iterated with `async for`.
+	"""
+
+	def __init__(self, feed: 'ChangeFeed'):
+		self._feed = feed
+		self._queue: asyncio.Queue[CourtChanges] = asyncio.Queue()
+
+	def __aiter__(self) -> 'ChangeSubscription':
+		return self
+
+	async def __anext__(self) -> CourtChanges:
+		return await self._queue.get()
+
+	def close(self) -> None:
+		self._feed.unsubscribe(self)
+
+
+class ChangeFeed:
+	"""
+	In-process fan-out of the availability changes computed by each database write.
+	Publishing and consuming both happen on the event loop.
+	"""
+	_instance = None
+	_initialised = False
+
+	def __new__(cls):
+		if cls._instance is None:
+			logger.debug('Creating a new instance of ChangeFeed')
+			cls._instance = super().__new__(cls)
+		return cls._instance
+
+	def __init__(self):
+		if self._initialised:
+			return
+		self._subscriptions: set[ChangeSubscription] = set()
+		self._initialised = True
+
+	def subscribe(self) -> ChangeSubscription:
+		"""
+		Registers a subscriber straight away, so no change published after this call is missed.
+		"""
+		subscription = ChangeSubscription(self)
+		self._subscriptions.add(subscription)
+		return subscription
+
+	def unsubscribe(self, subscription: ChangeSubscription) -> None:
+		self._subscriptions.discard(subscription)
+
+	def publish(self, changes: CourtChanges) -> None:
+		logger.info(f'Publishing court changes to {len(self._subscriptions)} subscriber(s): {changes}')
+		for subscription in self._subscriptions:
+			subscription._queue.put_nowait(changes)
@@ -1,18 +1,60 @@
 import logging
 import sqlite3
-from datetime import date
+import threading
+from collections.abc import Iterable
+from datetime import date, datetime, time
+from time import perf_counter
+from typing import Optional
 
-from ..models import Court
+from ..models import Court, CourtChanges
+from .fetch_scheduler import FetchKey
 from ..utils.constants import COURTS_DB_PATH
+from ..utils.metrics import COUNT_BUCKETS, Histogram
 
 logger = logging.getLogger(__name__)
 
+UPSERT_SECONDS = Histogram('court_upsert_seconds', 'Time to upsert a batch of courts and work out what changed')
+UPSERT_ROWS = Histogram(
+	'court_upsert_rows', 'Courts written, or skipped as unchanged, per batch', ('outcome',), buckets=COUNT_BUCKETS
+)
+QUERY_SECONDS = Histogram('court_query_seconds', 'Time to answer an availability query', ('source', 'query'))
+
+MINUTES_PER_DAY = 24 * 60
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Every minute of the day, so decoding a time is a lookup rather than building a new object
+_TIMES = tuple(time(minute // 60, minute % 60) for minute in range(MINUTES_PER_DAY))
+
 
 class CourtDatabase:
 	_instance = None
 	_initialised = False
 
-	def __new__(cls):
+	PRAGMAS = (
+		'PRAGMA journal_mode = WAL',
+		'PRAGMA synchronous = NORMAL',
+		'PRAGMA temp_store = MEMORY',
+		'PRAGMA cache_size = -16000',
+		'PRAGMA mmap_size = 134217728',
+		'PRAGMA busy_timeout = 5000',
+	)
+	# Stored in PRAGMA user_version. 0 is the original layout, with TEXT dates, times and prices
+	SCHEMA_VERSION = 2
+	# One row per day from :today, a day's start, to the last available court, with the courts of each read by a
+	# range of starts_at. CROSS JOIN keeps days as the outer loop, so every range is a search of the partial index
+	TIME_RANGE_QUERY = '''
+		WITH RECURSIVE days(day_start) AS (
+			SELECT :today
+			UNION ALL
+			SELECT day_start + :day FROM days
+			WHERE day_start + :day <= (SELECT MAX(starts_at) FROM courts WHERE spaces > 0)
+		)
+		SELECT courts.* FROM days CROSS JOIN courts
+		WHERE courts.spaces > 0 AND courts.starts_at BETWEEN days.day_start + :start AND days.day_start + :end
+		ORDER BY courts.starts_at ASC
+	'''
+
+
+	def __new__(cls, *args, **kwargs):
 		if cls._instance is None:
 			logger.debug('Creating a new instance of CourtDatabase')
 			cls._instance = super().__new__(cls)
@@ -22,119 +64,326 @@ class CourtDatabase:
 		if self._initialised:
 			return
 		self.db_path = db_path
+		self._local = threading.local()
+		self._connections: list[sqlite3.Connection] = []
+		self._connections_lock = threading.Lock()
 		self._initialise()
 		self._initialised = True
 
 	def _connect(self) -> sqlite3.Connection:
-		return sqlite3.connect(self.db_path)
+		"""
+		Returns this thread's long-lived connection, opening it on first use.
+		With WAL, readers on other threads are not blocked by the writer.
+		"""
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			logger.debug(f'Opening a connection to {self.db_path} for thread {threading.current_thread().name}')
+			conn = sqlite3.connect(self.db_path, check_same_thread=False)
+			for pragma in self.PRAGMAS:
+				conn.execute(pragma)
+			self._local.conn = conn
+			with self._connections_lock:
+				self._connections.append(conn)
+		return conn
+
+	def close(self) -> None:
+		with self._connections_lock:
+			for conn in self._connections:
+				conn.close()
+			self._connections.clear()
+		self._local = threading.local()
 
 	def _initialise(self) -> None:
-		with self._connect() as conn:
+		conn = self._connect()
+		with conn:
+			# Several processes may open the database at once, so check the version under the write lock
+			conn.execute('BEGIN IMMEDIATE')
+			version = conn.execute('PRAGMA user_version').fetchone()[0]
+			if version < self.SCHEMA_VERSION:
+				self._migrate(conn, version)
+			# Partial rather than leading with spaces, so the time range is seeked and the sort comes for free
+			conn.execute('''
+				CREATE INDEX IF NOT EXISTS idx_courts_available_starts_at
+				ON courts (starts_at) WHERE spaces > 0
+			''')
+			conn.execute('''
+				CREATE INDEX IF NOT EXISTS idx_courts_venue_category_starts_at
+				ON courts (venue_slug, category_slug, starts_at)
+			''')
+
+	def _migrate(self, conn: sqlite3.Connection, version: int) -> None:
+		"""
+		Brings the courts table up to SCHEMA_VERSION from the given version, creating it if there is none.
+
+		1: starts and ends are minutes since 1970-01-01 00:00 in local time, and prices are in pence.
+		2: prices that aren't a plain amount, such as 'Free', are kept as they are in price_text instead.
+		"""
+		exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'courts'").fetchone()
+		if exists:
+			logger.info(f'Migrating {self.db_path} from schema version {version} to {self.SCHEMA_VERSION}')
+
+		if version < 1:
+			if exists:
+				conn.execute('ALTER TABLE courts RENAME TO courts_v0')
 			conn.execute('''
-				CREATE TABLE IF NOT EXISTS courts (
+				CREATE TABLE courts (
 					composite_key TEXT PRIMARY KEY,
 					venue_slug TEXT,
 					category_slug TEXT,
 					name TEXT,
-					date TEXT,
-					starts_at TEXT,
-					ends_at TEXT,
+					starts_at INTEGER,
+					ends_at INTEGER,
 					duration TEXT,
-					price TEXT,
+					price_pence INTEGER,
 					spaces INTEGER
 				)
 			''')
+		if version < 2:
+			conn.execute('ALTER TABLE courts ADD COLUMN price_text TEXT')
+
+		if version < 1 and exists:
+			rows = conn.execute('SELECT * FROM courts_v0').fetchall()
+			conn.executemany('INSERT INTO courts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [
+				self._court_to_row(Court(
+					key, venue_slug, category_slug, name, date.fromisoformat(day), time.fromisoformat(starts_at),
+					time.fromisoformat(ends_at), duration, price, spaces
+				))
+				for key, venue_slug, category_slug, name, day, starts_at, ends_at, duration, price, spaces in rows
+			])
+			# Its indexes go with it
+			conn.execute('DROP TABLE courts_v0')
+			logger.info(f'Migrated {len(rows)} courts')
+		conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+	def insert(self, courts: list[Court], scopes: Iterable[FetchKey] = ()) -> CourtChanges:
+		"""
+		Upserts the courts and returns how availability changed as a result.
 
-	# TODO: Add indexes
-	def insert(self, courts: list[Court]) -> None:
+		Each scope is a (venue, category, date) that was fetched in full. Courts previously stored with spaces
+		under a scope but missing from this batch are marked as having none. Scopes of the given courts are
+		always included, so pass any extra ones whose fetch came back empty.
+		"""
+		start = perf_counter()
 		logger.debug(f'Courts with spaces: {[court for court in courts if court.spaces > 0]}')
+		scopes = set(scopes) | {(court.venue_slug, court.category_slug, court.date) for court in courts}
+		now = datetime.now()
+
 		with self._connect() as conn:
-			cursor = conn.executemany('''
-				INSERT INTO courts (
-					composite_key,
-					venue_slug,
-					category_slug,
-					name,
-					date,
-					starts_at,
-					ends_at,
-					duration,
-					price,
-					spaces
-				) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-				ON CONFLICT(composite_key)
-				DO UPDATE SET
-				spaces = excluded.spaces;
-			''', [(
-				court.composite_key,
-				court.venue_slug,
-				court.category_slug,
-				court.name,
-				court.date.strftime('%Y-%m-%d'),
-				court.starts_at.strftime('%H:%M'),
-				court.ends_at.strftime('%H:%M'),
-				court.duration,
-				court.price,
-				court.spaces
-			) for court in courts
-			])
+			# Take the write lock up front, so the read and the write below are one transaction and a worker
+			# writing other venues can't slip in between them
+			conn.execute('BEGIN IMMEDIATE')
+			existing: dict[str, Court] = {}
+			for venue_slug, category_slug, day in scopes:
+				day_start = _to_minutes(day, _TIMES[0])
+				rows = conn.execute('''
+					SELECT * FROM courts
+					WHERE venue_slug = ? AND category_slug = ? AND starts_at >= ? AND starts_at < ?
+				''', (venue_slug, category_slug, day_start, day_start + MINUTES_PER_DAY)).fetchall()
+				existing.update((court.composite_key, court) for court in self._rows_to_courts(rows))
+
+			changes = self._diff(existing, courts, now)
+
+			# Courts that have already started are no longer bookable, so there is no point storing them
+			upcoming = [court for court in courts if not self._has_started(court, now)]
+			upserted = {court.composite_key for court in upcoming}
+			staged = upcoming + [court for court in changes.now_unavailable + changes.expired
+								 if court.composite_key not in upserted]
+			written = self._upsert(conn, staged)
+
+		UPSERT_SECONDS.observe(perf_counter() - start)
+		UPSERT_ROWS.observe(len(written), 'written')
+		UPSERT_ROWS.observe(len(staged) - len(written), 'skipped')
+		logger.info(f'Wrote {len(written)} courts to the database, skipped {len(staged) - len(written)} unchanged')
+		logger.info(f'Court changes: {changes}')
+		return changes
+
+	@classmethod
+	def _upsert(cls, conn: sqlite3.Connection, courts: list[Court]) -> set[str]:
+		"""
+		Writes the courts in one statement and returns the keys of those that were new or whose spaces changed.
+		Courts already stored with the same spaces are left alone, so their pages aren't rewritten to the WAL.
+		"""
+		conn.execute('''
+			CREATE TEMP TABLE IF NOT EXISTS staged_courts (
+				composite_key TEXT,
+				venue_slug TEXT,
+				category_slug TEXT,
+				name TEXT,
+				starts_at INTEGER,
+				ends_at INTEGER,
+				duration TEXT,
+				price_pence INTEGER,
+				spaces INTEGER,
+				price_text TEXT
+			)
+		''')
+		conn.execute('DELETE FROM staged_courts')
+		conn.executemany(
+			'INSERT INTO staged_courts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+			[cls._court_to_row(court) for court in courts]
+		)
+		# The WHERE true is needed for SQLite to parse ON CONFLICT after a SELECT
+		rows = conn.execute('''
+			INSERT INTO courts SELECT * FROM staged_courts WHERE true
+			ON CONFLICT(composite_key)
+			DO UPDATE SET
+			spaces = excluded.spaces
+			WHERE courts.spaces != excluded.spaces
+			RETURNING composite_key
+		''').fetchall()
+		return {row[0] for row in rows}
+
+	@staticmethod
+	def _court_to_row(court: Court) -> tuple:
+		starts_at = _to_minutes(court.date, court.starts_at)
+		ends_at = _to_minutes(court.date, court.ends_at)
+		if ends_at < starts_at:
+			# Runs past midnight
+			ends_at += MINUTES_PER_DAY
+		pence = _to_pence(court.price)
+		return (court.composite_key, court.venue_slug, court.category_slug, court.name, starts_at, ends_at,
+				court.duration, pence, court.spaces, court.price if pence is None else None)
+
+	@classmethod
+	def _diff(cls, existing: dict[str, Court], courts: list[Court], now: datetime) -> CourtChanges:
+		changes = CourtChanges()
+		seen = set()
+
+		for court in courts:
+			seen.add(court.composite_key)
+			previous = existing.get(court.composite_key)
+			previous_spaces = previous.spaces if previous else 0
+
+			if cls._has_started(court, now):
+				if previous_spaces > 0:
+					changes.expired.append(court.with_spaces(0))
+			elif previous_spaces == court.spaces:
+				continue
+			elif previous_spaces == 0:
+				changes.now_available.append(court)
+			elif court.spaces == 0:
+				changes.now_unavailable.append(court)
+			else:
+				changes.updated.append(court)
+
+		# Courts that dropped out of a fetched scope either started or were withdrawn
+		for key, previous in existing.items():
+			if key in seen or previous.spaces == 0:
+				continue
+			gone = previous.with_spaces(0)
+			if cls._has_started(previous, now):
+				changes.expired.append(gone)
+			else:
+				changes.now_unavailable.append(gone)
 
-			logger.info(f'Inserted/updated {cursor.rowcount} courts into the database')
+		return changes
 
+	@staticmethod
+	def _has_started(court: Court, now: datetime) -> bool:
+		return datetime.combine(court.date, court.starts_at) <= now
+
+	def prune(self, before: date) -> int:
+		"""
+		Deletes courts on days before the given one, which can no longer be booked or change.
+		Their history is kept by AvailabilityHistory.
+		"""
+		with self._connect() as conn:
+			deleted = conn.execute(
+				'DELETE FROM courts WHERE starts_at < ?', (_to_minutes(before, _TIMES[0]),)
+			).rowcount
+		logger.info(f'Pruned {deleted} courts from before {before.isoformat()}')
+		return deleted
+
+	@QUERY_SECONDS.timed('database', 'get_all_available')
 	def get_all_available(self) -> list[Court]:
 		with self._connect() as conn:
 			rows = conn.execute('''
 				SELECT * FROM courts
-				WHERE spaces > 0
-					AND (date > date('now') OR (date = date('now') AND starts_at > time('now')))
-				ORDER BY date ASC, starts_at ASC
-			''').fetchall()
+				WHERE spaces > 0 AND starts_at > ?
+				ORDER BY starts_at ASC
+			''', (_now_minutes(),)).fetchall()
 
 			logger.info(f'Retrieved {len(rows)} available courts')
 			return self._rows_to_courts(rows)
 
+	@QUERY_SECONDS.timed('database', 'get_available_by_date')
 	def get_available_by_date(self, date: date) -> list[Court]:
-		with (self._connect() as conn):
+		day_start = _to_minutes(date, _TIMES[0])
+		with self._connect() as conn:
 			rows = conn.execute('''
 				SELECT * FROM courts
-				WHERE spaces > 0
-					AND date = ?
-					AND (date > date('now') OR (date = date('now') AND starts_at > time('now')))
+				WHERE spaces > 0 AND starts_at > ? AND starts_at < ?
 				ORDER BY starts_at ASC
-			''', (date.isoformat(),)).fetchall()
+			''', (max(day_start - 1, _now_minutes()), day_start + MINUTES_PER_DAY)).fetchall()
 
 			logger.info(f'Retrieved {len(rows)} available courts for {date.isoformat()}')
 			return self._rows_to_courts(rows)
 
+	@QUERY_SECONDS.timed('database', 'get_available_by_time_range')
 	def get_available_by_time_range(self, time_range: tuple[str, str]) -> list[Court]:
+		"""
+		Available courts from today on starting within the range, as one index range scan per day up to the last
+		available court.
+		"""
 		logger.info('Retrieving available courts for time range: %s', time_range)
-		start, end = time_range
+		start, end = (time.fromisoformat(t) for t in time_range)
 
 		with self._connect() as conn:
-			rows = conn.execute('''
-				SELECT * FROM courts
-				WHERE spaces > 0
-					AND date >= date('now')
-					AND starts_at BETWEEN time(?) AND time(?)
-				ORDER BY date ASC, starts_at ASC
-			''', (start, end)).fetchall()
+			rows = conn.execute(self.TIME_RANGE_QUERY, {
+				'today': _to_minutes(datetime.now().date(), _TIMES[0]),
+				'day': MINUTES_PER_DAY,
+				'start': start.hour * 60 + start.minute,
+				'end': end.hour * 60 + end.minute
+			}).fetchall()
 
-			logger.info(f'Retrieved {len(rows)} available courts for time range {start}:00 - {end}:00')
+			logger.info(f'Retrieved {len(rows)} available courts for time range {time_range[0]} - {time_range[1]}')
 			return self._rows_to_courts(rows)
 
-	def _rows_to_courts(self, rows: list[sqlite3.Row]) -> list[Court]:
-		return [
-			Court(
-				composite_key=row[0],
-				venue_slug=row[1],
-				category_slug=row[2],
-				name=row[3],
-				date=row[4],
-				starts_at=row[5],
-				ends_at=row[6],
-				duration=row[7],
-				price=row[8],
-				spaces=row[9]
-			)
-			for row in rows
-		]
+	@staticmethod
+	def _rows_to_courts(rows: list[tuple]) -> list[Court]:
+		# Rows were written by insert, so they only need converting, not validating. Only a few days and prices
+		# come up in any one query, so each is decoded once and shared between its courts
+		days: dict[int, date] = {}
+		prices: dict[int, str] = {}
+		courts = []
+		for composite_key, venue_slug, category_slug, name, starts_at, ends_at, duration, pence, spaces, text in rows:
+			day, minute = divmod(starts_at, MINUTES_PER_DAY)
+			court_date = days.get(day)
+			if court_date is None:
+				court_date = days[day] = date.fromordinal(EPOCH_ORDINAL + day)
+			if pence is None:
+				price = text
+			else:
+				price = prices.get(pence)
+				if price is None:
+					price = prices[pence] = _format_pence(pence)
+			courts.append(Court(
+				composite_key, venue_slug, category_slug, name, court_date, _TIMES[minute],
+				_TIMES[ends_at % MINUTES_PER_DAY], duration, price, spaces
+			))
+		return courts
+
+
+def _to_minutes(day: date, at: time) -> int:
+	return (day.toordinal() - EPOCH_ORDINAL) * MINUTES_PER_DAY + at.hour * 60 + at.minute
+
+
+def _now_minutes() -> int:
+	now = datetime.now()
+	return _to_minutes(now.date(), now.time())
+
+
+def _to_pence(price: str) -> Optional[int]:
+	"""
+	Converts a formatted amount like '£9.50' to pence, or returns None for anything that wouldn't format back
+	the same, such as 'Free', so it can be stored as it is.
+	"""
+	pounds, _, pence = price.removeprefix('£').partition('.')
+	if not (pounds.isascii() and pounds.isdigit() and pence.isascii() and pence.isdigit() and len(pence) == 2):
+		return None
+	amount = int(pounds) * 100 + int(pence)
+	return amount if _format_pence(amount) == price else None
+
+
+def _format_pence(pence: int) -> str:
+	return f'£{pence // 100}.{pence % 100:02d}'
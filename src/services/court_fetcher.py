@@ -1,14 +1,33 @@
+import asyncio
+import json
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import time
 from datetime import datetime, date, timedelta
+from typing import Optional
 
-from requests import Session
+try:
+	import orjson
+except ImportError:
+	orjson = None
 
 from ..models import Court
-from ..utils.constants import SUGDEN_SPORTS_CENTRE, BADMINTON_40MIN, BADMINTON_60MIN
+from .better_client import ApiResponse, BetterApiClient, FetchError
+from .fetch_scheduler import FetchKey
+from .response_cache import ResponseCache
+from ..utils.constants import CATEGORY_SLUGS, VENUE_MAP
+from ..utils.metrics import Histogram
 
 logger = logging.getLogger(__name__)
 
+# orjson parses straight from bytes and shares repeated keys, so it is used whenever it is installed
+_loads = orjson.loads if orjson is not None else json.loads
+
+FETCH_SECONDS = Histogram(
+	'court_fetch_seconds',
+	'Time to fetch one venue/category/date from the Better API, by how the response compared to the last one',
+	('venue', 'outcome')
+)
+
 
 class CourtFetcher:
 	API_URL = 'https://better-admin.org.uk/api/activities/venue/{venue_slug}/activity/{category_slug}/times'
@@ -21,45 +40,123 @@ class CourtFetcher:
 
 	def __init__(
 			self,
-			venue_slug: str = SUGDEN_SPORTS_CENTRE,
-			category_slugs: list[str] = (BADMINTON_40MIN, BADMINTON_60MIN),
+			venue_slugs: list[str] = tuple(VENUE_MAP),
+			category_slugs: list[str] = CATEGORY_SLUGS,
+			max_connections: int = 12,
+			max_connections_per_host: int = 6,
+			request_timeout: float = 10,
 	):
-		self.venue_slug = venue_slug
+		self.venue_slugs = venue_slugs
 		self.category_slugs = category_slugs
-		self.session = Session()
-		self.session.headers.update(self.HEADERS)
+		self.client = BetterApiClient(
+			self.HEADERS,
+			max_connections=max_connections,
+			max_connections_per_host=max_connections_per_host,
+			request_timeout=request_timeout
+		)
+		self.response_cache = ResponseCache()
 
-	def fetch_all(self) -> list[Court]:
+	async def fetch_all_async(self) -> list[Court]:
+		"""
+		Fetches every venue, category and date on the event loop through a pooled keep-alive session.
+		Concurrency per host is capped by the connector, so extra requests queue for a free connection.
+		"""
 		logger.info('Fetching all courts')
+		results = await self.fetch_keys(self.all_keys(), conditional=False)
+		return [court for batch in results.values() for court in batch]
+
+	async def fetch_keys(self, keys: list[FetchKey], conditional: bool = True) -> dict[FetchKey, Optional[list[Court]]]:
+		"""
+		Fetches each key, mapping it to its courts. If conditional, keys whose response has not changed since
+		the last fetch map to None instead. Keys that failed to fetch are left out, so that a failure is never
+		mistaken for a date with no courts.
+		"""
+		logger.info(f'Fetching courts for {len(keys)} venue/category/date combinations')
+		batches = await asyncio.gather(
+			*(self._fetch_for_async(*key, conditional) for key in keys),
+			return_exceptions=True
+		)
+
+		results = {}
+		for (venue_slug, category_slug, date), batch in zip(keys, batches):
+			if isinstance(batch, FetchError):
+				logger.error(f'Error fetching courts for {category_slug} at {venue_slug} on {date}: {batch}')
+			elif isinstance(batch, BaseException):
+				raise batch
+			else:
+				results[(venue_slug, category_slug, date)] = batch
+		return results
+
+	def all_keys(self) -> list[FetchKey]:
 		# Check the next 6 days
 		dates = [(datetime.today() + timedelta(days=i)).date() for i in range(6)]
-		args = [(category_slug, date) for date in dates for category_slug in self.category_slugs]
-		courts: list[Court] = []
-
-		def fetch_for_category_and_date(arg):
-			category_slug, date = arg
-			return self._fetch_for(category_slug, date)
+		return [
+			(venue_slug, category_slug, date)
+			for date in dates
+			for venue_slug in self.venue_slugs
+			for category_slug in self.category_slugs
+		]
 
-		with ThreadPoolExecutor(max_workers=6) as executor:
-			for batch in executor.map(fetch_for_category_and_date, args):
-				courts.extend(batch)
+	async def close(self) -> None:
+		await self.client.close()
 
-		return courts
+	async def _fetch_for_async(
+			self,
+			venue_slug: str,
+			category_slug: str,
+			date: date,
+			conditional: bool = True
+	) -> Optional[list[Court]]:
+		key = (venue_slug, category_slug, date)
+		response = await self.fetch_response(key, conditional)
+		return None if response is None else self.parse_response(key, response)
 
-	def _fetch_for(self, category_slug: str, date: date) -> list[Court]:
-		logger.debug(f'Fetching courts for {category_slug} at {self.venue_slug} on {date}')
+	async def fetch_response(self, key: FetchKey, conditional: bool = True) -> Optional[ApiResponse]:
+		"""
+		Fetches the raw response for a key, or None if conditional and it has not changed since the last fetch.
+		"""
+		venue_slug, category_slug, date = key
+		logger.debug(f'Fetching courts for {category_slug} at {venue_slug} on {date}')
+		start = time.perf_counter()
 		try:
-			response = self.session.get(
-				self.API_URL.format(venue_slug=self.venue_slug,
-									category_slug=category_slug),
-				params={'date': date.isoformat()}
+			response = await self.client.get(
+				venue_slug,
+				self.API_URL.format(venue_slug=venue_slug, category_slug=category_slug),
+				params={'date': date.isoformat()},
+				headers=self.response_cache.conditional_headers(key) if conditional else None
 			)
-			response.raise_for_status()
-			data = response.json()['data']
-
-			# The response can come in two forms - either a dictionary or a list
-			court_list = list(data.values()) if isinstance(data, dict) else data
-			return [Court(**court) for court in court_list]
-		except Exception as e:
-			logger.error(f'Error fetching courts for {category_slug} at {self.venue_slug} on {date}: {e}')
-			return []
+		except FetchError:
+			FETCH_SECONDS.observe(time.perf_counter() - start, venue_slug, 'error')
+			raise
+		elapsed = time.perf_counter() - start
+
+		if response.status == 304:
+			FETCH_SECONDS.observe(elapsed, venue_slug, 'not_modified')
+			logger.debug(f'Courts for {category_slug} at {venue_slug} on {date} not modified')
+			return None
+
+		# Upstream does not always send validators, so fall back to comparing the body itself
+		if conditional and self.response_cache.is_unchanged(key, response.body):
+			FETCH_SECONDS.observe(elapsed, venue_slug, 'unchanged')
+			logger.debug(f'Courts for {category_slug} at {venue_slug} on {date} unchanged')
+			return None
+		FETCH_SECONDS.observe(elapsed, venue_slug, 'changed')
+		return response
+
+	def parse_response(self, key: FetchKey, response: ApiResponse) -> list[Court]:
+		"""
+		Parses a response from fetch_response, remembering it for the next conditional fetch once it is known to be valid.
+		"""
+		try:
+			courts = self._parse(_loads(response.body)['data'])
+		except (ValueError, KeyError, TypeError) as e:
+			raise FetchError(f'Malformed response: {e}') from e
+
+		self.response_cache.store(key, response.body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+		return courts
+
+	@staticmethod
+	def _parse(data: dict | list) -> list[Court]:
+		# The response can come in two forms - either a dictionary or a list. Each entry is converted in
+		# place, so the parsed tree is never copied and can be freed as soon as this returns
+		return [Court.from_payload(court) for court in (data.values() if isinstance(data, dict) else data)]
@@ -1,45 +1,214 @@
+import asyncio
 import logging
-from datetime import date, datetime
-from typing import Optional
-from zoneinfo import ZoneInfo
+import threading
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable, Optional
 
-from ics import Event, Calendar
-
-from src.models import Court
+from src.models import Court, CourtChanges
+from src.services.availability_history import AvailabilityHistory
+from src.services.availability_index import AvailabilityIndex
+from src.services.change_feed import ChangeFeed
 from src.services.court_database import CourtDatabase
 from src.services.court_fetcher import CourtFetcher
-from src.utils.constants import VENUE_MAP, COURTS_ICS_PATH
+from src.services.fetch_scheduler import FetchScheduler, FetchKey
+from src.services.release_predictor import ReleasePredictor
+from src.services.update_pipeline import UpdatePipeline
+from src.services.worker_channel import WorkerChannel
+from src.utils.constants import VENUE_MAP
+from src.utils.metrics import Gauge
 
 logger = logging.getLogger(__name__)
 
+LAST_UPDATED = Gauge('courts_last_updated_timestamp_seconds', 'When courts were last updated, as a Unix timestamp')
+FETCH_QUEUE_DEPTH = Gauge('court_fetch_queue_depth', 'Venue/category/date combinations due to be fetched')
+FETCH_AGE = Gauge(
+	'court_fetch_age_seconds',
+	'Seconds since each venue/category was last fetched, by days ahead of today',
+	labelnames=('venue', 'category', 'days_ahead')
+)
+
 
 class CourtUpdater:
 	_instance = None
 	_initialised = False
 
-	def __new__(cls):
+	def __new__(cls, *args, **kwargs):
 		if cls._instance is None:
 			logger.debug('Creating a new instance of CourtUpdater')
 			cls._instance = super().__new__(cls)
 		return cls._instance
 
-	def __init__(self):
+	def __init__(
+			self,
+			venue_slugs: Iterable[str] = tuple(VENUE_MAP),
+			publish: Optional[Callable[[CourtChanges], None]] = None,
+			maintain_index: bool = True
+	):
+		"""
+		By default every venue is fetched and changes go to the in-process ChangeFeed. A fetch worker process
+		passes its shard of venues and where to publish to, and leaves the index to the serving process.
+		"""
 		if self._initialised:
 			return
-		self.court_fetcher = CourtFetcher()
+		self.court_fetcher = CourtFetcher(list(venue_slugs))
 		self.court_database = CourtDatabase()
+		self.release_predictor = ReleasePredictor(self.court_fetcher.venue_slugs, self.court_fetcher.category_slugs)
+		self.fetch_scheduler = FetchScheduler(
+			self.court_fetcher.venue_slugs,
+			self.court_fetcher.category_slugs,
+			release_predictor=self.release_predictor
+		)
+		self.change_feed = ChangeFeed()
+		self.availability_index = AvailabilityIndex()
+		self.availability_history = AvailabilityHistory()
+		self.update_pipeline = UpdatePipeline(
+			self.court_fetcher,
+			self.fetch_scheduler,
+			store=self._store,
+			publish=publish or self.change_feed.publish
+		)
+		self.maintain_index = maintain_index
+		# Set in the serving process when fetching is left to worker processes
+		self.worker_channel: Optional[WorkerChannel] = None
+		self._receive_lock = asyncio.Lock()
+		# Writes and index updates run on worker threads, and a forced refresh can overlap the scheduled update,
+		# so serialise them or an older snapshot could be swapped in over a newer one
+		self._store_lock = threading.RLock()
+		self.generation = 0
 		self.last_updated: Optional[date] = None
+		LAST_UPDATED.set_function(lambda: self.last_updated.timestamp() if self.last_updated else 0)
+		# When worker processes do the fetching this process's scheduler sits idle, so it has nothing to report
+		FETCH_QUEUE_DEPTH.set_function(lambda: None if self.worker_channel else self.fetch_scheduler.queue_depth())
+		FETCH_AGE.set_function(lambda: {} if self.worker_channel else self.fetch_ages())
+		self._maintained_on: Optional[date] = None
 		self._initialised = True
 
-	def update(self) -> None:
-		logger.info('Updating court database')
-		courts = self.court_fetcher.fetch_all()
-		self.court_database.insert(courts)
-		logger.info('Court database updated successfully')
+	async def update(self, force: bool = False) -> None:
+		"""
+		Fetches every venue/category/date the scheduler says is due, or all of them if forced.
+		"""
+		if self.worker_channel is not None:
+			# The workers do the fetching and report back once they have updated
+			await self.worker_channel.request_refresh()
+			return
+
+		keys = self.court_fetcher.all_keys() if force else self.fetch_scheduler.pop_due()
+		if not keys:
+			logger.debug('No venue/category/date combinations are due for an update')
+			return
+
+		logger.info(f'Updating court database for {len(keys)} venue/category/date combinations')
+		# Each response is parsed, stored and published as soon as it arrives, so one slow venue no longer
+		# holds back the changes of every other
+		run = await self.update_pipeline.run(keys)
+		logger.info(
+			f'Brought {run.fetched} venue/category/date combinations up to date, {run.stored} stored, '
+			f'{run.unchanged} unchanged, {len(run.failed)} failed'
+		)
+
+		if not run.fetched:
+			# Failed keys keep their previous snapshot in the database and are retried with a backoff
+			logger.warning('Every venue/category/date failed to fetch or store, keeping the existing courts')
+		elif run.unchanged == run.fetched:
+			logger.info('No responses changed since the last update, skipping the database update')
+			self._set_last_updated()
+
+	def _store(self, courts: list[Court], scopes: list[FetchKey]) -> CourtChanges:
+		with self._store_lock:
+			self._run_daily_maintenance()
+			changes = self.court_database.insert(courts, scopes)
+			logger.info('Court database updated successfully')
+			self._set_last_updated()
+
+			if changes:
+				self.availability_history.record(changes, self.last_updated)
+				if self.maintain_index:
+					self._apply(changes)
+			return changes
+
+	async def receive(self, changes: CourtChanges, updated_at: datetime) -> None:
+		"""
+		Takes in the changes a worker process has written, as if this process had written them itself.
+		"""
+		async with self._receive_lock:
+			await asyncio.to_thread(self._apply, changes)
+		self.last_updated = max(self.last_updated or updated_at, updated_at)
+		self.change_feed.publish(changes)
+
+	def receive_updated(self, updated_at: datetime) -> None:
+		self.last_updated = max(self.last_updated or updated_at, updated_at)
+
+	async def reload(self) -> None:
+		"""
+		Rebuilds the index from the database when a worker connects, and publishes how it differs from before,
+		as changes written while no worker was connected were never sent to this process.
+		"""
+		async with self._receive_lock:
+			changes = await asyncio.to_thread(self._reload)
+		logger.info(f'Reloaded courts from the database: {changes}')
+		if changes:
+			self.change_feed.publish(changes)
+
+	def _reload(self) -> CourtChanges:
+		with self._store_lock:
+			before = {court.composite_key: court for court in self.availability_index.get_all_available()}
+			self.load_availability_index()
+			after = {court.composite_key: court for court in self.availability_index.get_all_available()}
+
+		changes = CourtChanges()
+		for key, court in after.items():
+			previous = before.get(key)
+			if previous is None:
+				changes.now_available.append(court)
+			elif previous.spaces != court.spaces:
+				changes.updated.append(court)
+		changes.now_unavailable.extend(court.with_spaces(0) for key, court in before.items() if key not in after)
+		return changes
+
+	def _apply(self, changes: CourtChanges) -> None:
+		with self._store_lock:
+			self.generation += 1
+			if not self.availability_index.apply(changes, self.generation):
+				self.load_availability_index()
+
+	def _run_daily_maintenance(self) -> None:
+		# Past days only ever shrink the hot table's usefulness, so clear them out once a day
+		today = date.today()
+		if self._maintained_on == today:
+			return
+		self.court_database.prune(today)
+		self.availability_history.prune(today)
+		self.train_release_predictor()
+		self._maintained_on = today
+
+	def train_release_predictor(self, weeks: int = 8) -> None:
+		since = datetime.now() - timedelta(weeks=weeks)
+		self.release_predictor.fit(self.availability_history.iter_points(since=since))
+
+	def load_availability_index(self) -> None:
+		with self._store_lock:
+			# A new generation, so that anything cached against the old index is rebuilt
+			self.generation += 1
+			self.availability_index.rebuild(self.court_database.get_all_available(), self.generation)
+
+	def fetch_ages(self) -> dict[tuple[str, str, int], float]:
+		"""
+		Returns the seconds since each venue/category was last fetched by days ahead of today, leaving out
+		those not fetched yet. Days ahead rather than dates, so the series stay the same from one day to the next.
+		"""
+		today = date.today()
+		return {
+			(venue_slug, category_slug, (day - today).days): age
+			for (venue_slug, category_slug, day), age in self.fetch_scheduler.last_fetch_ages().items()
+			if age is not None
+		}
 
-		available_courts = self.court_database.get_all_available()
-		self._set_last_updated()
-		self._create_ics_file(available_courts)
+	def seconds_until_next_update(self) -> float:
+		return self.fetch_scheduler.seconds_until_next()
+
+	async def close(self) -> None:
+		await self.court_fetcher.close()
+		self.availability_history.close()
 
 	def get_last_updated(self) -> str:
 		"""
@@ -52,20 +221,3 @@ class CourtUpdater:
 	def _set_last_updated(self) -> None:
 		self.last_updated = datetime.now()
 		logger.debug(f'Last updated time set to {self.get_last_updated()}')
-
-	def _create_ics_file(self, courts: list[Court]) -> None:
-		logger.info('Creating ICS file')
-		cal = Calendar()
-		tz = ZoneInfo('Europe/London')
-
-		for court in courts:
-			event = Event()
-			event.name = f'{court.name} ({VENUE_MAP[court.venue_slug]})'
-			event.begin = datetime.combine(court.date, court.starts_at).replace(tzinfo=tz)
-			event.end = datetime.combine(court.date, court.ends_at).replace(tzinfo=tz)
-			event.location = VENUE_MAP[court.venue_slug]
-			event.description = f'Last updated: {self.get_last_updated()}'
-			cal.events.add(event)
-
-		with open(COURTS_ICS_PATH, 'w') as f:
-			f.write(cal.serialize())
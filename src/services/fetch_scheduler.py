@@ -0,0 +1,203 @@
+import heapq
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from ..models import Court
+from .release_predictor import ReleasePredictor
+
+logger = logging.getLogger(__name__)
+
+# (venue_slug, category_slug, date)
+FetchKey = tuple[str, str, date]
+
+
+class FetchScheduler:
+	"""
+	Tracks every (venue, category, date) in the fetch window and decides when each is next due.
+
+	Today and tomorrow, and any key whose courts changed recently, are refreshed at the hot interval.
+	Dates further out settle into the warm and then cold intervals while they stay unchanged. With a
+	trained release predictor, keys are polled at the hot interval through hours when courts are likely
+	to open up, are fetched as such an hour begins, and back off in hours when they rarely do.
+	"""
+
+	def __init__(
+			self,
+			venue_slugs: list[str],
+			category_slugs: list[str],
+			days_ahead: int = 6,
+			hot_interval: float = 60,
+			warm_interval: float = 300,
+			cold_interval: float = 900,
+			recent_change_window: float = 900,
+			release_predictor: Optional[ReleasePredictor] = None,
+	):
+		self.venue_slugs = venue_slugs
+		self.category_slugs = category_slugs
+		self.days_ahead = days_ahead
+		self.hot_interval = hot_interval
+		self.warm_interval = warm_interval
+		self.cold_interval = cold_interval
+		self.recent_change_window = recent_change_window
+		self.release_predictor = release_predictor
+
+		self._queue: list[tuple[float, FetchKey]] = []
+		self._next_due: dict[FetchKey, float] = {}
+		self._last_fetched: dict[FetchKey, float] = {}
+		self._last_changed: dict[FetchKey, float] = {}
+		self._fingerprints: dict[FetchKey, int] = {}
+		self._failures: dict[FetchKey, int] = {}
+		self._window_start: Optional[date] = None
+
+	def all_keys(self) -> list[FetchKey]:
+		self._sync_window()
+		return sorted(self._next_due, key=lambda key: (key[2], key[0], key[1]))
+
+	def pop_due(self, now: Optional[float] = None) -> list[FetchKey]:
+		"""
+		Removes and returns every key that is due. Each one stays untracked until record() reschedules it.
+		"""
+		self._sync_window()
+		now = time.monotonic() if now is None else now
+		due = []
+
+		while self._queue and self._queue[0][0] <= now:
+			due_at, key = heapq.heappop(self._queue)
+			# Skip entries superseded by a later reschedule or dropped from the window
+			if self._next_due.get(key) != due_at:
+				continue
+			del self._next_due[key]
+			due.append(key)
+
+		return due
+
+	def record(self, key: FetchKey, courts: Optional[list[Court]], now: Optional[float] = None) -> bool:
+		"""
+		Records a completed fetch for the key and schedules its next one. Returns whether the courts changed.
+		Courts of None mean upstream reported the response as unchanged.
+		"""
+		self._sync_window()
+		now = time.monotonic() if now is None else now
+		changed = False
+
+		if courts is not None:
+			fingerprint = hash(frozenset((court.composite_key, court.spaces) for court in courts))
+			previous = self._fingerprints.get(key)
+			changed = previous is not None and previous != fingerprint
+			self._fingerprints[key] = fingerprint
+
+		self._last_fetched[key] = now
+		self._failures.pop(key, None)
+		if changed:
+			self._last_changed[key] = now
+
+		if key[2] >= self._window_start:
+			self._schedule(key, now + self.interval_for(key, now))
+		return changed
+
+	def record_failure(self, key: FetchKey, now: Optional[float] = None) -> None:
+		"""
+		Reschedules a key whose fetch failed, backing off exponentially from the hot interval up to the cold one.
+		Its last fetch time and fingerprint are kept, since the previous snapshot is still the latest known.
+		"""
+		self._sync_window()
+		now = time.monotonic() if now is None else now
+		failures = self._failures.get(key, 0) + 1
+		self._failures[key] = failures
+
+		if key[2] >= self._window_start:
+			self._schedule(key, now + min(self.cold_interval, self.hot_interval * 2 ** (failures - 1)))
+
+	def interval_for(self, key: FetchKey, now: Optional[float] = None) -> float:
+		now = time.monotonic() if now is None else now
+		days_out = (key[2] - date.today()).days
+		last_changed = self._last_changed.get(key)
+		recently_changed = last_changed is not None and now - last_changed < self.recent_change_window
+
+		if days_out <= 1 or recently_changed:
+			interval = self.hot_interval
+		elif days_out <= 3:
+			interval = self.warm_interval
+		else:
+			interval = self.cold_interval
+
+		if self.release_predictor is None or not self.release_predictor.trained:
+			return interval
+		return self._adjust_for_predicted_releases(key, days_out, interval, recently_changed, now)
+
+	def _adjust_for_predicted_releases(
+			self,
+			key: FetchKey,
+			days_out: int,
+			interval: float,
+			recently_changed: bool,
+			now: float
+	) -> float:
+		venue_slug, category_slug, _ = key
+		moment = datetime.now() + timedelta(seconds=now - time.monotonic())
+
+		until_active = self.release_predictor.seconds_until_active(venue_slug, category_slug, days_out, moment, interval)
+		if until_active == 0:
+			return min(interval, self.hot_interval)
+		if until_active is not None:
+			# Land the next fetch as the window opens rather than somewhere inside it
+			return max(1.0, until_active)
+		if not recently_changed and self.release_predictor.is_quiet(venue_slug, category_slug, days_out, moment):
+			return min(self.cold_interval, interval * 2)
+		return interval
+
+	def seconds_until_next(self, now: Optional[float] = None) -> float:
+		self._sync_window()
+		now = time.monotonic() if now is None else now
+		if not self._next_due:
+			return 0.0
+		return max(0.0, min(self._next_due.values()) - now)
+
+	def queue_depth(self, now: Optional[float] = None) -> int:
+		"""
+		Returns the number of keys that are currently due but not yet fetched.
+		"""
+		self._sync_window()
+		now = time.monotonic() if now is None else now
+		return sum(1 for due_at in self._next_due.values() if due_at <= now)
+
+	def last_fetch_ages(self, now: Optional[float] = None) -> dict[FetchKey, Optional[float]]:
+		"""
+		Returns the seconds since each tracked key was last fetched, or None if it never has been.
+		"""
+		now = time.monotonic() if now is None else now
+		keys = set(self._next_due) | set(self._last_fetched)
+		return {
+			key: now - self._last_fetched[key] if key in self._last_fetched else None
+			for key in keys
+		}
+
+	def _schedule(self, key: FetchKey, due_at: float) -> None:
+		self._next_due[key] = due_at
+		heapq.heappush(self._queue, (due_at, key))
+
+	def _sync_window(self) -> None:
+		today = date.today()
+		if self._window_start == today:
+			return
+
+		logger.debug(f'Moving fetch window to start at {today}')
+		self._window_start = today
+		dates = [today + timedelta(days=i) for i in range(self.days_ahead)]
+
+		for key in [key for key in self._next_due if key[2] < today]:
+			del self._next_due[key]
+		for mapping in (self._last_fetched, self._last_changed, self._fingerprints, self._failures):
+			for key in [key for key in mapping if key[2] < today]:
+				del mapping[key]
+
+		# New dates entering the window are due immediately
+		now = time.monotonic()
+		for day in dates:
+			for venue_slug in self.venue_slugs:
+				for category_slug in self.category_slugs:
+					key = (venue_slug, category_slug, day)
+					if key not in self._next_due and key not in self._last_fetched:
+						self._schedule(key, now)
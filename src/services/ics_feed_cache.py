@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from email.utils import format_datetime
+from typing import Optional
+
+from ..models import Court
+from .availability_index import AvailabilityIndex
+from .ics_writer import ICS_BUILD_SECONDS, IcsWriter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FeedFilter:
+	"""
+	The subset of available courts a calendar feed covers. Empty fields do not filter.
+	"""
+	venues: tuple[str, ...] = ()
+	categories: tuple[str, ...] = ()
+	time_from: Optional[time] = None
+	time_to: Optional[time] = None
+	days: Optional[int] = None
+
+	def matches(self, court: Court, today: date) -> bool:
+		return (
+			(not self.venues or court.venue_slug in self.venues)
+			and (not self.categories or court.category_slug in self.categories)
+			and (self.time_from is None or court.starts_at >= self.time_from)
+			and (self.time_to is None or court.ends_at <= self.time_to)
+			and (self.days is None or court.date < today + timedelta(days=self.days))
+		)
+
+
+@dataclass(frozen=True)
+class RenderedFeed:
+	body: bytes
+	gzipped: bytes
+	etag: str
+	last_modified: str
+
+
+class IcsFeedCache:
+	"""
+	Renders filtered calendar feeds from the availability index and the cached ICS events.
+
+	Each feed is rendered and gzipped once per index generation, then served from memory. The ETag is a
+	hash of the body, so a feed that an update did not affect keeps its ETag and Last-Modified. Only the
+	`max_feeds` most recently requested filters are kept.
+	"""
+	_instance = None
+	_initialised = False
+
+	def __new__(cls):
+		if cls._instance is None:
+			logger.debug('Creating a new instance of IcsFeedCache')
+			cls._instance = super().__new__(cls)
+		return cls._instance
+
+	def __init__(self, max_feeds: int = 256):
+		if self._initialised:
+			return
+		self.availability_index = AvailabilityIndex()
+		self.ics_writer = IcsWriter()
+		self.max_feeds = max_feeds
+		self._feeds: OrderedDict[tuple[FeedFilter, date], tuple[int, RenderedFeed]] = OrderedDict()
+		self._lock = threading.Lock()
+		self._initialised = True
+
+	def get(self, feed_filter: FeedFilter) -> RenderedFeed:
+		generation = self.availability_index.generation
+		# Which courts are upcoming, and the `days` window, both depend on the date too
+		key = (feed_filter, date.today())
+
+		with self._lock:
+			cached = self._feeds.get(key)
+			if cached:
+				self._feeds.move_to_end(key)
+		if cached and cached[0] == generation:
+			return cached[1]
+
+		feed = self._render(feed_filter, key[1], cached[1] if cached else None)
+		with self._lock:
+			# Drop feeds from earlier days, which can never be requested again
+			if any(cached_date != key[1] for _, cached_date in self._feeds):
+				self._feeds = OrderedDict((k, v) for k, v in self._feeds.items() if k[1] == key[1])
+			self._feeds[key] = (generation, feed)
+			self._feeds.move_to_end(key)
+			while len(self._feeds) > self.max_feeds:
+				self._feeds.popitem(last=False)
+		return feed
+
+	@ICS_BUILD_SECONDS.timed('feed')
+	def _render(self, feed_filter: FeedFilter, today: date, previous: Optional[RenderedFeed]) -> RenderedFeed:
+		if len(feed_filter.venues) == 1:
+			candidates = self.availability_index.get_available_by_venue(feed_filter.venues[0])
+		else:
+			candidates = self.availability_index.get_all_available()
+
+		body = self.ics_writer.render(court for court in candidates if feed_filter.matches(court, today)).encode()
+		etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+		if previous and previous.etag == etag:
+			return previous
+
+		logger.debug(f'Rendered ICS feed for {feed_filter}')
+		return RenderedFeed(
+			body=body,
+			gzipped=gzip.compress(body, compresslevel=6),
+			etag=etag,
+			last_modified=format_datetime(datetime.now(timezone.utc).replace(microsecond=0), usegmt=True)
+		)
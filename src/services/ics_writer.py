@@ -0,0 +1,110 @@
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+from zoneinfo import ZoneInfo
+
+from ics import Event
+
+from ..models import Court, CourtChanges
+from ..utils.constants import VENUE_MAP, COURTS_ICS_PATH
+from ..utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+ICS_BUILD_SECONDS = Histogram('ics_build_seconds', 'Time to render ICS events, files and feeds', ('stage',))
+
+
+class IcsWriter:
+	"""
+	Keeps the serialised VEVENT of every available court, so that each update only renders the courts
+	that changed. The calendar is written to a temporary file and renamed over the old one, so readers
+	always see either the previous file or the new one in full.
+	"""
+	_instance = None
+	_initialised = False
+
+	CALENDAR_HEADER = 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:ics.py - http://git.io/lLljaA\r\n'
+	CALENDAR_FOOTER = 'END:VCALENDAR'
+	TIMEZONE = ZoneInfo('Europe/London')
+
+	def __new__(cls, *args, **kwargs):
+		if cls._instance is None:
+			logger.debug('Creating a new instance of IcsWriter')
+			cls._instance = super().__new__(cls)
+		return cls._instance
+
+	def __init__(self, ics_path: str = COURTS_ICS_PATH):
+		if self._initialised:
+			return
+		self.ics_path = ics_path
+		self._courts: dict[str, Court] = {}
+		self._events: dict[str, str] = {}
+		self._lock = threading.Lock()
+		self._initialised = True
+
+	@ICS_BUILD_SECONDS.timed('rebuild')
+	def rebuild(self, courts: Iterable[Court]) -> None:
+		with self._lock:
+			self._courts = {court.composite_key: court for court in courts if court.spaces > 0}
+			self._events = {key: self._render_event(court) for key, court in self._courts.items()}
+		logger.info(f'Rendered {len(self._events)} ICS events')
+
+	@ICS_BUILD_SECONDS.timed('apply')
+	def apply(self, changes: CourtChanges) -> None:
+		with self._lock:
+			for court in changes.now_unavailable + changes.expired:
+				self._courts.pop(court.composite_key, None)
+				self._events.pop(court.composite_key, None)
+
+			for court in changes.now_available + changes.updated:
+				self._courts[court.composite_key] = court
+				self._events[court.composite_key] = self._render_event(court)
+		logger.info(f'Re-rendered {len(changes.now_available) + len(changes.updated)} ICS events')
+
+	def render(self, courts: Iterable[Court] = None, last_modified: Optional[datetime] = None) -> str:
+		"""
+		Assembles a calendar from the cached events, either of every available court or of the given ones.
+		The update time is only stated once, for the whole calendar, as the cached events never change with it.
+		"""
+		with self._lock:
+			if courts is None:
+				courts = self._courts.values()
+			events = [
+				self._events.get(court.composite_key) or self._render_event(court)
+				for court in sorted(courts, key=lambda court: (court.date, court.starts_at, court.composite_key))
+			]
+		header = self.CALENDAR_HEADER
+		if last_modified is not None:
+			header += f'LAST-MODIFIED:{last_modified.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}\r\n'
+		return header + ''.join(f'{event}\r\n' for event in events) + self.CALENDAR_FOOTER
+
+	@ICS_BUILD_SECONDS.timed('file')
+	def write(self) -> None:
+		logger.info('Writing ICS file')
+		content = self.render(last_modified=datetime.now(timezone.utc))
+		directory = os.path.dirname(os.path.abspath(self.ics_path))
+
+		fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.courts-', suffix='.ics.tmp')
+		try:
+			with os.fdopen(fd, 'w', newline='') as f:
+				f.write(content)
+				f.flush()
+				os.fsync(f.fileno())
+			os.chmod(tmp_path, 0o644)
+			os.replace(tmp_path, self.ics_path)
+		except BaseException:
+			os.unlink(tmp_path)
+			raise
+
+	def _render_event(self, court: Court) -> str:
+		event = Event()
+		# A stable UID lets calendar apps update events in place rather than replacing them
+		event.uid = f'{court.composite_key}@bettercourtfinder'
+		event.name = f'{court.name} ({VENUE_MAP[court.venue_slug]})'
+		event.begin = datetime.combine(court.date, court.starts_at).replace(tzinfo=self.TIMEZONE)
+		event.end = datetime.combine(court.date, court.ends_at).replace(tzinfo=self.TIMEZONE)
+		event.location = VENUE_MAP[court.venue_slug]
+		return event.serialize()
@@ -0,0 +1,132 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .availability_history import HistoryPoint
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = 7 * 24
+RELEASE, CANCELLATION = 0, 1
+
+
+class ReleasePredictor:
+	"""
+	Estimates how likely courts are to become bookable in each hour of the week, from the change points
+	in AvailabilityHistory.
+
+	A court first seen with spaces counts as a release, and one that regains spaces after selling out
+	counts as a cancellation. Both are counted by venue, category, days ahead of the court and the
+	hour of the week they were observed in, then averaged over the weeks of history. The counts are
+	smoothed into the neighbouring hours and treated as Poisson rates, so each hour gets the chance of
+	at least one court opening up.
+	"""
+
+	def __init__(
+			self,
+			venue_slugs: Iterable[str],
+			category_slugs: Iterable[str],
+			days_ahead: int = 6,
+			active_threshold: float = 0.3,
+			quiet_threshold: float = 0.02
+	):
+		self.venue_slugs = list(venue_slugs)
+		self.category_slugs = list(category_slugs)
+		self.days_ahead = days_ahead
+		self.active_threshold = active_threshold
+		self.quiet_threshold = quiet_threshold
+		self._venues = {venue: i for i, venue in enumerate(self.venue_slugs)}
+		self._categories = {category: i for i, category in enumerate(self.category_slugs)}
+		# (kind, venue, category, days ahead, hour of week) -> expected events per hour
+		self.rates: Optional[np.ndarray] = None
+		self._likelihood: Optional[np.ndarray] = None
+
+	@property
+	def trained(self) -> bool:
+		return self._likelihood is not None
+
+	def fit(self, points: Iterable[HistoryPoint]) -> None:
+		"""
+		Rebuilds the model from change points ordered by court and then time, as iter_points yields them.
+		"""
+		kinds, venues, categories, days, hours, times = [], [], [], [], [], []
+		current_key, ever_available, previous_spaces = None, False, 0
+
+		for point in points:
+			if point.composite_key != current_key:
+				current_key, ever_available, previous_spaces = point.composite_key, False, 0
+			if previous_spaces == 0 and point.spaces > 0 and point.venue_slug in self._venues \
+					and point.category_slug in self._categories:
+				kinds.append(CANCELLATION if ever_available else RELEASE)
+				venues.append(self._venues[point.venue_slug])
+				categories.append(self._categories[point.category_slug])
+				days.append((point.date - point.observed_at.date()).days)
+				hours.append(point.observed_at.weekday() * 24 + point.observed_at.hour)
+				times.append(point.observed_at.timestamp())
+			ever_available = ever_available or point.spaces > 0
+			previous_spaces = point.spaces
+
+		if not kinds:
+			logger.info('No availability history to predict releases from')
+			return
+
+		counts = np.zeros((2, len(self.venue_slugs), len(self.category_slugs), self.days_ahead + 1, HOURS_PER_WEEK))
+		np.add.at(counts, (
+			np.asarray(kinds),
+			np.asarray(venues),
+			np.asarray(categories),
+			np.clip(np.asarray(days), 0, self.days_ahead),
+			np.asarray(hours)
+		), 1)
+
+		weeks = max(1.0, (max(times) - min(times)) / timedelta(weeks=1).total_seconds())
+		# Releases rarely land in exactly the same hour each week, so let some of each spill into its neighbours
+		smoothed = 0.5 * counts + 0.25 * np.roll(counts, 1, axis=-1) + 0.25 * np.roll(counts, -1, axis=-1)
+		self.rates = smoothed / weeks
+		self._likelihood = 1 - np.exp(-self.rates.sum(axis=0))
+		logger.info(f'Fitted release predictor on {len(kinds)} releases and cancellations over {weeks:.1f} weeks')
+
+	def likelihood(self, venue_slug: str, category_slug: str, days_ahead: int, moment: datetime) -> float:
+		"""
+		Returns the chance that at least one court opens up in the hour containing `moment`.
+		"""
+		if not self.trained or venue_slug not in self._venues or category_slug not in self._categories:
+			return 0.0
+		return float(self._likelihood[
+			self._venues[venue_slug],
+			self._categories[category_slug],
+			min(max(days_ahead, 0), self.days_ahead),
+			moment.weekday() * 24 + moment.hour
+		])
+
+	def seconds_until_active(
+			self,
+			venue_slug: str,
+			category_slug: str,
+			days_ahead: int,
+			moment: datetime,
+			horizon: float
+	) -> Optional[float]:
+		"""
+		Returns the seconds until the next hour at or above the active threshold within `horizon`, 0 if
+		`moment` is in one already, or None if there is none.
+		"""
+		if not self.trained:
+			return None
+
+		hour_start = moment.replace(minute=0, second=0, microsecond=0)
+		for offset in range(int(horizon // 3600) + 2):
+			start = hour_start + timedelta(hours=offset)
+			seconds = max(0.0, (start - moment).total_seconds())
+			if seconds > horizon:
+				return None
+			# Days ahead shrinks by one for every midnight crossed
+			if self.likelihood(venue_slug, category_slug, days_ahead - (start.date() - moment.date()).days,
+							   start) >= self.active_threshold:
+				return seconds
+		return None
+
+	def is_quiet(self, venue_slug: str, category_slug: str, days_ahead: int, moment: datetime) -> bool:
+		return self.trained and self.likelihood(venue_slug, category_slug, days_ahead, moment) < self.quiet_threshold
@@ -0,0 +1,56 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from .fetch_scheduler import FetchKey
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+	etag: Optional[str]
+	last_modified: Optional[str]
+	content_hash: bytes
+
+
+class ResponseCache:
+	"""
+	Remembers the validators and a content hash of the last response for each (venue, category, date).
+
+	Upstream validators are sent back as conditional request headers. Where upstream ignores them,
+	the content hash still lets an identical body be recognised before it is parsed.
+	"""
+
+	def __init__(self):
+		self._entries: dict[FetchKey, CachedResponse] = {}
+
+	def conditional_headers(self, key: FetchKey) -> dict[str, str]:
+		entry = self._entries.get(key)
+		if entry is None:
+			return {}
+
+		headers = {}
+		if entry.etag:
+			headers['If-None-Match'] = entry.etag
+		if entry.last_modified:
+			headers['If-Modified-Since'] = entry.last_modified
+		return headers
+
+	def is_unchanged(self, key: FetchKey, body: bytes) -> bool:
+		entry = self._entries.get(key)
+		return entry is not None and entry.content_hash == self.hash(body)
+
+	def store(self, key: FetchKey, body: bytes, etag: Optional[str], last_modified: Optional[str]) -> None:
+		self._entries[key] = CachedResponse(etag, last_modified, self.hash(body))
+
+	def discard(self, key: FetchKey) -> None:
+		"""
+		Forgets the last response for a key, for when its courts could not be stored, so the next fetch is used in full.
+		"""
+		self._entries.pop(key, None)
+
+	@staticmethod
+	def hash(body: bytes) -> bytes:
+		return hashlib.blake2b(body, digest_size=16).digest()
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from ..models import Court, CourtChanges
+from .better_client import ApiResponse, FetchError
+from .court_fetcher import CourtFetcher
+from .fetch_scheduler import FetchKey, FetchScheduler
+from ..utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = Histogram('update_stage_seconds', 'Time spent in each stage of the update pipeline, per key', ('stage',))
+
+
+@dataclass
+class StageMetrics:
+	count: int = 0
+	total_seconds: float = 0.0
+	max_seconds: float = 0.0
+
+	def observe(self, seconds: float) -> None:
+		self.count += 1
+		self.total_seconds += seconds
+		self.max_seconds = max(self.max_seconds, seconds)
+
+	@property
+	def mean_seconds(self) -> float:
+		return self.total_seconds / self.count if self.count else 0.0
+
+	def __str__(self) -> str:
+		return f'n={self.count} mean={self.mean_seconds * 1000:.0f}ms max={self.max_seconds * 1000:.0f}ms'
+
+
+@dataclass
+class PipelineRun:
+	unchanged: int = 0
+	stored: int = 0
+	# Whether fetching, parsing or storing them failed
+	failed: list[FetchKey] = field(default_factory=list)
+
+	@property
+	def fetched(self) -> int:
+		"""
+		Keys whose latest courts are now in the database, either stored or already there.
+		"""
+		return self.unchanged + self.stored
+
+
+class UpdatePipeline:
+	"""
+	Moves each fetched (venue, category, date) through parse, upsert and change publishing as soon as its
+	response arrives, rather than waiting for the slowest fetch of the cycle.
+
+	Stages are joined by bounded queues, so a slow database write holds fetches back rather than letting
+	parsed responses pile up in memory. The upsert stage takes whatever has queued up while the previous
+	write ran, so writes batch up under load and stay per-key when it is quiet. Each stage's timings are
+	kept in `metrics`, along with `freshness`: the time from a fetch starting to its changes being published.
+	"""
+	STAGES = ('fetch', 'parse', 'upsert', 'backpressure', 'freshness')
+
+	def __init__(
+			self,
+			court_fetcher: CourtFetcher,
+			fetch_scheduler: FetchScheduler,
+			store: Callable[[list[Court], list[FetchKey]], CourtChanges],
+			publish: Callable[[CourtChanges], None],
+			queue_size: int = 8,
+			parse_workers: int = 2,
+			max_batch_keys: int = 12
+	):
+		self.court_fetcher = court_fetcher
+		self.fetch_scheduler = fetch_scheduler
+		self.store = store
+		self.publish = publish
+		self.queue_size = queue_size
+		self.parse_workers = parse_workers
+		self.max_batch_keys = max_batch_keys
+		self.metrics = {stage: StageMetrics() for stage in self.STAGES}
+
+	async def run(self, keys: list[FetchKey]) -> PipelineRun:
+		run = PipelineRun()
+		parse_queue: asyncio.Queue[tuple[FetchKey, ApiResponse, float]] = asyncio.Queue(self.queue_size)
+		upsert_queue: asyncio.Queue[tuple[FetchKey, list[Court], float]] = asyncio.Queue(self.queue_size)
+
+		workers = [asyncio.create_task(self._parse_worker(parse_queue, upsert_queue, run))
+				   for _ in range(self.parse_workers)]
+		workers.append(asyncio.create_task(self._upsert_worker(upsert_queue, run)))
+		try:
+			await asyncio.gather(*(self._fetch(key, parse_queue, run) for key in keys))
+			await parse_queue.join()
+			await upsert_queue.join()
+		finally:
+			for worker in workers:
+				worker.cancel()
+			await asyncio.gather(*workers, return_exceptions=True)
+
+		logger.info('Pipeline stages: ' + ', '.join(f'{stage} {self.metrics[stage]}' for stage in self.STAGES))
+		return run
+
+	async def _fetch(self, key: FetchKey, parse_queue: asyncio.Queue, run: PipelineRun) -> None:
+		started = time.monotonic()
+		try:
+			response = await self.court_fetcher.fetch_response(key)
+		except FetchError as e:
+			logger.error(f'Error fetching courts for {key[1]} at {key[0]} on {key[2]}: {e}')
+			self._fail(key, run)
+			return
+		except Exception:
+			# Anything else would end the run with this key never rescheduled, so treat it as a failed fetch
+			logger.exception(f'Unexpected error fetching courts for {key[1]} at {key[0]} on {key[2]}')
+			self._fail(key, run)
+			return
+		self._observe('fetch', time.monotonic() - started)
+
+		if response is None:
+			self.fetch_scheduler.record(key, None)
+			run.unchanged += 1
+			return
+
+		waiting = time.monotonic()
+		await parse_queue.put((key, response, started))
+		self._observe('backpressure', time.monotonic() - waiting)
+
+	async def _parse_worker(self, parse_queue: asyncio.Queue, upsert_queue: asyncio.Queue, run: PipelineRun) -> None:
+		while True:
+			key, response, started = await parse_queue.get()
+			try:
+				try:
+					parsing = time.monotonic()
+					courts = self.court_fetcher.parse_response(key, response)
+					self._observe('parse', time.monotonic() - parsing)
+					self.fetch_scheduler.record(key, courts)
+				except FetchError as e:
+					logger.error(f'Error parsing courts for {key[1]} at {key[0]} on {key[2]}: {e}')
+					self._fail(key, run)
+					continue
+				except Exception:
+					# A dead worker would leave the queue waiting on it, so fail the key and carry on
+					logger.exception(f'Unexpected error parsing courts for {key[1]} at {key[0]} on {key[2]}')
+					self.court_fetcher.response_cache.discard(key)
+					self._fail(key, run)
+					continue
+				await upsert_queue.put((key, courts, started))
+			finally:
+				parse_queue.task_done()
+
+	async def _upsert_worker(self, upsert_queue: asyncio.Queue, run: PipelineRun) -> None:
+		while True:
+			batch = [await upsert_queue.get()]
+			while len(batch) < self.max_batch_keys and not upsert_queue.empty():
+				batch.append(upsert_queue.get_nowait())
+
+			try:
+				keys = [key for key, _, _ in batch]
+				courts = [court for _, batch_courts, _ in batch for court in batch_courts]
+				writing = time.monotonic()
+				# Database writes are blocking, so keep them off the event loop
+				changes = await asyncio.to_thread(self.store, courts, keys)
+				self._observe('upsert', time.monotonic() - writing)
+				if changes:
+					self.publish(changes)
+
+				published = time.monotonic()
+				for _, _, started in batch:
+					self._observe('freshness', published - started)
+				run.stored += len(batch)
+			except Exception as e:
+				# Leave the previous snapshot in place and have the scheduler retry these keys
+				logger.error(f'Error storing courts for {len(batch)} venue/category/date combinations: {e!r}')
+				for key, _, _ in batch:
+					# The response was remembered once it parsed, so forget it or the retry would be taken as unchanged
+					self.court_fetcher.response_cache.discard(key)
+					self._fail(key, run)
+			finally:
+				for _ in batch:
+					upsert_queue.task_done()
+
+	def _observe(self, stage: str, seconds: float) -> None:
+		self.metrics[stage].observe(seconds)
+		STAGE_SECONDS.observe(seconds, stage)
+
+	def _fail(self, key: FetchKey, run: PipelineRun) -> None:
+		self.fetch_scheduler.record_failure(key)
+		run.failed.append(key)
@@ -0,0 +1,221 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from datetime import date, datetime, time
+from typing import Awaitable, Callable, Optional
+
+from ..models import Court, CourtChanges
+
+logger = logging.getLogger(__name__)
+
+# A first full update of a shard can carry thousands of courts on one line
+MAX_MESSAGE_BYTES = 2 ** 24
+
+
+def encode_message(
+		message_type: str,
+		updated_at: datetime,
+		changes: Optional[CourtChanges] = None,
+		refresh_ids: Optional[list[int]] = None
+) -> bytes:
+	message = {'type': message_type, 'updated_at': updated_at.isoformat()}
+	if refresh_ids:
+		message['refreshes'] = refresh_ids
+	if changes is not None:
+		message['changes'] = {
+			kind: [_encode_court(court) for court in getattr(changes, kind)]
+			for kind in ('now_available', 'now_unavailable', 'updated', 'expired')
+		}
+	return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+def decode_changes(encoded: dict[str, list[list]]) -> CourtChanges:
+	return CourtChanges(**{kind: [_decode_court(court) for court in courts] for kind, courts in encoded.items()})
+
+
+def _encode_court(court: Court) -> list:
+	return [
+		court.composite_key, court.venue_slug, court.category_slug, court.name, court.date.isoformat(),
+		court.starts_at.isoformat('minutes'), court.ends_at.isoformat('minutes'), court.duration, court.price,
+		court.spaces
+	]
+
+
+def _decode_court(fields: list) -> Court:
+	return Court(
+		fields[0], fields[1], fields[2], fields[3], date.fromisoformat(fields[4]), time.fromisoformat(fields[5]),
+		time.fromisoformat(fields[6]), fields[7], fields[8], fields[9]
+	)
+
+
+class WorkerChannel:
+	"""
+	The serving process's end of the Unix socket that fetch worker processes report to.
+
+	Workers write courts to SQLite themselves, then send each write's changes here as a line of JSON,
+	followed by an `updated` line once their update cycle is done. The serving process only reads the
+	database, and keeps its in-memory index and feeds current from these messages. Refreshes go the
+	other way, as a `refresh` line with an id to every connected worker. A worker echoes the ids in the
+	`updated` line of the update they forced, so one already under way when the refresh arrived doesn't
+	answer it.
+	"""
+
+	def __init__(
+			self,
+			socket_path: str,
+			on_changes: Callable[[CourtChanges, datetime], Awaitable[None]],
+			on_updated: Callable[[datetime], None],
+			on_connect: Callable[[], Awaitable[None]]
+	):
+		self.socket_path = socket_path
+		self.on_changes = on_changes
+		self.on_updated = on_updated
+		self.on_connect = on_connect
+		self._workers: set[asyncio.StreamWriter] = set()
+		# Refresh id -> the workers yet to finish the update it asked for
+		self._refreshes: dict[int, dict[asyncio.StreamWriter, asyncio.Event]] = {}
+		self._refresh_ids = itertools.count(1)
+
+	@property
+	def worker_count(self) -> int:
+		return len(self._workers)
+
+	async def serve(self) -> None:
+		# A socket file left behind by a previous run would make binding fail
+		if os.path.exists(self.socket_path):
+			os.remove(self.socket_path)
+		server = await asyncio.start_unix_server(self._handle_worker, self.socket_path, limit=MAX_MESSAGE_BYTES)
+		logger.info(f'Listening for fetch workers on {self.socket_path}')
+		async with server:
+			await server.serve_forever()
+
+	async def request_refresh(self, timeout: float = 60) -> bool:
+		"""
+		Asks every connected worker to update all of its courts, and waits until they have all reported back.
+		"""
+		if not self._workers:
+			logger.warning('No fetch workers are connected to refresh')
+			return False
+
+		refresh_id = next(self._refresh_ids)
+		refreshes = self._refreshes[refresh_id] = {writer: asyncio.Event() for writer in self._workers}
+		for writer in refreshes:
+			writer.write(json.dumps({'type': 'refresh', 'id': refresh_id}, separators=(',', ':')).encode() + b'\n')
+		try:
+			await asyncio.wait_for(asyncio.gather(*(event.wait() for event in refreshes.values())), timeout)
+			return True
+		except asyncio.TimeoutError:
+			logger.warning(f'Fetch workers did not finish refreshing within {timeout:.0f} seconds')
+			return False
+		finally:
+			self._refreshes.pop(refresh_id, None)
+
+	async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		self._workers.add(writer)
+		logger.info(f'Fetch worker connected, {len(self._workers)} connected')
+		try:
+			# Changes written while this worker was disconnected were never sent, so start again from the database
+			await self.on_connect()
+			while line := await reader.readline():
+				message = json.loads(line)
+				updated_at = datetime.fromisoformat(message['updated_at'])
+				if message['type'] == 'changes':
+					await self.on_changes(decode_changes(message['changes']), updated_at)
+				elif message['type'] == 'updated':
+					self.on_updated(updated_at)
+					for refresh_id in message.get('refreshes', ()):
+						self._finish_refresh(refresh_id, writer)
+		except (ConnectionError, ValueError, KeyError) as e:
+			logger.error(f'Dropping fetch worker connection: {e!r}')
+		finally:
+			self._workers.discard(writer)
+			# A refresh can never be answered by a worker that has gone
+			for refresh_id in list(self._refreshes):
+				self._finish_refresh(refresh_id, writer)
+			writer.close()
+			logger.info(f'Fetch worker disconnected, {len(self._workers)} connected')
+
+	def _finish_refresh(self, refresh_id: int, writer: asyncio.StreamWriter) -> None:
+		event = self._refreshes.get(refresh_id, {}).get(writer)
+		if event is not None:
+			event.set()
+
+
+class WorkerConnection:
+	"""
+	A fetch worker's end of the socket, reconnecting whenever the serving process restarts.
+
+	Messages are dropped rather than queued while disconnected, as the serving process reloads from
+	the database each time a worker connects.
+	"""
+
+	def __init__(self, socket_path: str, retry_interval: float = 5):
+		self.socket_path = socket_path
+		self.retry_interval = retry_interval
+		self.refresh_requested = asyncio.Event()
+		self._refresh_ids: list[int] = []
+		self._outgoing: Optional[asyncio.Queue[bytes]] = None
+
+	@property
+	def connected(self) -> bool:
+		return self._outgoing is not None
+
+	def publish(self, changes: CourtChanges) -> None:
+		self._send(encode_message('changes', datetime.now(), changes))
+
+	def report_updated(self, updated_at: datetime, refresh_ids: Optional[list[int]] = None) -> None:
+		"""
+		Reports an update cycle as done, along with the ids of the refreshes that forced it.
+		"""
+		self._send(encode_message('updated', updated_at, refresh_ids=refresh_ids))
+
+	def take_refresh_ids(self) -> list[int]:
+		"""
+		Returns the ids of the refreshes asked for since the last call, which the next update is then forced to answer.
+		"""
+		self.refresh_requested.clear()
+		refresh_ids, self._refresh_ids = self._refresh_ids, []
+		return refresh_ids
+
+	def _send(self, message: bytes) -> None:
+		if self._outgoing is not None:
+			self._outgoing.put_nowait(message)
+
+	async def run(self) -> None:
+		while True:
+			try:
+				reader, writer = await asyncio.open_unix_connection(self.socket_path)
+			except OSError as e:
+				logger.debug(f'Could not connect to {self.socket_path}: {e}')
+				await asyncio.sleep(self.retry_interval)
+				continue
+
+			logger.info(f'Connected to the serving process on {self.socket_path}')
+			self._outgoing = asyncio.Queue()
+			listener = asyncio.create_task(self._listen(reader))
+			try:
+				while not listener.done():
+					sending = asyncio.create_task(self._outgoing.get())
+					await asyncio.wait((sending, listener), return_when=asyncio.FIRST_COMPLETED)
+					if not sending.done():
+						sending.cancel()
+						break
+					writer.write(sending.result())
+					await writer.drain()
+			except ConnectionError as e:
+				logger.warning(f'Lost connection to the serving process: {e!r}')
+			finally:
+				self._outgoing = None
+				listener.cancel()
+				writer.close()
+			await asyncio.sleep(self.retry_interval)
+
+	async def _listen(self, reader: asyncio.StreamReader) -> None:
+		while line := await reader.readline():
+			message = json.loads(line)
+			if message.get('type') == 'refresh':
+				self._refresh_ids.append(message['id'])
+				self.refresh_requested.set()
+		logger.warning('The serving process closed the connection')
@@ -5,27 +5,92 @@ import sys
 
 from dotenv import load_dotenv
 
+from src.services.async_court_database import AsyncCourtDatabase
+from src.services.change_feed import ChangeFeed
 from src.services.court_updater import CourtUpdater
+from src.services.ics_writer import IcsWriter
+from src.services.worker_channel import WorkerChannel
 from src.telegram_bot.telegram_bot import TelegramBot
+from src.utils.constants import WORKER_SOCKET_PATH
+from src.utils.metrics import Histogram
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+LOOP_LAG_SECONDS = Histogram('event_loop_lag_seconds', 'How late the event loop woke up a sleeping coroutine')
+
 
 async def court_updater_task(interval: float = 300):
 	try:
+		await asyncio.to_thread(CourtUpdater().load_availability_index)
 		while True:
-			CourtUpdater().update()
-			logger.info(f'Done, next update for courts in {interval} seconds')
-			await asyncio.sleep(interval)
+			await CourtUpdater().update()
+
+			# The scheduler decides when the next combination is due, capped at the given interval
+			wait = max(1.0, min(interval, CourtUpdater().seconds_until_next_update()))
+			logger.info(f'Done, next update for courts in {wait:.0f} seconds')
+			await asyncio.sleep(wait)
 	except asyncio.CancelledError:
 		logger.info('Court updater task cancelled')
+		await CourtUpdater().close()
 		raise
 	except Exception as e:
 		logger.error(f'Error while updating courts: {e}')
 		raise
 
 
+async def worker_listener_task(socket_path: str = WORKER_SOCKET_PATH):
+	"""
+	Stands in for court_updater_task when fetching runs in separate worker processes (see src/worker.py).
+	"""
+	updater = CourtUpdater()
+	channel = WorkerChannel(
+		socket_path,
+		on_changes=updater.receive,
+		on_updated=updater.receive_updated,
+		on_connect=updater.reload
+	)
+	updater.worker_channel = channel
+	try:
+		await asyncio.to_thread(updater.load_availability_index)
+		await channel.serve()
+	except asyncio.CancelledError:
+		logger.info('Worker listener task cancelled')
+		raise
+
+
+async def ics_writer_task():
+	subscription = ChangeFeed().subscribe()
+	writer = IcsWriter()
+	try:
+		# Start from the database, then only re-render the courts that each update changed
+		courts = await AsyncCourtDatabase().get_all_available()
+		await asyncio.to_thread(writer.rebuild, courts)
+		await asyncio.to_thread(writer.write)
+
+		async for changes in subscription:
+			await asyncio.to_thread(writer.apply, changes)
+			await asyncio.to_thread(writer.write)
+	except asyncio.CancelledError:
+		logger.info('ICS writer task cancelled')
+		raise
+	finally:
+		subscription.close()
+
+
+async def loop_lag_monitor_task(interval: float = 0.5):
+	# Anything blocking the loop delays this wake-up by as long as it blocks
+	loop = asyncio.get_running_loop()
+	try:
+		while True:
+			expected = loop.time() + interval
+			await asyncio.sleep(interval)
+			LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+	except asyncio.CancelledError:
+		logger.info('Loop lag monitor task cancelled')
+		raise
+
+
 async def telegram_bot_task():
 	bot_token = os.getenv('BOT_TOKEN')
 	if not bot_token:
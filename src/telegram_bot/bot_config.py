@@ -1,22 +1,34 @@
+import copy
 import logging
+import os
+import tempfile
+from typing import Optional
 
 import toml
 
+from src.models import Subscription
+from src.telegram_bot.subscriber_store import SubscriberStore
 from src.utils.constants import BOT_CONFIG_PATH
 
 logger = logging.getLogger(__name__)
 
 
 class BotConfig:
+	"""
+	Bot settings, kept in a TOML file. Subscribers live in the SubscriberStore, which this wraps.
+	"""
 	_instance = None
 	_initialised = False
 
 	DEFAULT_CONFIG = {
 		'settings': {
 			'polling_interval': 300,
-			'notify_list': set()
+			# Seconds after a user is notified to hold further changes for, so that rapid changes are sent together
+			'notification_window': 120
 		}
 	}
+	# Keys that earlier versions kept in the TOML file and now belong to the SubscriberStore
+	LEGACY_SUBSCRIBER_KEYS = ('notify_list', 'subscriptions')
 
 	def __new__(cls):
 		if cls._instance is None:
@@ -29,8 +41,14 @@ class BotConfig:
 			return
 		self.config_path = BOT_CONFIG_PATH
 		self.config = self._load()
+		self.subscribers = SubscriberStore()
+		self._migrate_subscribers()
 		self._initialised = True
 
+	@property
+	def version(self) -> int:
+		return self.subscribers.version
+
 	def _load(self) -> dict:
 		logger.debug(f'Attempting to load config from {self.config_path}')
 		try:
@@ -40,31 +58,75 @@ class BotConfig:
 		# File not found, return the default config
 		except FileNotFoundError:
 			logger.info(f'No config file found at {self.config_path}, using defaults')
-			return self.DEFAULT_CONFIG.copy()
+			return copy.deepcopy(self.DEFAULT_CONFIG)
 
 	def _save(self):
-		with open(self.config_path, 'w') as f:
-			toml.dump(self.config, f)
-			logger.info(f'Config saved to {self.config_path}')
+		directory = os.path.dirname(os.path.abspath(self.config_path))
+		fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.bot_config-', suffix='.toml.tmp')
+		try:
+			with os.fdopen(fd, 'w') as f:
+				toml.dump(self.config, f)
+				f.flush()
+				os.fsync(f.fileno())
+			os.replace(tmp_path, self.config_path)
+		except BaseException:
+			os.unlink(tmp_path)
+			raise
+		logger.info(f'Config saved to {self.config_path}')
+
+	def _migrate_subscribers(self):
+		"""
+		Moves subscribers out of a TOML file written by an earlier version. They are committed to the
+		store before the file is rewritten, so a crash in between only means importing them again.
+		"""
+		settings = self.config.get('settings', {})
+		if not any(key in settings for key in self.LEGACY_SUBSCRIBER_KEYS):
+			return
+
+		criteria = settings.get('subscriptions') or {}
+		subscriptions = [
+			Subscription.from_dict(user_id, criteria.get(str(user_id), {}))
+			for user_id in settings.get('notify_list') or []
+		]
+		# Anyone who subscribed or unsubscribed since an interrupted migration keeps their choice
+		self.subscribers.put_many(subscriptions, replace=False)
+
+		for key in self.LEGACY_SUBSCRIBER_KEYS:
+			settings.pop(key, None)
+		self._save()
+		logger.info(f'Migrated {len(subscriptions)} subscribers from {self.config_path}')
 
 	def get(self, key: str):
-		return self.config.get('settings').get(key)
+		# Settings added since the file was written fall back to their defaults
+		return self.config.get('settings', {}).get(key, self.DEFAULT_CONFIG['settings'].get(key))
 
 	def set(self, key: str, value):
 		self.config['settings'][key] = value
 		self._save()
 
 	def get_notify_list(self) -> set:
-		return set(self.get('notify_list'))
+		return self.subscribers.user_ids()
+
+	def is_on_notify_list(self, user_id: int) -> bool:
+		return user_id in self.subscribers
 
 	def add_to_notify_list(self, user_id: int):
-		notify_list = self.get_notify_list()
-		notify_list.add(user_id)
-		self.set('notify_list', list(notify_list))
+		self.subscribers.put(Subscription(user_id))
 		logger.info(f'Added user {user_id} to notify list')
 
 	def remove_from_notify_list(self, user_id: int):
-		notify_list = self.get_notify_list()
-		notify_list.remove(user_id)
-		self.set('notify_list', list(notify_list))
-		logger.info(f'Removed user {user_id} from notify list')
+		if self.subscribers.remove(user_id):
+			logger.info(f'Removed user {user_id} from notify list')
+
+	def get_subscriptions(self) -> list[Subscription]:
+		"""
+		Returns a subscription for every user on the notify list. Users without criteria get everything.
+		"""
+		return self.subscribers.get_all()
+
+	def get_subscription(self, user_id: int) -> Optional[Subscription]:
+		return self.subscribers.get(user_id)
+
+	def set_subscription(self, subscription: Subscription):
+		self.subscribers.put(subscription)
+		logger.info(f'Set subscription for user {subscription.user_id}')
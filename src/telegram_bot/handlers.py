@@ -5,14 +5,30 @@ from aiogram import Router
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 
-from src.services.court_database import CourtDatabase
+from src.services.async_court_database import AsyncCourtDatabase
+from src.services.availability_index import AvailabilityIndex
 from src.services.court_updater import CourtUpdater
+from src.models import Subscription
+from src.models.subscription import WEEKDAYS
 from src.telegram_bot.bot_config import BotConfig
+from src.utils.constants import TIME_RANGES, VENUE_MAP, BADMINTON_40MIN, BADMINTON_60MIN
 from src.utils.court_formatter import format_court_availability
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+TIME_RANGE_EMOJIS = {'morning': '🌅', 'afternoon': '☀️', 'evening': '🌙'}
+# Days are given as their abbreviation or their whole name, e.g. sat or saturday
+WEEKDAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+WEEKDAY_ARGS = {name: weekday for weekday, names in enumerate(zip(WEEKDAYS, WEEKDAY_NAMES)) for name in names}
+MIN_VENUE_PREFIX = 3
+SUBSCRIBE_USAGE = f'''Usage: /subscribe [venue] [duration] [day] [time]
+🏟️ Venues: {', '.join(venue.split('-')[0] for venue in VENUE_MAP)}
+⏱️ Durations: 40min, 60min
+📅 Days: {', '.join(WEEKDAYS)}
+⏰ Times: {', '.join(TIME_RANGES)}
+Each criterion can be given more than once, e.g. /subscribe sugden sat sun evening'''
+
 
 # TODO: Add an introduction message to /start
 @router.message(CommandStart())
@@ -38,7 +54,8 @@ async def search_callback(callback_query: CallbackQuery):
 @router.callback_query(lambda c: c.data == 'search_all')
 async def search_all_callback(callback_query: CallbackQuery):
 	_log_callback_query(callback_query)
-	courts = CourtDatabase().get_all_available()
+	index = AvailabilityIndex()
+	courts = index.get_all_available() if index.loaded else await AsyncCourtDatabase().get_all_available()
 
 	await callback_query.message.edit_text(
 		format_court_availability(
@@ -75,7 +92,10 @@ async def search_by_date_selected_callback(callback_query: CallbackQuery):
 	_log_callback_query(callback_query)
 	prefix = 'search_by_date_'
 	search_date = date.fromisoformat(callback_query.data[len(prefix):])
-	courts = CourtDatabase().get_available_by_date(search_date)
+	index = AvailabilityIndex()
+	courts = index.get_available_by_date(search_date) \
+		if index.loaded \
+		else await AsyncCourtDatabase().get_available_by_date(search_date)
 
 	await callback_query.message.edit_text(
 		format_court_availability(
@@ -91,19 +111,11 @@ async def search_by_time_callback(callback_query: CallbackQuery):
 
 	keyboard_buttons = [
 		[InlineKeyboardButton(
-			text='🌅 Morning (07:00 - 12:00)',
-			callback_data='search_by_time_morning'
-		)],
-		[InlineKeyboardButton(
-			text='☀️ Afternoon (12:00 - 17:00)',
-			callback_data='search_by_time_afternoon'
-		)],
-		[InlineKeyboardButton(
-			text='🌙 Evening (17:00 - 22:00)',
-			callback_data='search_by_time_evening'
-		)],
-		[_create_back_button('search')]
+			text=f'{TIME_RANGE_EMOJIS[name]} {name.title()} ({starts} - {ends})',
+			callback_data=f'search_by_time_{name}'
+		)] for name, (starts, ends) in TIME_RANGES.items()
 	]
+	keyboard_buttons.append([_create_back_button('search')])
 
 	await callback_query.message.edit_text(
 		f'🔍 Select a time:\n{_get_last_updated()}',
@@ -116,13 +128,12 @@ async def search_by_time_callback(callback_query: CallbackQuery):
 async def search_by_time_selected_callback(callback_query: CallbackQuery):
 	_log_callback_query(callback_query)
 	prefix = 'search_by_time_'
-	time_range = {
-		'morning': ('07:00', '12:00'),
-		'afternoon': ('12:00', '17:00'),
-		'evening': ('17:00', '22:00')
-	}[callback_query.data[len(prefix):]]
+	time_range = TIME_RANGES[callback_query.data[len(prefix):]]
 
-	courts = CourtDatabase().get_available_by_time_range(time_range)
+	index = AvailabilityIndex()
+	courts = index.get_available_by_time_range(time_range) \
+		if index.loaded \
+		else await AsyncCourtDatabase().get_available_by_time_range(time_range)
 
 	await callback_query.message.edit_text(
 		format_court_availability(
@@ -138,7 +149,7 @@ async def notify_command(message: Message):
 	_log_command(message)
 	user_id = message.from_user.id
 
-	if user_id in BotConfig().get_notify_list():
+	if BotConfig().is_on_notify_list(user_id):
 		BotConfig().remove_from_notify_list(user_id)
 		await message.answer(
 			'''
@@ -156,6 +167,38 @@ async def notify_command(message: Message):
 		)
 
 
+@router.message(Command('subscribe'))
+async def subscribe_command(message: Message):
+	_log_command(message)
+	user_id = message.from_user.id
+	args = message.text.split()[1:]
+
+	if not args:
+		subscription = BotConfig().get_subscription(user_id)
+		current = f'🔔 Your subscription:\n{subscription}' if subscription else '🔕 You are not subscribed.'
+		await message.answer(f'{current}\n\n{SUBSCRIBE_USAGE}')
+		return
+
+	try:
+		subscription = _parse_subscription(user_id, args)
+	except ValueError as e:
+		await message.answer(f'❌ {e}\n\n{SUBSCRIBE_USAGE}')
+		return
+
+	BotConfig().set_subscription(subscription)
+	await message.answer(f'🔔 You will be pinged when matching courts become available:\n{subscription}')
+
+
+@router.message(Command('unsubscribe'))
+async def unsubscribe_command(message: Message):
+	_log_command(message)
+	user_id = message.from_user.id
+
+	if BotConfig().is_on_notify_list(user_id):
+		BotConfig().remove_from_notify_list(user_id)
+	await message.answer('🔕 You will no longer receive updates about court availability.')
+
+
 @router.message(Command('refresh'))
 async def refresh_command(message: Message):
 	_log_command(message)
@@ -164,7 +207,7 @@ async def refresh_command(message: Message):
 		'🔄 Manually updating courts, please wait...'
 	)
 
-	CourtUpdater().update()
+	await CourtUpdater().update(force=True)
 
 	await msg.edit_text(
 		f'✅ Courts updated successfully!\n{_get_last_updated()}',
@@ -196,6 +239,41 @@ def _create_search_message() -> tuple[str, InlineKeyboardMarkup, str]:
 	)
 
 
+def _parse_subscription(user_id: int, args: list[str]) -> Subscription:
+	categories = {'40min': BADMINTON_40MIN, '60min': BADMINTON_60MIN}
+	venues, chosen_categories, weekdays, time_ranges = [], [], [], []
+
+	for arg in (arg.lower() for arg in args):
+		if arg in categories:
+			chosen_categories.append(categories[arg])
+		elif arg in WEEKDAY_ARGS:
+			weekdays.append(WEEKDAY_ARGS[arg])
+		elif arg in TIME_RANGES:
+			time_ranges.append(arg)
+		else:
+			venues.append(_parse_venue(arg))
+
+	return Subscription(
+		user_id,
+		tuple(dict.fromkeys(venues)),
+		tuple(dict.fromkeys(chosen_categories)),
+		tuple(sorted(set(weekdays))),
+		tuple(dict.fromkeys(time_ranges))
+	)
+
+
+def _parse_venue(arg: str) -> str:
+	# A whole slug, or enough of the start of one to tell it apart, so a stray letter is not taken as a venue
+	if arg in VENUE_MAP:
+		return arg
+	matches = [venue for venue in VENUE_MAP if venue.startswith(arg)] if len(arg) >= MIN_VENUE_PREFIX else []
+	if not matches:
+		raise ValueError(f'Unrecognised criterion: {arg}')
+	if len(matches) > 1:
+		raise ValueError(f'Ambiguous venue: {arg} could be {", ".join(matches)}')
+	return matches[0]
+
+
 def _create_back_button_keyboard(callback_data: str) -> InlineKeyboardMarkup:
 	return InlineKeyboardMarkup(inline_keyboard=[
 		[_create_back_button(callback_data)]
@@ -0,0 +1,160 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+from src.models import Court
+from src.telegram_bot.notification_dispatcher import DispatchResult, OutgoingMessage
+from src.utils.court_formatter import format_court_availability
+
+logger = logging.getLogger(__name__)
+
+AVAILABLE_HEADER = '✅ Now available:'
+UNAVAILABLE_HEADER = '❌ Now unavailable:'
+GONE_HEADER = '❌ No longer available:'
+
+
+@dataclass
+class _UserState:
+	# Changes waiting for the window to close, keyed by composite key
+	pending_available: dict[str, Court] = field(default_factory=dict)
+	pending_unavailable: dict[str, Court] = field(default_factory=dict)
+	flush_at: Optional[float] = None
+	# Changes arriving before this are held for one flush then, rather than sent as they come
+	quiet_until: float = 0.0
+
+	# The last "now available" message, which later changes are edited into
+	live_message_id: Optional[int] = None
+	live_sent_at: float = 0.0
+	live_available: dict[str, Court] = field(default_factory=dict)
+	live_gone: dict[str, Court] = field(default_factory=dict)
+
+	# What the new message being sent will list, until it is known to have been delivered
+	awaiting: dict[str, Court] = field(default_factory=dict)
+
+	@property
+	def pending(self) -> bool:
+		return bool(self.pending_available or self.pending_unavailable)
+
+
+class NotificationCoalescer:
+	"""
+	Turns each user's stream of availability changes into as few Telegram calls as possible.
+
+	The first change for a user is sent straight away, and opens a window of `window` seconds in which
+	any further changes are held. A court that becomes available and then unavailable again (or the
+	reverse) within the window cancels out. When the window closes, what was held is edited into the
+	message that opened it, so flapping slots never ping the user again. Once that message is older than
+	the window, only courts listed in it are edited, and others are sent as a new message, which then
+	becomes the one to edit. Messages older than `edit_window` are left alone.
+
+	All methods take the current time, so the state machine can be driven by a replayed trace.
+	"""
+
+	def __init__(self, window: float = 120, edit_window: float = 6 * 60 * 60):
+		self.window = window
+		self.edit_window = edit_window
+		self._users: dict[int, _UserState] = {}
+
+	def add(self, user_id: int, available: list[Court], unavailable: list[Court], now: float) -> None:
+		state = self._users.setdefault(user_id, _UserState())
+
+		for court in available:
+			if state.pending_unavailable.pop(court.composite_key, None) is None:
+				state.pending_available[court.composite_key] = court
+		for court in unavailable:
+			if state.pending_available.pop(court.composite_key, None) is None:
+				state.pending_unavailable[court.composite_key] = court
+
+		if state.flush_at is None:
+			state.flush_at = max(now, state.quiet_until)
+
+	@property
+	def pending_users(self) -> int:
+		return sum(state.pending for state in self._users.values())
+
+	def seconds_until_next_flush(self, now: float) -> Optional[float]:
+		deadlines = [state.flush_at for state in self._users.values() if state.flush_at is not None]
+		return max(0.0, min(deadlines) - now) if deadlines else None
+
+	def flush_due(self, now: float) -> dict[int, list[OutgoingMessage]]:
+		"""
+		Closes every window that has expired and returns the messages to send or edit for each user.
+		"""
+		rendered: dict[tuple, str] = {}
+		recipients = {}
+
+		for user_id, state in list(self._users.items()):
+			if state.flush_at is not None and state.flush_at <= now:
+				messages = self._flush(state, now, rendered)
+				if messages:
+					recipients[user_id] = messages
+			elif not state.pending and not self._is_live(state, now):
+				del self._users[user_id]
+
+		logger.debug(f'Coalesced notifications for {len(recipients)} users into {len(rendered)} distinct messages')
+		return recipients
+
+	def record(self, result: DispatchResult, now: float) -> None:
+		"""
+		Updates each user's last message from the outcome of dispatching what flush_due returned.
+		"""
+		for user_id in result.blocked:
+			self._users.pop(user_id, None)
+
+		for user_id, state in self._users.items():
+			if user_id in result.sent and state.awaiting:
+				state.live_message_id = result.sent[user_id]
+				state.live_sent_at = now
+				state.live_available, state.live_gone = state.awaiting, {}
+			elif user_id in result.failed_chats:
+				# The last message may no longer say what we think it does, so start afresh
+				state.live_message_id = None
+				state.live_available, state.live_gone = {}, {}
+			state.awaiting = {}
+
+	def _flush(self, state: _UserState, now: float, rendered: dict[tuple, str]) -> list[OutgoingMessage]:
+		available, unavailable = state.pending_available, state.pending_unavailable
+		state.pending_available, state.pending_unavailable, state.flush_at = {}, {}, None
+		state.quiet_until = now + self.window
+
+		if not self._is_live(state, now):
+			state.live_message_id = None
+			state.live_available, state.live_gone = {}, {}
+
+		edited = False
+		if state.live_message_id is not None and now - state.live_sent_at <= self.window:
+			# The user was only just notified, so add to that message rather than pinging them again
+			for key in [key for key in available if key not in state.live_gone]:
+				state.live_available[key] = available.pop(key)
+				edited = True
+		for key in [key for key in available if key in state.live_gone]:
+			state.live_available[key] = state.live_gone.pop(key)
+			del available[key]
+			edited = True
+		for key in [key for key in unavailable if key in state.live_available]:
+			state.live_gone[key] = state.live_available.pop(key)
+			del unavailable[key]
+			edited = True
+
+		messages = []
+		if edited:
+			text = self._render(rendered, (AVAILABLE_HEADER, state.live_available), (GONE_HEADER, state.live_gone))
+			messages.append(OutgoingMessage(text, edit_message_id=state.live_message_id))
+		if available or unavailable:
+			text = self._render(rendered, (AVAILABLE_HEADER, available), (UNAVAILABLE_HEADER, unavailable))
+			messages.append(OutgoingMessage(text))
+			state.awaiting = available
+		return messages
+
+	def _is_live(self, state: _UserState, now: float) -> bool:
+		return state.live_message_id is not None and now - state.live_sent_at < self.edit_window
+
+	@staticmethod
+	def _render(rendered: dict[tuple, str], *sections: tuple[str, dict[str, Court]]) -> str:
+		key = tuple((header, tuple(sorted(courts))) for header, courts in sections if courts)
+		if key not in rendered:
+			rendered[key] = '\n\n'.join(
+				format_court_availability(list(courts.values()), header=header, include_spaces=False)
+				for header, courts in sections if courts
+			)
+		return rendered[key]
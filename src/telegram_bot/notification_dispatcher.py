@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Mapping, Optional, Sequence
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError, \
+	TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from src.utils.metrics import COUNT_BUCKETS, Histogram
+from src.utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_SECONDS = Histogram('notification_dispatch_seconds', 'Time to send one round of notifications to every chat')
+DISPATCH_CHATS = Histogram('notification_dispatch_chats', 'Chats notified per round', buckets=COUNT_BUCKETS)
+
+
+@dataclass(frozen=True)
+class OutgoingMessage:
+	text: str
+	# When set, this earlier message is edited in place rather than a new one being sent
+	edit_message_id: Optional[int] = None
+
+
+@dataclass
+class DispatchResult:
+	delivered: int = 0
+	failed: int = 0
+	blocked: set[int] = field(default_factory=set)
+	# The id of the last new message sent to each chat
+	sent: dict[int, int] = field(default_factory=dict)
+	failed_chats: set[int] = field(default_factory=set)
+
+	def __str__(self):
+		return f'{self.delivered} delivered, {self.failed} failed, {len(self.blocked)} blocked'
+
+
+class NotificationDispatcher:
+	"""
+	Sends the same messages to many chats at once, within Telegram's rate limits.
+
+	Sends are bounded by a semaphore and paced by a global token bucket plus one per chat, so a chat
+	receives its messages in order while other chats are served concurrently. A RetryAfter from
+	Telegram pauses every send until flood control lifts. Chats that have blocked the bot are reported
+	back rather than retried.
+	"""
+
+	def __init__(
+			self,
+			bot: Bot,
+			max_concurrency: int = 20,
+			global_rate: float = 25,
+			global_burst: float = 5,
+			per_chat_rate: float = 1,
+			per_chat_burst: float = 3,
+			max_retries: int = 3,
+			backoff_base: float = 1
+	):
+		self.bot = bot
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.per_chat_rate = per_chat_rate
+		self.per_chat_burst = per_chat_burst
+		self.rate_limiter = TokenBucket(global_rate, global_burst)
+		self._semaphore = asyncio.Semaphore(max_concurrency)
+		self._chat_limiters: dict[int, TokenBucket] = {}
+		self._resume_at = 0.0
+
+	async def dispatch(self, recipients: Mapping[int, Sequence[OutgoingMessage]]) -> DispatchResult:
+		"""
+		Sends or edits each chat's messages, in order. Chats receiving the same text should share the same
+		rendered strings, so that each distinct body is only rendered once by the caller.
+		"""
+		result = DispatchResult()
+		if not recipients:
+			return result
+
+		start = time.perf_counter()
+		await asyncio.gather(*(self._send_all(chat_id, messages, result) for chat_id, messages in recipients.items()))
+		DISPATCH_SECONDS.observe(time.perf_counter() - start)
+		DISPATCH_CHATS.observe(len(recipients))
+		logger.info(f'Dispatched notifications in {time.perf_counter() - start:.2f}s: {result}')
+		return result
+
+	async def _send_all(self, chat_id: int, messages: Sequence[OutgoingMessage], result: DispatchResult) -> None:
+		async with self._semaphore:
+			for message in messages:
+				try:
+					message_id = await self._send(chat_id, message)
+					result.delivered += 1
+					if message.edit_message_id is None:
+						result.sent[chat_id] = message_id
+				except TelegramForbiddenError:
+					logger.info(f'User {chat_id} has blocked the bot')
+					result.blocked.add(chat_id)
+					return
+				except TelegramAPIError as e:
+					logger.warning(f'Failed to notify user {chat_id}: {e!r}')
+					result.failed += 1
+					result.failed_chats.add(chat_id)
+
+	async def _send(self, chat_id: int, message: OutgoingMessage) -> int:
+		attempt = 0
+
+		while True:
+			await self._wait_for_flood_control()
+			await self._limiter_for(chat_id).acquire()
+			await self.rate_limiter.acquire()
+			try:
+				if message.edit_message_id is None:
+					return (await self.bot.send_message(chat_id, message.text)).message_id
+				await self.bot.edit_message_text(message.text, chat_id=chat_id, message_id=message.edit_message_id)
+				return message.edit_message_id
+			except TelegramBadRequest as e:
+				# Editing a message to the text it already has is harmless
+				if message.edit_message_id is None or 'message is not modified' not in e.message:
+					raise
+				return message.edit_message_id
+			except TelegramRetryAfter as e:
+				# Flood control applies to the whole bot, so every send waits it out, not just this one
+				logger.warning(f'Telegram flood control hit, pausing sends for {e.retry_after}s')
+				self._resume_at = max(self._resume_at, time.monotonic() + e.retry_after)
+			except (TelegramNetworkError, TelegramServerError) as e:
+				if attempt == self.max_retries:
+					raise
+				delay = self.backoff_base * 2 ** attempt
+				logger.warning(f'Sending to user {chat_id} failed ({e!r}), retrying in {delay:.2f}s')
+				await asyncio.sleep(delay)
+				attempt += 1
+
+	async def _wait_for_flood_control(self) -> None:
+		while (delay := self._resume_at - time.monotonic()) > 0:
+			await asyncio.sleep(delay)
+
+	def _limiter_for(self, chat_id: int) -> TokenBucket:
+		if chat_id not in self._chat_limiters:
+			self._chat_limiters[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+		return self._chat_limiters[chat_id]
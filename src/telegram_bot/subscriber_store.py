@@ -0,0 +1,124 @@
+import json
+import logging
+import sqlite3
+import threading
+from typing import Iterable, Optional
+
+from src.models import Subscription
+from src.utils.constants import SUBSCRIBERS_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriberStore:
+	"""
+	Subscribers and their criteria, one row per user in SQLite.
+
+	Every change is a single-row transaction, so a toggle costs the same however many users there are
+	and a crash never leaves a half-written file behind. All subscriptions are also held in memory,
+	keyed by user, so lookups never touch the disk.
+	"""
+	_instance = None
+	_initialised = False
+
+	PRAGMAS = (
+		'PRAGMA journal_mode = WAL',
+		'PRAGMA synchronous = NORMAL',
+		'PRAGMA busy_timeout = 5000',
+	)
+
+	def __new__(cls, *args, **kwargs):
+		if cls._instance is None:
+			logger.debug('Creating a new instance of SubscriberStore')
+			cls._instance = super().__new__(cls)
+		return cls._instance
+
+	def __init__(self, db_path: str = SUBSCRIBERS_DB_PATH):
+		if self._initialised:
+			return
+		self.db_path = db_path
+		self._lock = threading.Lock()
+		self._conn = sqlite3.connect(db_path, check_same_thread=False)
+		for pragma in self.PRAGMAS:
+			self._conn.execute(pragma)
+		self._initialise()
+		self._subscriptions = {subscription.user_id: subscription for subscription in self._load()}
+		# Bumped on every change, so that anything derived from the subscriptions knows to rebuild
+		self.version = 0
+		self._initialised = True
+
+	def _initialise(self) -> None:
+		with self._conn:
+			self._conn.execute('''
+				CREATE TABLE IF NOT EXISTS subscribers (
+					user_id INTEGER PRIMARY KEY,
+					venues TEXT NOT NULL DEFAULT '[]',
+					categories TEXT NOT NULL DEFAULT '[]',
+					weekdays TEXT NOT NULL DEFAULT '[]',
+					time_ranges TEXT NOT NULL DEFAULT '[]'
+				)
+			''')
+
+	def _load(self) -> list[Subscription]:
+		rows = self._conn.execute(
+			'SELECT user_id, venues, categories, weekdays, time_ranges FROM subscribers'
+		).fetchall()
+		logger.info(f'Loaded {len(rows)} subscribers from {self.db_path}')
+		return [
+			Subscription(user_id, *(tuple(json.loads(column)) for column in columns))
+			for user_id, *columns in rows
+		]
+
+	def __contains__(self, user_id: int) -> bool:
+		return user_id in self._subscriptions
+
+	def __len__(self) -> int:
+		return len(self._subscriptions)
+
+	def get(self, user_id: int) -> Optional[Subscription]:
+		return self._subscriptions.get(user_id)
+
+	def get_all(self) -> list[Subscription]:
+		return list(self._subscriptions.values())
+
+	def user_ids(self) -> set[int]:
+		return set(self._subscriptions)
+
+	def put(self, subscription: Subscription) -> None:
+		self.put_many([subscription])
+
+	def put_many(self, subscriptions: Iterable[Subscription], replace: bool = True) -> None:
+		"""
+		Adds or replaces subscriptions in one transaction. With replace=False existing users are kept as they are.
+		"""
+		subscriptions = list(subscriptions)
+		with self._lock:
+			with self._conn:
+				self._conn.executemany(
+					f'''
+					INSERT {'OR REPLACE' if replace else 'OR IGNORE'} INTO subscribers
+						(user_id, venues, categories, weekdays, time_ranges)
+					VALUES (?, ?, ?, ?, ?)
+					''',
+					[
+						(subscription.user_id, json.dumps(subscription.venues), json.dumps(subscription.categories),
+						 json.dumps(subscription.weekdays), json.dumps(subscription.time_ranges))
+						for subscription in subscriptions
+					]
+				)
+			# Only once the transaction has committed
+			for subscription in subscriptions:
+				if replace or subscription.user_id not in self._subscriptions:
+					self._subscriptions[subscription.user_id] = subscription
+			self.version += 1
+
+	def remove(self, user_id: int) -> bool:
+		with self._lock:
+			with self._conn:
+				removed = self._conn.execute('DELETE FROM subscribers WHERE user_id = ?', (user_id,)).rowcount > 0
+			self._subscriptions.pop(user_id, None)
+			self.version += 1
+		return removed
+
+	def close(self) -> None:
+		self._conn.close()
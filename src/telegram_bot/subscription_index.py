@@ -0,0 +1,53 @@
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from src.models import Court, Subscription
+from src.models.subscription import WINDOWS
+
+# (venue slug, or None for any venue; weekday; hour the court starts in)
+IndexKey = tuple[Optional[str], int, int]
+
+
+class SubscriptionIndex:
+	"""
+	An inverted index from (venue, weekday, hour) to the subscriptions that could match a court there.
+
+	Each changed court only looks at the subscriptions in its own two buckets, its venue and any venue,
+	so routing a change event costs O(changes × matching subscriptions) rather than O(users × changes).
+	Candidates are still checked in full, as the buckets do not cover categories or minutes.
+	"""
+
+	def __init__(self, subscriptions: Iterable[Subscription]):
+		self._index: dict[IndexKey, list[Subscription]] = defaultdict(list)
+		self.size = 0
+		for subscription in subscriptions:
+			for key in self._keys_for(subscription):
+				self._index[key].append(subscription)
+			self.size += 1
+
+	def match(self, courts: Iterable[Court]) -> dict[int, list[Court]]:
+		"""
+		Returns the courts each interested user should hear about, in the order given.
+		"""
+		matched = defaultdict(list)
+		for court in courts:
+			weekday, hour = court.date.weekday(), court.starts_at.hour
+			for venue in (court.venue_slug, None):
+				for subscription in self._index.get((venue, weekday, hour), ()):
+					if subscription.matches(court):
+						matched[subscription.user_id].append(court)
+		return dict(matched)
+
+	@staticmethod
+	def _keys_for(subscription: Subscription) -> set[IndexKey]:
+		venues = subscription.venues or (None,)
+		weekdays = subscription.weekdays or range(7)
+		if subscription.time_ranges:
+			hours = set()
+			for name in subscription.time_ranges:
+				starts, ends = WINDOWS[name]
+				# A court that fits in the window starts before it ends, so no later than the hour `ends` falls in
+				hours.update(range(starts.hour, ends.hour + (1 if ends.minute else 0)))
+		else:
+			hours = range(24)
+		return {(venue, weekday, hour) for venue in venues for weekday in weekdays for hour in hours}
@@ -1,17 +1,23 @@
 import asyncio
 import logging
+import time
 from collections import defaultdict
 
 from aiogram import Bot, Dispatcher
 
 from src.models import Court
-from src.services.court_database import CourtDatabase
+from src.services.change_feed import ChangeFeed, ChangeSubscription
 from src.telegram_bot.bot_config import BotConfig
 from src.telegram_bot.handlers import router
-from src.utils.court_formatter import format_court_availability
+from src.telegram_bot.notification_coalescer import NotificationCoalescer
+from src.telegram_bot.notification_dispatcher import NotificationDispatcher
+from src.telegram_bot.subscription_index import SubscriptionIndex
+from src.utils.metrics import Gauge
 
 logger = logging.getLogger(__name__)
 
+PENDING_NOTIFICATIONS = Gauge('notification_pending_users', 'Users with changes waiting for their window to close')
+
 
 class TelegramBot:
 	def __init__(self, bot_token: str):
@@ -19,16 +25,20 @@ class TelegramBot:
 		self.dp = Dispatcher()
 		self.dp.include_router(router)
 		self.config = BotConfig()
-		self.court_database = CourtDatabase()
-
-		logger.info('Building initial court availability cache')
-		self.cache = set(self.court_database.get_all_available())
+		self.change_feed = ChangeFeed()
+		self.dispatcher = NotificationDispatcher(self.bot)
+		self.coalescer = NotificationCoalescer(window=self.config.get('notification_window'))
+		PENDING_NOTIFICATIONS.set_function(lambda: self.coalescer.pending_users)
+		self._notifications_pending = asyncio.Event()
+		self._subscription_index = None
+		self._subscription_index_version = None
 
 	async def run(self):
 		await self.bot.delete_webhook(drop_pending_updates=True)
 		logger.info("Bot initialised")
 
-		self._monitor_task = asyncio.create_task(self._availability_monitor_task())
+		self._monitor_task = asyncio.create_task(self._availability_monitor_task(self.change_feed.subscribe()))
+		self._flush_task = asyncio.create_task(self._notification_flush_task())
 
 		try:
 			await self.dp.start_polling(self.bot)
@@ -37,57 +47,85 @@ class TelegramBot:
 			raise
 
 	async def _shutdown(self):
-		if hasattr(self, '_monitor_task'):
-			self._monitor_task.cancel()
+		for task_name in ('_monitor_task', '_flush_task'):
+			task = getattr(self, task_name, None)
+			if task is None:
+				continue
+			task.cancel()
 			try:
-				await self._monitor_task
+				await task
 			except asyncio.CancelledError:
 				pass
 
-	async def _availability_monitor_task(self):
-		while True:
-			await asyncio.sleep(self.config.get('polling_interval'))
-			logger.info('Running check for any changes in court availability')
+	async def _availability_monitor_task(self, subscription: ChangeSubscription):
+		# Changes are pushed right after each database write, so this only does work when something changed
+		try:
+			async for changes in subscription:
+				now_available, now_unavailable = changes.now_available, changes.now_unavailable
+				if not now_available and not now_unavailable:
+					logger.info('No changes in court availability, no notification will be sent')
+					continue
+				elif now_available:
+					logger.debug(f'Change in courts now available: {now_available}')
+				elif now_unavailable:
+					logger.debug(f'Change in courts now unavailable: {now_unavailable}')
+
+				await self._notify_users(now_available, now_unavailable)
+		finally:
+			subscription.close()
 
-			new_set = set(self.court_database.get_all_available())
+	async def _notify_users(self, now_available: list[Court], now_unavailable: list[Court]):
+		index = self._get_subscription_index()
+		if not index.size:
+			logger.info('No users to notify')
+			return
 
-			now_available = new_set - self.cache
-			now_unavailable = self.cache - new_set
+		available_by_user = index.match(now_available)
+		unavailable_by_user = index.match(now_unavailable)
+		if not available_by_user and not unavailable_by_user:
+			logger.info('No subscriptions match the changes, no notification will be sent')
+			return
 
-			self.cache = new_set
+		now = time.monotonic()
+		for user_id in available_by_user.keys() | unavailable_by_user.keys():
+			self.coalescer.add(user_id, available_by_user.get(user_id, []), unavailable_by_user.get(user_id, []), now)
+		self._notifications_pending.set()
 
-			if not now_available and not now_unavailable:
-				logger.info('No changes in court availability, no notification will be sent')
+	async def _notification_flush_task(self):
+		# Sends whatever the coalescer has ready each time a user's window closes
+		while True:
+			self._notifications_pending.clear()
+			delay = self.coalescer.seconds_until_next_flush(time.monotonic())
+			if delay != 0:
+				try:
+					await asyncio.wait_for(self._notifications_pending.wait(), delay)
+				except asyncio.TimeoutError:
+					pass
 				continue
-			elif now_available:
-				logger.debug(f'Change in courts now available: {now_available}')
-			elif now_unavailable:
-				logger.debug(f'Change in courts now unavailable: {now_unavailable}')
-
-			logger.info('Notifying users of court availability changes')
-			await self._notify_users(list(now_available), list(now_unavailable))
-
-			logger.info(f'Done, next check for court availability in {self.config.get("polling_interval")} seconds')
 
-	async def _notify_users(self, now_available: list[Court], now_unavailable: list[Court]):
-		notify_list = self.config.get_notify_list()
-		if not notify_list:
-			logger.info('No users to notify')
+			try:
+				await self._flush_notifications()
+			except Exception:
+				# Nothing restarts this task, so one failed flush must not stop every notification after it
+				logger.exception('Error sending court availability notifications')
+
+	async def _flush_notifications(self):
+		recipients = self.coalescer.flush_due(time.monotonic())
+		if not recipients:
 			return
 
-		for user_id in notify_list:
-			logger.debug('Notifying user %s', user_id)
-			if now_available:
-				await self.bot.send_message(
-					user_id,
-					format_court_availability(now_available, header=f'✅ Now available:', include_spaces=False)
-				)
+		logger.info(f'Notifying {len(recipients)} users of court availability changes')
+		result = await self.dispatcher.dispatch(recipients)
+		self.coalescer.record(result, time.monotonic())
 
-			if now_unavailable:
-				await self.bot.send_message(
-					user_id,
-					format_court_availability(now_unavailable, header=f'❌ Now unavailable:', include_spaces=False)
-				)
+		for user_id in result.blocked:
+			self.config.remove_from_notify_list(user_id)
+
+	def _get_subscription_index(self) -> SubscriptionIndex:
+		if self._subscription_index is None or self._subscription_index_version != self.config.version:
+			self._subscription_index = SubscriptionIndex(self.config.get_subscriptions())
+			self._subscription_index_version = self.config.version
+		return self._subscription_index
 
 	def _format_court_availability(self, header: str, courts: list[Court]) -> str:
 		courts_by_date = defaultdict(list)
@@ -12,9 +12,21 @@ ARDWICK_SPORTS_HALL = 'ardwick-sports-hall'
 # Activity slugs
 BADMINTON_40MIN = 'badminton-40min'
 BADMINTON_60MIN = 'badminton-60min'
+CATEGORY_SLUGS = (BADMINTON_40MIN, BADMINTON_60MIN)
+
+# Named time windows, shared by searches and subscriptions
+TIME_RANGES = {
+	'morning': ('07:00', '12:00'),
+	'afternoon': ('12:00', '17:00'),
+	'evening': ('17:00', '22:00')
+}
 
 # File locations
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 COURTS_DB_PATH = os.path.join(BASE_DIR, '../../data/courts.db')
 COURTS_ICS_PATH = os.path.join(BASE_DIR, '../../data/courts.ics')
 BOT_CONFIG_PATH = os.path.join(BASE_DIR, '../../data/bot_config.toml')
+SUBSCRIBERS_DB_PATH = os.path.join(BASE_DIR, '../../data/subscribers.db')
+HISTORY_DB_PATH = os.path.join(BASE_DIR, '../../data/history.db')
+# Normalised, as Unix socket paths are limited to around 100 characters
+WORKER_SOCKET_PATH = os.path.normpath(os.path.join(BASE_DIR, '../../data/workers.sock'))
@@ -2,9 +2,9 @@ from collections import defaultdict
 from datetime import date
 
 from src.models import Court
+from src.utils.constants import VENUE_MAP
 
 
-# TODO: Group by venue in the future
 def format_court_availability(
 		courts: list[Court],
 		none_available_message: str = 'None available.',
@@ -21,8 +21,11 @@ def format_court_availability(
 	for days, courts in sorted(courts_by_date.items()):
 		day = _ordinal(days.day)
 		lines = [f'📅 {days.strftime("%A")} {day} {days.strftime("%B")}:']
-		for court in sorted(courts, key=lambda c: (c.starts_at, c.ends_at)):
-			lines.append(court.format_with_spaces() if include_spaces else court.format_without_spaces())
+		# Courts come from several venues, so say which each is at
+		for venue_slug, venue_courts in sorted(_group_courts_by_venue(courts).items(), key=_venue_order):
+			lines.append(f'📍 {VENUE_MAP.get(venue_slug, venue_slug)}')
+			for court in sorted(venue_courts, key=lambda c: (c.starts_at, c.ends_at)):
+				lines.append(court.format_with_spaces() if include_spaces else court.format_without_spaces())
 		sections.append('\n'.join(lines))
 
 	return '\n\n'.join(sections)
@@ -35,6 +38,19 @@ def _group_courts_by_date(courts: list[Court]) -> dict[date, list[Court]]:
 	return dict(grouped)
 
 
+def _group_courts_by_venue(courts: list[Court]) -> dict[str, list[Court]]:
+	grouped = defaultdict(list)
+	for court in courts:
+		grouped[court.venue_slug].append(court)
+	return dict(grouped)
+
+
+def _venue_order(item: tuple[str, list[Court]]) -> tuple[int, str]:
+	# Known venues in the order VENUE_MAP lists them, then any others by slug
+	venue_slug = item[0]
+	return (list(VENUE_MAP).index(venue_slug), '') if venue_slug in VENUE_MAP else (len(VENUE_MAP), venue_slug)
+
+
 def _ordinal(n: int) -> str:
 	if 10 <= n % 100 <= 20:
 		return f'{n}th'
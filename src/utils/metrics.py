@@ -0,0 +1,166 @@
+"""
+A minimal Prometheus-style metrics registry, rendered in the text exposition format at /metrics.
+
+Recording only updates a few numbers in place under a lock, and gauges backed by a function are
+only evaluated when scraped, so instrumenting hot paths costs next to nothing when nobody is looking.
+"""
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Optional
+
+METRICS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_registry: list['_Metric'] = []
+
+
+class _Metric:
+	TYPE = ''
+
+	def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = labelnames
+		self._lock = threading.Lock()
+		_registry.append(self)
+
+	def render(self) -> list[str]:
+		return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.TYPE}']
+
+	def _labels(self, values: tuple, extra: str = '') -> str:
+		pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+		if extra:
+			pairs.append(extra)
+		return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram(_Metric):
+	TYPE = 'histogram'
+
+	def __init__(
+			self,
+			name: str,
+			documentation: str,
+			labelnames: tuple[str, ...] = (),
+			buckets: tuple[float, ...] = LATENCY_BUCKETS
+	):
+		super().__init__(name, documentation, labelnames)
+		self.buckets = buckets
+		# Label values -> per-bucket counts (the last bucket being +Inf), then the sum
+		self._series: dict[tuple, list[float]] = {}
+
+	def observe(self, value: float, *labels) -> None:
+		index = bisect_left(self.buckets, value)
+		with self._lock:
+			series = self._series.get(labels)
+			if series is None:
+				series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+			series[index] += 1
+			series[-1] += value
+
+	def time(self, *labels) -> '_Timer':
+		"""
+		Observes how long a `with` block takes.
+		"""
+		return _Timer(self, labels)
+
+	def timed(self, *labels) -> Callable:
+		"""
+		Observes how long each call of the decorated function takes.
+		"""
+		def decorator(function: Callable) -> Callable:
+			@wraps(function)
+			def wrapper(*args, **kwargs):
+				start = time.perf_counter()
+				try:
+					return function(*args, **kwargs)
+				finally:
+					self.observe(time.perf_counter() - start, *labels)
+			return wrapper
+		return decorator
+
+	def render(self) -> list[str]:
+		lines = super().render()
+		with self._lock:
+			series = {labels: list(values) for labels, values in self._series.items()}
+
+		for labels, values in sorted(series.items()):
+			cumulative = 0
+			for bound, count in zip(self.buckets + (float('inf'),), values):
+				cumulative += count
+				le = 'le="+Inf"' if bound == float('inf') else f'le="{_format(bound)}"'
+				lines.append(f'{self.name}_bucket{self._labels(labels, le)} {cumulative}')
+			lines.append(f'{self.name}_sum{self._labels(labels)} {_format(values[-1])}')
+			lines.append(f'{self.name}_count{self._labels(labels)} {cumulative}')
+		return lines
+
+
+class Gauge(_Metric):
+	TYPE = 'gauge'
+
+	def __init__(
+			self,
+			name: str,
+			documentation: str,
+			function: Optional[Callable[[], float]] = None,
+			labelnames: tuple[str, ...] = ()
+	):
+		"""
+		A labelled gauge is always read from its function, which returns a dict of label values to value, and
+		has no samples until it is given one. A function can return None to leave an unlabelled gauge unreported.
+		"""
+		super().__init__(name, documentation, labelnames)
+		self._value = 0.0
+		self._function = function
+
+	def set(self, value: float) -> None:
+		self._value = value
+
+	def set_function(self, function: Callable[[], Optional[float]]) -> None:
+		"""
+		Reads the value from `function` at scrape time instead, for values that are cheap to compute but change often.
+		"""
+		self._function = function
+
+	def render(self) -> list[str]:
+		if not self.labelnames:
+			value = self._function() if self._function is not None else self._value
+			return super().render() + ([] if value is None else [f'{self.name} {_format(value)}'])
+		if self._function is None:
+			# Nothing to report until whatever tracks the labelled series has set the function
+			return super().render()
+		value = self._function()
+		return super().render() + [
+			f'{self.name}{self._labels(labels)} {_format(series)}' for labels, series in sorted(value.items())
+		]
+
+
+class _Timer:
+	__slots__ = ('histogram', 'labels', 'start')
+
+	def __init__(self, histogram: Histogram, labels: tuple):
+		self.histogram = histogram
+		self.labels = labels
+
+	def __enter__(self) -> '_Timer':
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+def render_metrics() -> str:
+	return '\n'.join(line for metric in _registry for line in metric.render()) + '\n'
+
+
+def _format(value: float) -> str:
+	return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+	return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+	"""
+	An asyncio token bucket allowing bursts of up to `capacity` and a sustained `rate` per second.
+	"""
+
+	def __init__(self, rate: float, capacity: float):
+		self.rate = rate
+		self.capacity = capacity
+		self._tokens = capacity
+		self._updated = time.monotonic()
+		self._lock = asyncio.Lock()
+
+	async def acquire(self, tokens: float = 1) -> None:
+		# Waiters queue on the lock, so tokens are handed out in arrival order
+		async with self._lock:
+			while not self.try_acquire(tokens):
+				await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+	def try_acquire(self, tokens: float = 1) -> bool:
+		self._refill()
+		if self._tokens >= tokens:
+			self._tokens -= tokens
+			return True
+		return False
+
+	def _refill(self) -> None:
+		now = time.monotonic()
+		self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+		self._updated = now
@@ -0,0 +1,95 @@
+"""
+Runs the court fetch and update loop outside the serving process, sharded by venue.
+
+Each worker writes its venues' courts and history to SQLite, then reports the changes to the serving
+process (started with UPDATE_MODE=workers) over a Unix socket. Workers can be started and stopped
+independently of the serving process, and reconnect whenever it restarts.
+
+Usage:
+	PYTHONPATH=. python src/worker.py [--shards 2]
+	PYTHONPATH=. python src/worker.py --venue sugden-sports-centre
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+from datetime import datetime
+from typing import Optional
+
+from src.services.court_updater import CourtUpdater
+from src.services.worker_channel import WorkerConnection
+from src.utils.constants import VENUE_MAP, WORKER_SOCKET_PATH
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(venue_slugs: list[str], socket_path: str, interval: float = 300) -> None:
+	connection = WorkerConnection(socket_path)
+	updater = CourtUpdater(venue_slugs, publish=connection.publish, maintain_index=False)
+	connection_task = asyncio.create_task(connection.run())
+	logger.info(f'Fetch worker started for {", ".join(venue_slugs)}')
+
+	try:
+		while True:
+			# Refreshes that arrive during this update are left for the next one, which is forced straight after
+			refresh_ids = connection.take_refresh_ids()
+			await updater.update(force=bool(refresh_ids))
+			connection.report_updated(updater.last_updated or datetime.now(), refresh_ids)
+
+			# Same as court_updater_task, but a refresh from the serving process cuts the wait short
+			wait = max(1.0, min(interval, updater.seconds_until_next_update()))
+			logger.info(f'Done, next update for courts in {wait:.0f} seconds')
+			try:
+				await asyncio.wait_for(connection.refresh_requested.wait(), wait)
+			except asyncio.TimeoutError:
+				pass
+	finally:
+		connection_task.cancel()
+		await updater.close()
+
+
+def _run_shard(venue_slugs: list[str], socket_path: str) -> None:
+	_configure_logging()
+	try:
+		asyncio.run(run_worker(venue_slugs, socket_path))
+	except KeyboardInterrupt:
+		pass
+
+
+def _configure_logging() -> None:
+	logging.basicConfig(
+		level=logging.INFO,
+		format='%(asctime)s [%(levelname)s] [%(processName)s] %(message)s',
+		datefmt='%Y-%m-%d %H:%M:%S'
+	)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--venue', action='append', choices=tuple(VENUE_MAP), help='a venue to fetch, repeatable')
+	parser.add_argument('--shards', type=int, default=1, help='split the venues across this many processes')
+	parser.add_argument('--socket', default=WORKER_SOCKET_PATH)
+	args = parser.parse_args(argv)
+
+	venue_slugs = args.venue or list(VENUE_MAP)
+	shards = [venue_slugs[i::args.shards] for i in range(min(args.shards, len(venue_slugs)))]
+	if len(shards) == 1:
+		_run_shard(shards[0], args.socket)
+		return
+
+	processes = [
+		multiprocessing.Process(target=_run_shard, args=(shard, args.socket), name=f'worker-{i}')
+		for i, shard in enumerate(shards)
+	]
+	for process in processes:
+		process.start()
+	try:
+		for process in processes:
+			process.join()
+	except KeyboardInterrupt:
+		for process in processes:
+			process.join()
+
+
+if __name__ == '__main__':
+	main()
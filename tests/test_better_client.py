@@ -0,0 +1,138 @@
+"""
+Burst, rate limit and outage scenarios for the Better API client, run against the local stub server.
+"""
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.stub_server import StubServer
+from src.services.better_client import BetterApiClient, CircuitBreaker
+from src.services.court_fetcher import CourtFetcher
+from src.utils.constants import ARDWICK_SPORTS_HALL, SUGDEN_SPORTS_CENTRE
+
+
+@pytest.fixture
+def stub():
+	with StubServer(latency=0.01) as stub:
+		yield stub
+
+
+def make_fetcher(stub: StubServer, **client_options) -> CourtFetcher:
+	fetcher = CourtFetcher()
+	fetcher.API_URL = stub.api_url
+	fetcher.client = BetterApiClient(CourtFetcher.HEADERS, **client_options)
+	return fetcher
+
+
+def test_burst_stays_within_token_bucket(stub):
+	rate, capacity = 20, 5
+	fetcher = make_fetcher(stub, rate=rate, burst=capacity)
+	keys = fetcher.all_keys()
+
+	async def run():
+		try:
+			return await fetcher.fetch_keys(keys)
+		finally:
+			await fetcher.close()
+
+	results = asyncio.run(run())
+
+	assert len(results) == len(keys)
+	window = stub.request_times[-1] - stub.request_times[0]
+	assert len(stub.request_times) <= capacity + rate * window + 1
+
+
+def test_retry_after_is_waited_out(stub):
+	stub.fail(429, count=4, retry_after='1')
+	fetcher = make_fetcher(stub, backoff_base=0.05, failure_threshold=10)
+	keys = fetcher.all_keys()[:4]
+
+	async def run():
+		try:
+			return await fetcher.fetch_keys(keys)
+		finally:
+			await fetcher.close()
+
+	start = time.perf_counter()
+	results = asyncio.run(run())
+
+	assert len(results) == len(keys)
+	assert all(courts for courts in results.values())
+	assert time.perf_counter() - start >= 1
+
+
+def test_outage_opens_breaker_and_recovers(stub):
+	reset_timeout = 0.5
+	fetcher = make_fetcher(stub, backoff_base=0.01, failure_threshold=3, reset_timeout=reset_timeout)
+	keys = fetcher.all_keys()
+	failing = [key for key in keys if key[0] == ARDWICK_SPORTS_HALL]
+
+	async def run():
+		try:
+			stub.fail(503, venues={ARDWICK_SPORTS_HALL})
+			during = await fetcher.fetch_keys(keys)
+			await fetcher.fetch_keys(failing)
+			requests_during = stub.request_count
+			states = (
+				fetcher.client.breaker_for(ARDWICK_SPORTS_HALL).state,
+				fetcher.client.breaker_for(SUGDEN_SPORTS_CENTRE).state
+			)
+
+			stub.recover()
+			await asyncio.sleep(reset_timeout)
+			# The half-open breaker only lets one probe through, so the first key closes it before the rest follow
+			await fetcher.fetch_keys(failing[:1])
+			after = await fetcher.fetch_keys(failing[1:])
+			return during, requests_during, states, after
+		finally:
+			await fetcher.close()
+
+	during, requests_during, (failing_state, healthy_state), after = asyncio.run(run())
+
+	# Failed keys are left out rather than returned as having no courts
+	assert all(key not in during for key in failing)
+	assert all(key in during for key in keys if key[0] == SUGDEN_SPORTS_CENTRE)
+	assert failing_state == CircuitBreaker.OPEN
+	assert healthy_state == CircuitBreaker.CLOSED
+	# Each failing key gives up after its retries, and once open the breaker stops any more reaching the venue
+	assert requests_during == len(keys) + len(failing) * fetcher.client.max_retries
+
+	assert len(after) == len(failing) - 1
+	assert fetcher.client.breaker_for(ARDWICK_SPORTS_HALL).state == CircuitBreaker.CLOSED
+
+
+def test_one_keys_retries_count_as_one_failure(stub):
+	stub.fail(503)
+	fetcher = make_fetcher(stub, backoff_base=0.01, max_retries=3, failure_threshold=2)
+	key = fetcher.all_keys()[0]
+
+	async def run():
+		try:
+			return await fetcher.fetch_keys([key])
+		finally:
+			await fetcher.close()
+
+	results = asyncio.run(run())
+
+	assert key not in results
+	assert stub.request_count == 4
+	assert fetcher.client.breaker_for(key[0]).state == CircuitBreaker.CLOSED
+
+
+def test_rate_limiting_does_not_open_breaker(stub):
+	stub.fail(429, retry_after='0')
+	fetcher = make_fetcher(stub, backoff_base=0.01, max_retries=1, failure_threshold=1)
+	keys = [key for key in fetcher.all_keys() if key[0] == SUGDEN_SPORTS_CENTRE][:3]
+
+	async def run():
+		try:
+			return await fetcher.fetch_keys(keys)
+		finally:
+			await fetcher.close()
+
+	results = asyncio.run(run())
+
+	assert not results
+	assert stub.request_count == len(keys) * 2
+	assert fetcher.client.breaker_for(SUGDEN_SPORTS_CENTRE).state == CircuitBreaker.CLOSED
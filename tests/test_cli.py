@@ -0,0 +1,38 @@
+"""
+The command lines the CLI documents must parse, with options following the command name.
+"""
+from datetime import date
+
+import pytest
+
+from src.cli import build_parser
+
+
+@pytest.mark.parametrize('argv', [
+	['occupancy', '--since', '2025-01-01'],
+	['occupancy', '--since', '2025-01-01', '--until', '2025-04-01', '--output', 'occupancy.csv'],
+	['sell-out', '--output', 'sell_out.parquet'],
+	['busiest-hours', '--top', '3'],
+	['export', 'history', '--output', 'history.parquet'],
+	['export', 'courts', '--courts-db', 'courts.db', '--output', 'courts.csv'],
+])
+def test_documented_command_lines_parse(argv):
+	args = build_parser().parse_args(argv)
+
+	assert args.command == argv[0]
+
+
+def test_options_after_command_are_applied():
+	args = build_parser().parse_args(
+		['occupancy', '--since', '2025-01-01', '--until', '2025-04-01', '--history-db', 'h.db', '--output', 'o.csv']
+	)
+
+	assert (args.since, args.until) == (date(2025, 1, 1), date(2025, 4, 1))
+	assert args.history_db == 'h.db'
+	assert args.output == 'o.csv'
+
+
+def test_defaults_apply_without_options():
+	args = build_parser().parse_args(['sell-out'])
+
+	assert args.since is None and args.until is None and args.output is None
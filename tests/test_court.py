@@ -0,0 +1,54 @@
+"""
+Court.from_payload is the only validation Better API responses get, so it must reject malformed courts.
+"""
+from datetime import date, time
+
+import pytest
+
+from benchmarks.stub_server import build_times_payload
+from src.models import Court
+
+
+def make_payload(**overrides) -> dict:
+	return build_times_payload('sugden-sports-centre', 'badminton-40min', '2025-05-12', slots=1)['data'][0] | overrides
+
+
+def test_builds_court_from_nested_times_and_price():
+	court = Court.from_payload(make_payload())
+
+	assert court.composite_key == 'sugden-sports-centre-badminton-40min-2025-05-12-0700'
+	assert court.venue_slug == 'sugden-sports-centre'
+	assert court.category_slug == 'badminton-40min'
+	assert court.date == date(2025, 5, 12)
+	assert (court.starts_at, court.ends_at) == (time(7, 0), time(7, 40))
+	assert court.duration == '40min'
+	assert court.price == '£9.50'
+	assert court.spaces == 0
+
+
+def test_builds_court_from_flat_times_and_price():
+	court = Court.from_payload(make_payload(starts_at='18:00', ends_at='19:00', price='£12.75', spaces='2'))
+
+	assert (court.starts_at, court.ends_at) == (time(18, 0), time(19, 0))
+	assert court.price == '£12.75'
+	assert court.spaces == 2
+
+
+@pytest.mark.parametrize('overrides', [
+	{'date': '12/05/2025'},
+	{'starts_at': {'format_12_hour': '07:00AM'}},
+	{'ends_at': '7pm'},
+	{'spaces': 'none'},
+	{'price': None},
+])
+def test_rejects_malformed_court(overrides):
+	with pytest.raises((KeyError, TypeError, ValueError)):
+		Court.from_payload(make_payload(**overrides))
+
+
+def test_rejects_court_missing_a_field():
+	payload = make_payload()
+	del payload['composite_key']
+
+	with pytest.raises(KeyError):
+		Court.from_payload(payload)
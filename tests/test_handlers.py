@@ -0,0 +1,29 @@
+"""
+Parsing of /subscribe criteria, which must reject anything it can't match unambiguously.
+"""
+import pytest
+
+from src.telegram_bot.handlers import _parse_subscription
+from src.utils.constants import ARDWICK_SPORTS_HALL, BADMINTON_60MIN, SUGDEN_SPORTS_CENTRE
+
+
+def test_parses_each_kind_of_criterion():
+	subscription = _parse_subscription(1, ['sugden', 'ardwick-sports-hall', '60min', 'Sat', 'sunday', 'evening'])
+
+	assert subscription.venues == (SUGDEN_SPORTS_CENTRE, ARDWICK_SPORTS_HALL)
+	assert subscription.categories == (BADMINTON_60MIN,)
+	assert subscription.weekdays == (5, 6)
+	assert subscription.time_ranges == ('evening',)
+
+
+@pytest.mark.parametrize('arg', ['monkey', 'saturdays', 'a', 's', 'su', 'sugdenx'])
+def test_rejects_unrecognised_criteria(arg):
+	with pytest.raises(ValueError, match='Unrecognised criterion'):
+		_parse_subscription(1, [arg])
+
+
+def test_rejects_ambiguous_venue(monkeypatch):
+	monkeypatch.setattr('src.telegram_bot.handlers.VENUE_MAP', {'sale-leisure-centre': '', 'salford-sports-village': ''})
+
+	with pytest.raises(ValueError, match='Ambiguous venue: sal'):
+		_parse_subscription(1, ['sal'])
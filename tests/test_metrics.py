@@ -0,0 +1,35 @@
+"""
+Rendering of the /metrics registry in the Prometheus text format.
+"""
+from src.utils.metrics import Gauge, _registry, render_metrics
+
+
+def test_unset_labelled_gauge_renders_no_samples():
+	gauge = Gauge('test_unset_labelled', 'A labelled gauge nothing has set a function for yet', labelnames=('venue',))
+	try:
+		assert gauge.render() == [
+			'# HELP test_unset_labelled A labelled gauge nothing has set a function for yet',
+			'# TYPE test_unset_labelled gauge'
+		]
+		assert 'test_unset_labelled' in render_metrics()
+	finally:
+		_registry.remove(gauge)
+
+
+def test_labelled_gauge_renders_function_series():
+	gauge = Gauge('test_labelled', 'Labelled', labelnames=('venue', 'category'))
+	try:
+		gauge.set_function(lambda: {('b', 'y'): 2.5, ('a', 'x'): 1})
+
+		assert gauge.render()[2:] == ['test_labelled{venue="a",category="x"} 1', 'test_labelled{venue="b",category="y"} 2.5']
+	finally:
+		_registry.remove(gauge)
+
+
+
+def test_gauge_function_returning_none_renders_no_sample():
+	gauge = Gauge('test_unreported', 'Unreported', function=lambda: None)
+	try:
+		assert gauge.render() == ['# HELP test_unreported Unreported', '# TYPE test_unreported gauge']
+	finally:
+		_registry.remove(gauge)
@@ -0,0 +1,45 @@
+"""
+Whatever goes wrong with a key, the pipeline finishes its run and has the scheduler retry that key.
+"""
+import asyncio
+from datetime import date
+
+from src.models import CourtChanges
+from src.services.better_client import ApiResponse
+from src.services.fetch_scheduler import FetchScheduler
+from src.services.response_cache import ResponseCache
+from src.services.update_pipeline import UpdatePipeline
+
+GOOD = ('sugden-sports-centre', 'badminton-40min', date.today())
+BROKEN_FETCH = ('sugden-sports-centre', 'badminton-60min', date.today())
+BROKEN_PARSE = ('ardwick-sports-hall', 'badminton-40min', date.today())
+
+
+class FakeFetcher:
+	def __init__(self):
+		self.response_cache = ResponseCache()
+
+	async def fetch_response(self, key):
+		if key == BROKEN_FETCH:
+			raise RuntimeError('unexpected')
+		return ApiResponse(200, {}, b'{"data": []}')
+
+	def parse_response(self, key, response):
+		if key == BROKEN_PARSE:
+			raise RuntimeError('unexpected')
+		return []
+
+
+def test_unexpected_errors_fail_the_key_without_ending_the_run():
+	scheduler = FetchScheduler([GOOD[0], BROKEN_PARSE[0]], [GOOD[1], BROKEN_FETCH[1]], days_ahead=1)
+	# Popped keys stay untracked until the pipeline reschedules them
+	keys = [key for key in scheduler.pop_due() if key in (GOOD, BROKEN_FETCH, BROKEN_PARSE)]
+	stored = []
+	pipeline = UpdatePipeline(FakeFetcher(), scheduler, lambda courts, keys: stored.extend(keys) or CourtChanges(), print)
+
+	run = asyncio.run(asyncio.wait_for(pipeline.run(keys), timeout=5))
+
+	assert stored == [GOOD]
+	assert run.stored == 1
+	assert sorted(run.failed) == sorted([BROKEN_FETCH, BROKEN_PARSE])
+	assert {GOOD, BROKEN_FETCH, BROKEN_PARSE} <= set(scheduler.all_keys())
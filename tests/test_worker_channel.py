@@ -0,0 +1,47 @@
+"""
+Refreshes over the worker socket are only answered by the update they forced.
+"""
+import asyncio
+import json
+import tempfile
+from datetime import datetime
+
+from src.services.worker_channel import WorkerChannel, encode_message
+
+
+async def _noop(*args) -> None:
+	pass
+
+
+def test_refresh_waits_for_the_update_it_forced():
+	async def run():
+		socket_path = f'{tempfile.mkdtemp()}/workers.sock'
+		channel = WorkerChannel(socket_path, on_changes=_noop, on_updated=lambda updated_at: None, on_connect=_noop)
+		server = asyncio.create_task(channel.serve())
+		try:
+			await asyncio.sleep(0.1)
+			reader, writer = await asyncio.open_unix_connection(socket_path)
+			await asyncio.sleep(0.1)
+
+			refresh = asyncio.create_task(channel.request_refresh(timeout=5))
+			request = json.loads(await reader.readline())
+
+			# The update that was already running when the refresh arrived finishes first
+			writer.write(encode_message('updated', datetime.now()))
+			await writer.drain()
+			await asyncio.sleep(0.1)
+			answered_early = refresh.done()
+
+			writer.write(encode_message('updated', datetime.now(), refresh_ids=[request['id']]))
+			await writer.drain()
+			refreshed = await refresh
+			writer.close()
+			return request, answered_early, refreshed
+		finally:
+			server.cancel()
+
+	request, answered_early, refreshed = asyncio.run(run())
+
+	assert request['type'] == 'refresh'
+	assert not answered_early
+	assert refreshed